@@ -1,4 +1,5 @@
 """Authentication logic - JWT simple."""
+import logging
 import os
 import secrets
 from datetime import datetime, timedelta
@@ -9,9 +10,12 @@ from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from .database import get_db
+from .database import end_read, get_db
 from .models import User
 from .schemas import TokenData
+from .services.audit import set_current_actor
+
+logger = logging.getLogger(__name__)
 
 # Config
 # Sécurité : on refuse toute valeur par défaut connue. Si SECRET_KEY n'est pas
@@ -25,8 +29,8 @@ _INSECURE_DEFAULTS = {
 SECRET_KEY = os.getenv("SECRET_KEY", "").strip()
 if SECRET_KEY in _INSECURE_DEFAULTS:
     SECRET_KEY = secrets.token_urlsafe(48)
-    print(
-        "⚠️  SECRET_KEY non défini (ou valeur d'exemple) : génération d'une clé "
+    logger.warning(
+        "SECRET_KEY non défini (ou valeur d'exemple) : génération d'une clé "
         "aléatoire éphémère. Définissez SECRET_KEY dans l'environnement pour "
         "garder les sessions valides après un redémarrage."
     )
@@ -37,6 +41,11 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1008
 # Si CRM_API_KEY n'est pas défini, cette voie d'auth est désactivée.
 CRM_API_KEY = os.getenv("CRM_API_KEY", "").strip()
 
+# Proxys de confiance devant l'API (Traefik en prod : 1). Chacun ajoute l'adresse
+# de son pair à droite de X-Forwarded-For ; les entrées plus à gauche viennent du
+# client. uvicorn (FORWARDED_ALLOW_IPS="*") garde l'entrée la plus à gauche.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -82,6 +91,34 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Opti
     return user
 
 
+def request_principal(request: Request) -> tuple[str, str]:
+    """(type, identifiant) de l'appelant, sans accès base : clé du rate limiting.
+
+    `api_key` (le bot), `user` (JWT valide, par email) ou `anonymous` (par IP).
+    """
+    api_key = request.headers.get("X-API-Key", "")
+    if CRM_API_KEY and api_key and secrets.compare_digest(api_key, CRM_API_KEY):
+        return "api_key", "service"
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            email = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+        except JWTError:
+            email = None
+        if email:
+            return "user", email
+    return "anonymous", client_address(request)
+
+
+def client_address(request: Request) -> str:
+    """IP de l'appelant telle que vue par le premier proxy de confiance (non falsifiable)."""
+    if TRUSTED_PROXY_HOPS:
+        forwarded = [host.strip() for host in request.headers.get("X-Forwarded-For", "").split(",") if host.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+
 async def get_current_user(
     request: Request,
     token: Optional[str] = Depends(oauth2_scheme),
@@ -102,6 +139,8 @@ async def get_current_user(
         )
         service_user = result.scalars().first()
         if service_user:
+            set_current_actor(service_user, "api_key")
+            await end_read(db)
             return service_user
         raise credentials_exception
 
@@ -120,6 +159,10 @@ async def get_current_user(
     user = await get_user_by_email(db, email=token_data.email)
     if user is None:
         raise credentials_exception
+    set_current_actor(user, "jwt")
+    # Le handler peut travailler longtemps sans la base (upload, réplica) :
+    # la connexion de cette lecture ne reste pas prise jusque-là.
+    await end_read(db)
     return user
 
 
@@ -1,12 +1,80 @@
-"""Database connection and session management."""
+"""Database connection and session management.
+
+Deux dépendances FastAPI :
+- `get_db` : session sur le primaire (écritures, lectures qui doivent voir la
+  dernière écriture) ;
+- `get_read_db` : session sur un réplica en lecture (round-robin sur
+  DATABASE_REPLICA_URLS), ou sur le primaire si aucun réplica n'est à jour ou
+  si l'appelant vient d'écrire (cf. `primary_stickiness`).
+"""
+import asyncio
+import itertools
+import logging
 import os
+import time
+from contextvars import ContextVar
+
+from fastapi import Request
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+asyncpg://aetheria:aetheria_secure_2026@db:5432/aetheria_crm")
 
+logger = logging.getLogger(__name__)
+
+# Connexions Postgres (par serveur) de l'ensemble des process qui s'y connectent :
+# workers API (uvicorn --workers, cf. serve.py) et workers de jobs autonomes
+# (`python -m app.worker`, JOB_WORKER_PROCESSES). Chaque process reçoit une part
+# égale, pool dédié du rate limiting compris (RATE_LIMIT_BACKEND=postgres) ; les
+# workers de jobs in-process de l'API prennent leurs sessions dans le pool applicatif.
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1), 1)
+JOB_WORKER_PROCESSES = int(os.getenv("JOB_WORKER_PROCESSES", "0"))
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "40"))
+# Chaque réplica est un serveur distinct, avec son propre budget (lectures des workers API).
+DB_REPLICA_CONNECTION_BUDGET = int(os.getenv("DB_REPLICA_CONNECTION_BUDGET") or DB_CONNECTION_BUDGET)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+RATE_LIMIT_POOL_SIZE = 2 if RATE_LIMIT_BACKEND == "postgres" else 0
+
+
+def pool_sizing(
+    budget: int = DB_CONNECTION_BUDGET,
+    processes: int = WEB_CONCURRENCY + JOB_WORKER_PROCESSES,
+    reserved: int = RATE_LIMIT_POOL_SIZE,
+) -> tuple[int, int]:
+    """(pool_size, max_overflow) d'un process : 3/4 en connexions gardées, le reste en débordement.
+
+    `reserved` : connexions du process hors pool applicatif. Le total ne dépasse
+    jamais `budget`, sauf s'il ne laisse pas une connexion par process (warning).
+    """
+    per_process = budget // processes - reserved
+    if per_process < 1:
+        logger.warning(
+            "DB connection budget %d cannot be met: %d process(es) x %d connection(s) = %d",
+            budget, processes, reserved + 1, processes * (reserved + 1),
+        )
+        return 1, 0
+    pool_size = max(per_process * 3 // 4, 1)
+    return pool_size, per_process - pool_size
+
+
+DB_POOL_SIZE, DB_MAX_OVERFLOW = pool_sizing()
+
+# Requêtes SQL dans les logs : SQL_LOG=true (app/log.py), pas `echo`, qui écrit
+# sur stdout de façon synchrone depuis la boucle.
+ENGINE_OPTIONS = dict(
+    future=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    # Connexions coupées par Postgres ou un proxy pendant une période creuse
+    pool_pre_ping=True,
+)
+
 # Async Engine
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+engine = create_async_engine(DATABASE_URL, **ENGINE_OPTIONS)
 
 # Session Factory
 AsyncSessionLocal = async_sessionmaker(
@@ -17,10 +85,176 @@ AsyncSessionLocal = async_sessionmaker(
 Base = declarative_base()
 
 
+# Session partagée par les sous-requêtes de POST /batch (services/batch.py) :
+# get_db et get_read_db la renvoient telle quelle, sans la fermer.
+batch_session: ContextVar[AsyncSession | None] = ContextVar("batch_session", default=None)
+
+
+# Sessions ouvertes par get_db / get_read_db pour la requête en cours : la route
+# (app/routing.py) les ferme dès que le handler a rendu la main, avant la
+# sérialisation de la réponse. Hors requête (jobs, scripts) : None.
+request_sessions: ContextVar[list[AsyncSession] | None] = ContextVar("request_sessions", default=None)
+
+
+def _track(session: AsyncSession) -> AsyncSession:
+    sessions = request_sessions.get()
+    if sessions is not None:
+        sessions.append(session)
+    return session
+
+
+async def release_request_sessions() -> None:
+    """Rend au pool les connexions de la requête ; les objets chargés restent lisibles."""
+    sessions = request_sessions.get()
+    while sessions:
+        await sessions.pop().close()
+
+
+async def end_read(session: AsyncSession) -> None:
+    """Termine la transaction de lecture en cours : la connexion retourne au pool.
+
+    Les objets restent attachés (expire_on_commit=False) ; le prochain accès
+    base reprend une connexion. Sans effet sur la session d'un lot.
+    """
+    if session is not batch_session.get() and session.in_transaction() and not session.new and not session.dirty:
+        await session.commit()
+
+
 # Dependency pour FastAPI
 async def get_db():
-    async with AsyncSessionLocal() as session:
+    shared = batch_session.get()
+    if shared is not None:
+        yield shared
+        return
+    # La connexion n'est prise qu'à la première requête SQL (AsyncSession est paresseuse).
+    async with _track(AsyncSessionLocal()) as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+# ========== RÉPLICAS EN LECTURE ==========
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "5"))
+# Après une écriture, les lectures de l'appelant restent sur le primaire ce temps-là.
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+
+# Retard de rejeu du réplica ; 0 s'il a tout rejoué (ou si ce n'est pas un standby).
+_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        # Seuls les workers API lisent sur les réplicas.
+        pool_size, max_overflow = pool_sizing(DB_REPLICA_CONNECTION_BUDGET, WEB_CONCURRENCY, 0)
+        self.engine = create_async_engine(
+            url,
+            **{**ENGINE_OPTIONS, "pool_size": pool_size, "max_overflow": max_overflow},
+            # Garde-fou : une écriture routée ici par erreur échoue au lieu de diverger.
+            connect_args={"server_settings": {"default_transaction_read_only": "on"}},
+        )
+        self.sessionmaker = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        # Inconnu tant que le premier contrôle n'a pas répondu : lectures sur le primaire.
+        self.healthy = False
+        self.lag: float | None = None
+        self.error: str | None = None
+
+
+class ReplicaRouter:
+    """Round-robin sur les réplicas à jour ; retard contrôlé en tâche de fond, sans bloquer les requêtes."""
+
+    def __init__(self, urls: list[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._turn = itertools.count()
+        self._checked_at = float("-inf")
+        self._checking: asyncio.Task | None = None
+
+    def sessionmaker(self) -> async_sessionmaker:
+        if not self.replicas:
+            return AsyncSessionLocal
+        self._maybe_check()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return AsyncSessionLocal
+        return healthy[next(self._turn) % len(healthy)].sessionmaker
+
+    def _maybe_check(self) -> None:
+        if self._checking is None and time.monotonic() - self._checked_at > REPLICA_LAG_CHECK_INTERVAL:
+            self._checking = asyncio.create_task(self._check_all())
+
+    async def _check_all(self) -> None:
+        try:
+            await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+        finally:
+            self._checked_at = time.monotonic()
+            self._checking = None
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as conn:
+                lag = float(await conn.scalar(_LAG_SQL))
+        except Exception as exc:
+            replica.healthy, replica.lag, replica.error = False, None, repr(exc)
+            return
+        replica.healthy, replica.lag, replica.error = lag <= REPLICA_MAX_LAG_SECONDS, lag, None
+
+    def status(self) -> list[dict]:
+        return [
+            {"replica": index, "healthy": replica.healthy, "lag_seconds": replica.lag, "error": replica.error}
+            for index, replica in enumerate(self.replicas)
+        ]
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+class PrimaryStickiness:
+    """Appelants ayant écrit récemment (par worker) : leurs lectures restent sur le primaire."""
+
+    def __init__(self) -> None:
+        self._until: dict[str, float] = {}
+
+    def mark(self, principal: str) -> None:
+        now = time.monotonic()
+        if len(self._until) > 10000:
+            self._until = {key: until for key, until in self._until.items() if until > now}
+        self._until[principal] = now + REPLICA_STICKY_SECONDS
+
+    def is_sticky(self, principal: str) -> bool:
+        return self._until.get(principal, 0.0) > time.monotonic()
+
+
+replicas = ReplicaRouter(DATABASE_REPLICA_URLS)
+primary_stickiness = PrimaryStickiness()
+
+
+async def get_read_db(request: Request):
+    """Session de lecture : réplica à jour, sinon primaire (`request.state.use_primary` : voir main.py)."""
+    shared = batch_session.get()
+    if shared is not None:
+        # Un lot lit ses propres écritures.
+        yield shared
+        return
+    factory = AsyncSessionLocal if getattr(request.state, "use_primary", False) else replicas.sessionmaker()
+    async with _track(factory()) as session:
         try:
             yield session
         finally:
             await session.close()
+
+
+async def dispose_engines() -> None:
+    await replicas.dispose()
+    await engine.dispose()
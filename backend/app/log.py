@@ -0,0 +1,242 @@
+"""Logs JSON non bloquants, corrélés par requête.
+
+`setup_logging()` branche la racine sur un `QueueHandler` : côté boucle
+asyncio, un log ne coûte qu'un `put_nowait` dans une file en mémoire ; le
+formatage JSON et l'écriture sur stdout se font dans le thread d'un
+`QueueListener`. Les loggers d'uvicorn et de SQLAlchemy passent par la même file.
+
+`RequestLogMiddleware` (ASGI pur) attribue un identifiant à chaque requête
+(en-tête `X-Request-ID` repris ou généré, renvoyé dans la réponse) et émet une
+ligne `app.access` : méthode, route, statut, latence, temps passé en base,
+type d'appelant. Tout log émis pendant la requête porte son `request_id`.
+
+Configuration (variables d'environnement) :
+- LOG_LEVEL : niveau racine (INFO) ; LOG_LEVELS="app.services.jobs=DEBUG,…" par logger ;
+- LOG_FORMAT : `json` (défaut) ou `text` pour le dev ;
+- SQL_LOG=true : chaque requête SQL (remplace l'ancien `echo=True`) ;
+- LOG_SAMPLE="GET /tasks=0.1,GET /today=0.05" : part des lignes d'accès gardées
+  pour les routes bavardes (LOG_SAMPLE_DEFAULT=1) ; erreurs 5xx et requêtes
+  plus lentes que LOG_SLOW_MS toujours loggées.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+SQL_LOG = os.getenv("SQL_LOG", "false").strip().lower() in {"1", "true", "yes", "on"}
+LOG_SAMPLE_DEFAULT = float(os.getenv("LOG_SAMPLE_DEFAULT", "1"))
+LOG_SLOW_MS = float(os.getenv("LOG_SLOW_MS", "1000"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+
+def parse_pairs(spec: str) -> dict[str, str]:
+    """``"a=1,b=2"`` -> ``{"a": "1", "b": "2"}`` (clés et valeurs nettoyées)."""
+    pairs = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.rpartition("=")
+        pairs[key.strip()] = value.strip()
+    return pairs
+
+
+LOG_LEVELS = parse_pairs(os.getenv("LOG_LEVELS", ""))
+LOG_SAMPLE = {route: float(rate) for route, rate in parse_pairs(os.getenv("LOG_SAMPLE", "")).items()}
+
+access_logger = logging.getLogger("app.access")
+
+
+# ========== CONTEXTE DE REQUÊTE ==========
+class RequestContext:
+    __slots__ = ("request_id", "db_seconds", "db_statements")
+
+    def __init__(self, request_id: str) -> None:
+        self.request_id = request_id
+        self.db_seconds = 0.0
+        self.db_statements = 0
+
+
+request_context: ContextVar[RequestContext | None] = ContextVar("request_context", default=None)
+
+
+def instrument_db_time(engine: AsyncEngine) -> None:
+    """Cumule le temps d'exécution SQL dans le contexte de la requête en cours."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        context._log_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        # Contexte de la tâche appelante : SQLAlchemy le propage au greenlet.
+        current = request_context.get()
+        if current is not None:
+            current.db_seconds += time.perf_counter() - context._log_started
+            current.db_statements += 1
+
+
+# ========== HANDLERS ==========
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """Ne formate rien sur la boucle : capture seulement le request_id courant."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        current = request_context.get()
+        record.request_id = current.request_id if current is not None else None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # File pleine (stdout bloqué) : on perd la ligne plutôt que la requête.
+            pass
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self) -> None:
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        request_id = getattr(record, "request_id", None)
+        return f"{line} [{request_id}]" if request_id else line
+
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def setup_logging() -> None:
+    """Idempotent : appelé au démarrage de l'API, du worker de jobs et de serve.py."""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = _ContextQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    # uvicorn installe ses propres handlers (synchrones) : on les remplace par la file.
+    for name in ("uvicorn", "uvicorn.error"):
+        logger = logging.getLogger(name)
+        logger.handlers = []
+        logger.propagate = True
+    # Remplacé par la ligne app.access (route, latence, temps base).
+    logging.getLogger("uvicorn.access").disabled = True
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if SQL_LOG else logging.WARNING)
+    for name, level in LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Vide la file et arrête le thread d'écriture."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# ========== MIDDLEWARE ==========
+def _principal_kind(headers: dict[bytes, bytes]) -> str:
+    # Type déclaré par les en-têtes, sans vérification (faite par l'auth).
+    if headers.get(b"x-api-key"):
+        return "api_key"
+    if headers.get(b"authorization", b"").lower().startswith(b"bearer "):
+        return "jwt"
+    return "anonymous"
+
+
+class RequestLogMiddleware:
+    """Pure ASGI middleware: request id, then one access line per (sampled) request."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        incoming = headers.get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming[:64] if incoming else uuid.uuid4().hex
+        current = RequestContext(request_id)
+        token = request_context.set(current)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self._log(scope, headers, current, status_code, (time.perf_counter() - started) * 1000)
+            request_context.reset(token)
+
+    @staticmethod
+    def _log(scope: Scope, headers: dict[bytes, bytes], current: RequestContext, status_code: int, elapsed_ms: float) -> None:
+        # `route` est posé dans le scope par le routeur FastAPI une fois la route trouvée.
+        route = getattr(scope.get("route"), "path", None)
+        rate = LOG_SAMPLE.get(f"{scope['method']} {route}", LOG_SAMPLE_DEFAULT)
+        if status_code < 500 and elapsed_ms < LOG_SLOW_MS and rate < 1 and random.random() >= rate:
+            return
+        access_logger.info(
+            "request",
+            extra={
+                "fields": {
+                    "method": scope["method"],
+                    "route": route,
+                    "path": scope["path"],
+                    "status": status_code,
+                    "latency_ms": round(elapsed_ms, 2),
+                    "db_ms": round(current.db_seconds * 1000, 2),
+                    "db_statements": current.db_statements,
+                    "principal": _principal_kind(headers),
+                    "sample_rate": rate,
+                }
+            },
+        )
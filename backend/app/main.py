@@ -1,21 +1,36 @@
 """FastAPI Main App - Routes CRUD directes, pas de routers séparés."""
+from .startup import startup_timer  # en premier : mesure la durée des imports
+from .log import RequestLogMiddleware, instrument_db_time, setup_logging
+
+setup_logging()  # avant les autres imports de l'app, qui peuvent déjà logger
+
+import asyncio
+import logging
 import os
-import shutil
-from datetime import timedelta, datetime
+from datetime import timedelta, datetime, date
 from uuid import UUID
-from pathlib import Path
-from typing import List
+from typing import List, Literal, Mapping
 
 from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Query, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, text
 
-from .database import get_db, engine, Base
+from .database import (
+    REPLICA_STICKY_SECONDS,
+    dispose_engines,
+    engine,
+    get_db,
+    get_read_db,
+    primary_stickiness,
+    replicas,
+)
+from .migrations import current_revision, ensure_schema, head_revision
 from .auth import (
+    request_principal,
     authenticate_user,
     create_access_token,
     get_current_active_user,
@@ -23,7 +38,7 @@ from .auth import (
 )
 from .models import (
     User, Client, Task, Finance, MeetingNote, Project, Document,
-    TaskStatus, ClientStatus, FinanceType,
+    Job, AuditLog,
 )
 from .schemas import (
     Token,
@@ -34,9 +49,16 @@ from .schemas import (
     TaskCreate,
     TaskUpdate,
     TaskOut,
+    TagCount,
+    EffortReport,
+    BatchRequest,
+    BatchResponse,
     FinanceCreate,
     FinanceUpdate,
     FinanceOut,
+    FinanceTimeseries,
+    FinanceForecastOut,
+    PipelineAnalytics,
     MeetingNoteCreate,
     MeetingNoteUpdate,
     MeetingNoteOut,
@@ -44,9 +66,39 @@ from .schemas import (
     ProjectUpdate,
     ProjectOut,
     DocumentOut,
+    DocumentSearchHit,
+    JobOut,
+    AuditEventOut,
     DashboardStats,
 )
 from .services.dashboard_stats import build_dashboard_stats
+from .services.crud import update_returning, delete_returning
+from .services.audit import AuditWriter, record_create, record_delete, record_update
+from .services.daily_digest import DigestScheduler, get_digest, schedule_digest_refresh
+from .services.jobs import WorkerPool
+from .services.rate_limit import RateLimitMiddleware, close_rate_limiter, rate_limit_metrics
+from .services.single_flight import coalesce, flights, single_flight_stats
+from .services.document_index import enqueue_extraction, search_documents, shutdown_pool
+from .services.storage import StorageError, get_storage, new_key
+from .services.storage_gc import storage_usage
+from .routing import SessionReleasingRoute
+from .services.pool_metrics import instrument, pool_metrics
+from .services.batch import BATCH_MAX_REQUESTS, run_batch
+from .services.effort import EFFORT_FIELDS, effort_report, mark_effort_weeks
+from .services.archive import (
+    cold_since_on_create, delete_archived_tasks, entity_for, restore_client, restore_task, stamp_cold_since,
+)
+from .services.task_tags import filter_by_tags, invalidate_tag_counts, parse_tags, tag_counts
+from .services.finance_timeseries import finance_timeseries, invalidate_finance_timeseries, add_months
+from .services.fx import amount_eur, amount_eur_for_update
+from .services.pipeline import (
+    pipeline_analytics, record_pipeline_entry, record_stage_change,
+)
+from .services.finance_forecast import (
+    FORECAST_MAX_MONTHS, FORECAST_MIN_MONTHS, get_forecast, schedule_forecast_refresh,
+)
+
+logger = logging.getLogger(__name__)
 
 # ========== APP CONFIG ==========
 app = FastAPI(
@@ -54,6 +106,13 @@ app = FastAPI(
     description="Backend FastAPI pour CRM/ERP interne",
     version="1.0.0",
 )
+# Avant toute déclaration de route : sessions fermées dès la fin du handler.
+app.router.route_class = SessionReleasingRoute
+instrument("primary", engine)
+instrument_db_time(engine)
+for index, replica in enumerate(replicas.replicas):
+    instrument(f"replica_{index}", replica.engine)
+    instrument_db_time(replica.engine)
 
 # CORS
 _cors_origins = [
@@ -62,6 +121,10 @@ _cors_origins = [
 ]
 if os.getenv("CORS_ORIGINS"):
     _cors_origins.extend(o.strip() for o in os.getenv("CORS_ORIGINS").split(",") if o.strip())
+
+# Rate limiting par appelant + plafond de requêtes en cours (cf. services/rate_limit.py).
+# Ajouté avant CORS, donc exécuté après : les 429/503 gardent les en-têtes CORS.
+app.add_middleware(RateLimitMiddleware, principal=request_principal)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_cors_origins,
@@ -78,13 +141,9 @@ ASSISTANT_WRITE_ENABLED = os.getenv("ASSISTANT_WRITE_ENABLED", "false").strip().
 }
 
 
-@app.middleware("http")
-async def assistant_write_guard(request: Request, call_next):
-    if (
-        request.method in {"POST", "PUT", "PATCH", "DELETE"}
-        and request.headers.get("X-API-Key")
-        and not ASSISTANT_WRITE_ENABLED
-    ):
+def assistant_write_refusal(method: str, headers: Mapping[str, str]) -> JSONResponse | None:
+    """Réponse 403 si c'est une écriture de l'assistant et que le kill-switch est actif."""
+    if method in {"POST", "PUT", "PATCH", "DELETE"} and headers.get("x-api-key") and not ASSISTANT_WRITE_ENABLED:
         return JSONResponse(
             status_code=status.HTTP_403_FORBIDDEN,
             content={
@@ -92,12 +151,53 @@ async def assistant_write_guard(request: Request, call_next):
                 "Passez ASSISTANT_WRITE_ENABLED=true côté serveur pour l'autoriser."
             },
         )
+    return None
+
+
+@app.middleware("http")
+async def assistant_write_guard(request: Request, call_next):
+    # POST /batch lui-même passe : chaque sous-requête est contrôlée (services/batch.py).
+    if request.url.path != "/batch":
+        refusal = assistant_write_refusal(request.method, request.headers)
+        if refusal is not None:
+            return refusal
     return await call_next(request)
 
 
-# Upload directory
-UPLOAD_DIR = Path("/app/uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# Read-your-writes, après une écriture réussie (commitée avant la réponse) :
+# - les lectures regroupées (@coalesce) du worker ne rejoignent plus un calcul antérieur ;
+# - avec des réplicas, les lectures de l'appelant vont au primaire pendant
+#   REPLICA_STICKY_SECONDS (mémoire du worker + cookie pour les autres workers).
+READ_PRIMARY_COOKIE = "read_primary"
+
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    principal = None
+    if replicas.replicas:
+        principal = ":".join(request_principal(request))
+        request.state.use_primary = bool(request.cookies.get(READ_PRIMARY_COOKIE)) or primary_stickiness.is_sticky(principal)
+    response = await call_next(request)
+    if request.method not in {"POST", "PUT", "PATCH", "DELETE"} or response.status_code >= 400:
+        return response
+    flights.note_write()
+    if principal is not None:
+        primary_stickiness.mark(principal)
+        response.set_cookie(
+            READ_PRIMARY_COOKIE, "1", max_age=max(1, int(REPLICA_STICKY_SECONDS)), httponly=True, samesite="lax"
+        )
+    return response
+
+
+# Ajouté en dernier, donc le plus externe : request id et ligne d'accès pour toute
+# réponse, rejets du rate limiting et du kill-switch compris.
+app.add_middleware(RequestLogMiddleware)
+
+startup_timer.mark("imports")
+
+# Stockage des fichiers (disque local shardé ou S3, cf. STORAGE_BACKEND)
+storage = get_storage()
+startup_timer.mark("upload_dir")
 
 import re
 
@@ -110,31 +210,53 @@ def safe_filename(name: str | None) -> str:
     return base[:200]
 
 
-# Runtime schema patching for environments that do not run migrations.
-async def apply_runtime_migrations() -> None:
-    async with engine.begin() as conn:
-        await conn.execute(
-            text("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS estimated_hours NUMERIC(10,2)")
-        )
-        await conn.execute(
-            text("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS actual_hours NUMERIC(10,2)")
-        )
+# Workers de jobs lancés dans le process API (0 = uniquement `python -m app.worker`).
+JOB_WORKERS_INPROCESS = int(os.getenv("JOB_WORKERS_INPROCESS", "1"))
 
 
 # ========== STARTUP EVENT ==========
 @app.on_event("startup")
 async def startup_event():
-    """Create tables on startup (pour dev, en prod utiliser Alembic)."""
-    try:
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        await apply_runtime_migrations()
-    except Exception as e:
-        # Ignorer l'erreur si les types existent déjà (pb connu avec asyncpg + sqlalchemy enum)
-        if "duplicate key value violates unique constraint" in str(e):
-            print(f"Startup Warning: Database types likely already exist. Ignoring. Details: {e}")
-        else:
-            raise e
+    """Vérifie la version du schéma puis démarre les tâches de fond.
+
+    Schéma à jour (cas normal) : un seul SELECT sur `alembic_version`, aucune
+    DDL. Sinon, un seul worker migre sous verrou consultatif, les autres
+    attendent (cf. app/migrations.py).
+    """
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    startup_timer.mark("engine")
+    schema = await ensure_schema(engine)
+    startup_timer.mark("schema_check")
+
+    app.state.audit_writer = AuditWriter()
+    await app.state.audit_writer.start()
+    app.state.digest_scheduler = DigestScheduler()
+    await app.state.digest_scheduler.start()
+
+    if JOB_WORKERS_INPROCESS > 0:
+        app.state.job_pool = WorkerPool(concurrency=JOB_WORKERS_INPROCESS)
+        await app.state.job_pool.start()
+    startup_timer.mark("background_tasks")
+    logger.info(f"{startup_timer.summary()} (schema {schema})")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    scheduler = getattr(app.state, "digest_scheduler", None)
+    if scheduler is not None:
+        await scheduler.stop()
+    pool = getattr(app.state, "job_pool", None)
+    if pool is not None:
+        await pool.stop()
+    shutdown_pool()
+    # Après les workers : vide le tampon d'audit avant de rendre la main.
+    writer = getattr(app.state, "audit_writer", None)
+    if writer is not None:
+        await writer.stop()
+    # Uvicorn a déjà drainé les requêtes en cours : on ferme les connexions du pool.
+    await close_rate_limiter()
+    await dispose_engines()
 
 
 # ========== ROOT ==========
@@ -143,6 +265,55 @@ async def root():
     return {"message": "Aetheria Internal OS API - Running"}
 
 
+# ========== PROBES ==========
+READY_CHECK_TIMEOUT = float(os.getenv("READY_CHECK_TIMEOUT", "3"))
+
+
+@app.get("/healthz", tags=["Health"])
+async def healthz():
+    """Liveness : le process répond, sans toucher à la base."""
+    return {"status": "ok"}
+
+
+async def _check_schema() -> str:
+    async with engine.connect() as conn:
+        revision = await current_revision(conn)
+    head = head_revision()
+    return "ok" if revision == head else f"at {revision}, expected {head}"
+
+
+@app.get("/readyz", tags=["Health"])
+async def readyz():
+    """Readiness : base joignable, migrations à jour, stockage des uploads accessible en écriture.
+
+    Une seule lecture de `alembic_version`, aucune table métier.
+    """
+    checks = {}
+    try:
+        schema = await asyncio.wait_for(_check_schema(), READY_CHECK_TIMEOUT)
+        checks.update(database="ok", migrations=schema)
+    except Exception:
+        # Détail dans les logs seulement : /readyz n'est pas authentifié.
+        logger.warning("Readiness check failed: database", exc_info=True)
+        checks["database"] = "error"
+    try:
+        await asyncio.wait_for(storage.check_writable(), READY_CHECK_TIMEOUT)
+        checks["uploads"] = "ok"
+    except Exception:
+        logger.warning("Readiness check failed: uploads", exc_info=True)
+        checks["uploads"] = "error"
+
+    ready = all(value == "ok" for value in checks.values())
+    content = {"status": "ready" if ready else "not ready", "checks": checks}
+    # Informatif : un réplica en retard ou injoignable renvoie les lectures au primaire, sans rendre l'API indisponible.
+    if replicas.replicas:
+        content["replicas"] = replicas.status()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=content,
+    )
+
+
 # ========== AUTH ROUTES ==========
 @app.post("/auth/token", response_model=Token, tags=["Auth"])
 async def login(
@@ -172,14 +343,17 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
 
 # ========== CLIENTS CRUD ==========
 @app.get("/clients", response_model=List[ClientOut], tags=["Clients"])
+@coalesce()
 async def get_clients(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    include_archived: bool = Query(default=False, description="Inclut les lignes archivées (tables froides)"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Liste tous les clients."""
-    result = await db.execute(select(Client).offset(skip).limit(limit))
+    """Liste tous les clients (hors clients archivés en table froide, sauf `include_archived`)."""
+    entity = entity_for(Client, include_archived)
+    result = await db.execute(select(entity).offset(skip).limit(limit))
     clients = result.scalars().all()
     return clients
 
@@ -187,11 +361,13 @@ async def get_clients(
 @app.get("/clients/{client_id}", response_model=ClientOut, tags=["Clients"])
 async def get_client(
     client_id: UUID,
+    include_archived: bool = Query(default=False, description="Inclut les lignes archivées (tables froides)"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Récupère un client par ID."""
-    result = await db.execute(select(Client).where(Client.id == client_id))
+    entity = entity_for(Client, include_archived)
+    result = await db.execute(select(entity).where(entity.id == client_id))
     client = result.scalar_one_or_none()
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
@@ -205,10 +381,17 @@ async def create_client(
     current_user: User = Depends(get_current_active_user)
 ):
     """Crée un nouveau client."""
-    client = Client(**client_data.model_dump())
+    now = datetime.utcnow()
+    client = Client(
+        **client_data.model_dump(), pipeline_stage_since=now, **cold_since_on_create(Client, client_data.status)
+    )
     db.add(client)
+    await db.flush()
+    await record_pipeline_entry(db, client.id, client.pipeline_stage, now)
+    await schedule_digest_refresh(db)
     await db.commit()
     await db.refresh(client)
+    record_create(client)
     return client
 
 
@@ -220,17 +403,14 @@ async def update_client(
     current_user: User = Depends(get_current_active_user)
 ):
     """Met à jour un client."""
-    result = await db.execute(select(Client).where(Client.id == client_id))
-    client = result.scalar_one_or_none()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    # Update fields
-    for key, value in client_data.model_dump(exclude_unset=True).items():
-        setattr(client, key, value)
-    
-    await db.commit()
-    await db.refresh(client)
+    values = client_data.model_dump(exclude_unset=True)
+    if values.get("pipeline_stage") is not None:
+        # Transition historisée dans la même transaction que l'UPDATE.
+        values.update(await record_stage_change(db, client_id, values["pipeline_stage"]))
+    stamp_cold_since(Client, values)
+    await schedule_digest_refresh(db)
+    client, changes = await update_returning(db, Client, client_id, values, not_found="Client not found")
+    record_update(client, changes)
     return client
 
 
@@ -241,38 +421,101 @@ async def delete_client(
     current_user: User = Depends(get_current_active_user)
 ):
     """Supprime un client."""
+    # Passage volontaire par l'ORM : tâches, notes et projets (et leurs documents)
+    # sont supprimés par les cascades "all, delete-orphan" déclarées sur Client,
+    # pas par des ON DELETE CASCADE en base. Un DELETE … RETURNING direct échouerait
+    # sur les clés étrangères.
     result = await db.execute(select(Client).where(Client.id == client_id))
     client = result.scalar_one_or_none()
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
+    # Avant le delete (autoflush) : semaines closes où figurent ses tâches.
+    await mark_effort_weeks(db, client_id=client_id)
     await db.delete(client)
+    # Ses tâches archivées : hors de portée de la cascade ORM.
+    await delete_archived_tasks(db, client_id)
+    await schedule_digest_refresh(db)
     await db.commit()
+    # Ses tâches partent avec lui (cascade ORM).
+    invalidate_tag_counts()
+    record_delete(client)
     return None
 
 
+@app.post("/clients/{client_id}/restore", response_model=ClientOut, tags=["Clients"])
+async def restore_archived_client(
+    client_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Ramène un client archivé (notes, tâches, historique du pipeline) dans les tables actives.
+
+    Il garde son statut Archive, avec un nouveau délai avant le prochain archivage."""
+    await restore_client(db, client_id)
+    await schedule_digest_refresh(db)
+    await db.commit()
+    result = await db.execute(select(Client).where(Client.id == client_id))
+    return result.scalar_one()
+
+
+# ========== PIPELINE ==========
+@app.get("/pipeline/analytics", response_model=PipelineAnalytics, tags=["Clients"])
+async def get_pipeline_analytics(
+    weeks: int = Query(default=12, ge=1, le=104),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Funnel du pipeline (entrées, conversions, temps moyen par étape) sur N semaines."""
+    return await pipeline_analytics(db, weeks)
+
+
 # ========== TASKS CRUD ==========
 @app.get("/tasks", response_model=List[TaskOut], tags=["Tasks"])
 async def get_tasks(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    tags_any: Optional[List[str]] = Query(default=None, description="Au moins un de ces tags (répétable ou séparés par des virgules)"),
+    tags_all: Optional[List[str]] = Query(default=None, description="Tous ces tags"),
+    include_archived: bool = Query(default=False, description="Inclut les lignes archivées (tables froides)"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Liste toutes les tâches."""
-    result = await db.execute(select(Task).offset(skip).limit(limit))
+    """Liste les tâches, filtrables par tags (index GIN sur `tags`).
+
+    Les tâches terminées depuis plus de ARCHIVE_TASKS_AFTER_DAYS jours n'y sont
+    qu'avec `include_archived=true`."""
+    entity = entity_for(Task, include_archived)
+    query = filter_by_tags(select(entity), parse_tags(tags_any), parse_tags(tags_all), entity)
+    result = await db.execute(query.offset(skip).limit(limit))
     tasks = result.scalars().all()
     return tasks
 
 
+@app.get("/tags", response_model=List[TagCount], tags=["Tasks"])
+async def get_tags(
+    prefix: Optional[str] = Query(default=None, description="Tags commençant par…"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Tags utilisés par les tâches, du plus fréquent au moins fréquent (compteurs en cache)."""
+    counts = await tag_counts(db)
+    if prefix:
+        counts = [entry for entry in counts if entry["tag"].startswith(prefix)]
+    return counts[:limit]
+
+
 @app.get("/tasks/{task_id}", response_model=TaskOut, tags=["Tasks"])
 async def get_task(
     task_id: UUID,
+    include_archived: bool = Query(default=False, description="Inclut les lignes archivées (tables froides)"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Récupère une tâche par ID."""
-    result = await db.execute(select(Task).where(Task.id == task_id))
+    entity = entity_for(Task, include_archived)
+    result = await db.execute(select(entity).where(entity.id == task_id))
     task = result.scalar_one_or_none()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -286,10 +529,14 @@ async def create_task(
     current_user: User = Depends(get_current_active_user)
 ):
     """Crée une nouvelle tâche."""
-    task = Task(**task_data.model_dump())
+    task = Task(**task_data.model_dump(), **cold_since_on_create(Task, task_data.status))
     db.add(task)
+    await schedule_digest_refresh(db)
+    await mark_effort_weeks(db, task_data.due_date)
     await db.commit()
+    invalidate_tag_counts()
     await db.refresh(task)
+    record_create(task)
     return task
 
 
@@ -301,16 +548,15 @@ async def update_task(
     current_user: User = Depends(get_current_active_user)
 ):
     """Met à jour une tâche."""
-    result = await db.execute(select(Task).where(Task.id == task_id))
-    task = result.scalar_one_or_none()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    for key, value in task_data.model_dump(exclude_unset=True).items():
-        setattr(task, key, value)
-    
-    await db.commit()
-    await db.refresh(task)
+    values = task_data.model_dump(exclude_unset=True)
+    stamp_cold_since(Task, values)
+    await schedule_digest_refresh(db)
+    if EFFORT_FIELDS & values.keys():
+        await mark_effort_weeks(db, values.get("due_date"), task_id=task_id)
+    task, changes = await update_returning(db, Task, task_id, values, not_found="Task not found")
+    if "tags" in changes:
+        invalidate_tag_counts()
+    record_update(task, changes)
     return task
 
 
@@ -321,22 +567,54 @@ async def delete_task(
     current_user: User = Depends(get_current_active_user)
 ):
     """Supprime une tâche."""
-    result = await db.execute(select(Task).where(Task.id == task_id))
-    task = result.scalar_one_or_none()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    await db.delete(task)
-    await db.commit()
+    await schedule_digest_refresh(db)
+    await mark_effort_weeks(db, task_id=task_id)
+    task = await delete_returning(db, Task, task_id, not_found="Task not found")
+    invalidate_tag_counts()
+    record_delete(task)
     return None
 
 
+@app.post("/tasks/{task_id}/restore", response_model=TaskOut, tags=["Tasks"])
+async def restore_archived_task(
+    task_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Ramène une tâche archivée dans les tâches actives (409 si son client est archivé)."""
+    await restore_task(db, task_id)
+    await db.commit()
+    result = await db.execute(select(Task).where(Task.id == task_id))
+    return result.scalar_one()
+
+
+# ========== REPORTS ==========
+@app.get("/reports/effort", response_model=EffortReport, tags=["Reports"])
+async def get_effort_report(
+    group_by: Literal["client", "week", "tag"] = "client",
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Heures estimées vs réelles (écart, ratio de dépassement) par client, semaine ou tag.
+
+    12 dernières semaines par défaut ; semaines closes lues depuis les agrégats."""
+    to_date = to_date or date.today()
+    from_date = from_date or to_date - timedelta(weeks=11)
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if (to_date - from_date).days > 366 * 5:
+        raise HTTPException(status_code=400, detail="Range too large (max 5 years)")
+    return await effort_report(db, group_by, from_date, to_date)
+
+
 # ========== FINANCES CRUD ==========
 @app.get("/finances", response_model=List[FinanceOut], tags=["Finances"])
 async def get_finances(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Liste toutes les finances."""
@@ -345,6 +623,36 @@ async def get_finances(
     return finances
 
 
+@app.get("/finances/timeseries", response_model=FinanceTimeseries, tags=["Finances"])
+async def get_finances_timeseries(
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to"),
+    granularity: Literal["month", "quarter"] = "month",
+    group_by: Optional[Literal["category", "type"]] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Dépenses par mois ou trimestre (12 derniers mois par défaut)."""
+    to_date = to_date or date.today()
+    from_date = from_date or add_months(date(to_date.year, to_date.month, 1), -11)
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if (to_date - from_date).days > 366 * 20:
+        raise HTTPException(status_code=400, detail="Range too large (max 20 years)")
+    buckets = await finance_timeseries(db, from_date, to_date, granularity, group_by)
+    return {"granularity": granularity, "group_by": group_by, "buckets": buckets}
+
+
+@app.get("/finances/forecast", response_model=FinanceForecastOut, tags=["Finances"])
+async def get_finances_forecast(
+    months: int = Query(default=12, ge=FORECAST_MIN_MONTHS, le=FORECAST_MAX_MONTHS),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Projection des abonnements à venir, par mois et catégorie (lue depuis la table matérialisée)."""
+    return await get_forecast(db, months)
+
+
 @app.get("/finances/{finance_id}", response_model=FinanceOut, tags=["Finances"])
 async def get_finance(
     finance_id: UUID,
@@ -367,9 +675,14 @@ async def create_finance(
 ):
     """Crée une nouvelle entrée finance."""
     finance = Finance(**finance_data.model_dump())
+    finance.amount_eur = amount_eur(finance_data.amount, finance_data.currency)
     db.add(finance)
+    await schedule_forecast_refresh(db)
+    await schedule_digest_refresh(db)
     await db.commit()
+    invalidate_finance_timeseries()
     await db.refresh(finance)
+    record_create(finance)
     return finance
 
 
@@ -381,16 +694,15 @@ async def update_finance(
     current_user: User = Depends(get_current_active_user)
 ):
     """Met à jour une finance."""
-    result = await db.execute(select(Finance).where(Finance.id == finance_id))
-    finance = result.scalar_one_or_none()
-    if not finance:
-        raise HTTPException(status_code=404, detail="Finance not found")
-    
-    for key, value in finance_data.model_dump(exclude_unset=True).items():
-        setattr(finance, key, value)
-    
-    await db.commit()
-    await db.refresh(finance)
+    values = finance_data.model_dump(exclude_unset=True)
+    converted = amount_eur_for_update(values)
+    if converted is not None:
+        values["amount_eur"] = converted
+    await schedule_forecast_refresh(db)
+    await schedule_digest_refresh(db)
+    finance, changes = await update_returning(db, Finance, finance_id, values, not_found="Finance not found")
+    invalidate_finance_timeseries()
+    record_update(finance, changes)
     return finance
 
 
@@ -401,13 +713,11 @@ async def delete_finance(
     current_user: User = Depends(get_current_active_user)
 ):
     """Supprime une finance."""
-    result = await db.execute(select(Finance).where(Finance.id == finance_id))
-    finance = result.scalar_one_or_none()
-    if not finance:
-        raise HTTPException(status_code=404, detail="Finance not found")
-    
-    await db.delete(finance)
-    await db.commit()
+    await schedule_forecast_refresh(db)
+    await schedule_digest_refresh(db)
+    finance = await delete_returning(db, Finance, finance_id, not_found="Finance not found")
+    invalidate_finance_timeseries()
+    record_delete(finance)
     return None
 
 
@@ -416,11 +726,13 @@ async def delete_finance(
 async def get_meeting_notes(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    include_archived: bool = Query(default=False, description="Inclut les lignes archivées (tables froides)"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Liste toutes les notes de meeting."""
-    result = await db.execute(select(MeetingNote).offset(skip).limit(limit))
+    """Liste toutes les notes de meeting (celles des clients archivés avec `include_archived`)."""
+    entity = entity_for(MeetingNote, include_archived)
+    result = await db.execute(select(entity).offset(skip).limit(limit))
     notes = result.scalars().all()
     return notes
 
@@ -428,11 +740,13 @@ async def get_meeting_notes(
 @app.get("/meeting-notes/{note_id}", response_model=MeetingNoteOut, tags=["Meeting Notes"])
 async def get_meeting_note(
     note_id: UUID,
+    include_archived: bool = Query(default=False, description="Inclut les lignes archivées (tables froides)"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Récupère une note par ID."""
-    result = await db.execute(select(MeetingNote).where(MeetingNote.id == note_id))
+    entity = entity_for(MeetingNote, include_archived)
+    result = await db.execute(select(entity).where(entity.id == note_id))
     note = result.scalar_one_or_none()
     if not note:
         raise HTTPException(status_code=404, detail="Meeting note not found")
@@ -450,6 +764,7 @@ async def create_meeting_note(
     db.add(note)
     await db.commit()
     await db.refresh(note)
+    record_create(note)
     return note
 
 
@@ -461,16 +776,10 @@ async def update_meeting_note(
     current_user: User = Depends(get_current_active_user)
 ):
     """Met à jour une note."""
-    result = await db.execute(select(MeetingNote).where(MeetingNote.id == note_id))
-    note = result.scalar_one_or_none()
-    if not note:
-        raise HTTPException(status_code=404, detail="Meeting note not found")
-    
-    for key, value in note_data.model_dump(exclude_unset=True).items():
-        setattr(note, key, value)
-    
-    await db.commit()
-    await db.refresh(note)
+    note, changes = await update_returning(
+        db, MeetingNote, note_id, note_data.model_dump(exclude_unset=True), not_found="Meeting note not found"
+    )
+    record_update(note, changes)
     return note
 
 
@@ -481,13 +790,8 @@ async def delete_meeting_note(
     current_user: User = Depends(get_current_active_user)
 ):
     """Supprime une note."""
-    result = await db.execute(select(MeetingNote).where(MeetingNote.id == note_id))
-    note = result.scalar_one_or_none()
-    if not note:
-        raise HTTPException(status_code=404, detail="Meeting note not found")
-    
-    await db.delete(note)
-    await db.commit()
+    note = await delete_returning(db, MeetingNote, note_id, not_found="Meeting note not found")
+    record_delete(note)
     return None
 
 
@@ -497,7 +801,7 @@ async def get_projects(
     client_id: Optional[UUID] = Query(default=None),
     skip: int = 0,
     limit: int = 200,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Liste les projets, optionnellement filtrés par client."""
@@ -519,6 +823,7 @@ async def create_project(
     db.add(project)
     await db.commit()
     await db.refresh(project)
+    record_create(project)
     return project
 
 
@@ -530,14 +835,10 @@ async def update_project(
     current_user: User = Depends(get_current_active_user)
 ):
     """Met à jour un projet."""
-    result = await db.execute(select(Project).where(Project.id == project_id))
-    project = result.scalar_one_or_none()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    for key, value in project_data.model_dump(exclude_unset=True).items():
-        setattr(project, key, value)
-    await db.commit()
-    await db.refresh(project)
+    project, changes = await update_returning(
+        db, Project, project_id, project_data.model_dump(exclude_unset=True), not_found="Project not found"
+    )
+    record_update(project, changes)
     return project
 
 
@@ -548,12 +849,15 @@ async def delete_project(
     current_user: User = Depends(get_current_active_user)
 ):
     """Supprime un projet et ses documents."""
+    # Passage volontaire par l'ORM : les documents sont supprimés par la cascade
+    # "all, delete-orphan" de Project.documents (pas de ON DELETE CASCADE en base).
     result = await db.execute(select(Project).where(Project.id == project_id))
     project = result.scalar_one_or_none()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     await db.delete(project)
     await db.commit()
+    record_delete(project)
     return None
 
 
@@ -561,7 +865,7 @@ async def delete_project(
 @app.get("/projects/{project_id}/documents", response_model=List[DocumentOut], tags=["Documents"])
 async def get_project_documents(
     project_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Liste les documents d'un projet."""
@@ -583,65 +887,102 @@ async def upload_project_document(
         raise HTTPException(status_code=404, detail="Project not found")
 
     clean = safe_filename(file.filename)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    stored_name = f"{timestamp}_{clean}"
-    file_path = UPLOAD_DIR / stored_name
+    key = new_key(clean)
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        size = await storage.save(key, file.file, file.content_type)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
     document = Document(
         name=os.path.basename(file.filename or "") or clean,
-        file_path=str(file_path),
-        file_size=file_path.stat().st_size,
+        file_path=key,
+        file_size=size,
         content_type=file.content_type,
         project_id=project_id,
     )
     db.add(document)
+    await db.flush()
+    # Extraction du texte en arrière-plan : l'upload répond sans l'attendre.
+    enqueue_extraction(db, document.id)
     await db.commit()
     await db.refresh(document)
+    record_create(document)
     return document
 
 
+@app.get("/documents/search", response_model=List[DocumentSearchHit], tags=["Documents"])
+async def search_project_documents(
+    q: str = Query(..., min_length=2),
+    project_id: Optional[UUID] = Query(default=None),
+    limit: int = Query(default=20, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Recherche plein texte dans le contenu des documents."""
+    return await search_documents(db, q, project_id=project_id, limit=limit)
+
+
 @app.get("/documents/{document_id}/download", tags=["Documents"])
 async def download_document(
     document_id: UUID,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Télécharge un document."""
+    """Télécharge un document (servi par n'importe quel réplica, quel que soit le stockage)."""
     result = await db.execute(select(Document).where(Document.id == document_id))
     document = result.scalar_one_or_none()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
-    if not Path(document.file_path).exists():
-        raise HTTPException(status_code=404, detail="File missing on disk")
-    return FileResponse(
-        document.file_path,
-        filename=document.name,
-        media_type=document.content_type or "application/octet-stream",
+    try:
+        found = await storage.exists(document.file_path)
+        local_file = storage.local_file(document.file_path)
+    except StorageError:
+        # Clé invalide pour le stockage (ex. chemin hors UPLOAD_DIR) : aucun fichier à servir.
+        found = False
+    if not found:
+        raise HTTPException(status_code=404, detail="File missing in storage")
+    media_type = document.content_type or "application/octet-stream"
+    if local_file is not None:
+        return FileResponse(local_file, filename=document.name, media_type=media_type)
+    return StreamingResponse(
+        storage.open_stream(document.file_path),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{safe_filename(document.name)}"'},
     )
 
 
-@app.delete("/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Documents"])
-async def delete_document(
+@app.get("/documents/{document_id}/download-url", tags=["Documents"])
+async def get_document_download_url(
     document_id: UUID,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Supprime un document (base + fichier)."""
+    """URL de téléchargement direct (présignée, S3 uniquement).
+
+    `url` vaut null avec le stockage local : utiliser alors /download.
+    """
     result = await db.execute(select(Document).where(Document.id == document_id))
     document = result.scalar_one_or_none()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
+    return {
+        "url": storage.presigned_url(document.file_path, safe_filename(document.name), document.content_type),
+    }
+
+
+@app.delete("/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Documents"])
+async def delete_document(
+    document_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Supprime un document (base + fichier)."""
+    document = await delete_returning(db, Document, document_id, "Document not found")
+    record_delete(document)
     try:
-        Path(document.file_path).unlink(missing_ok=True)
+        await storage.delete(document.file_path)
     except Exception:
         pass
-    await db.delete(document)
-    await db.commit()
     return None
 
 
@@ -653,114 +994,136 @@ async def upload_file(
 ):
     """Upload un fichier (PDF, etc.) et retourne le path."""
     try:
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{safe_filename(file.filename)}"
-        file_path = UPLOAD_DIR / filename
-        
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
+        filename = safe_filename(file.filename)
+        key = new_key(filename)
+        size = await storage.save(key, file.file, file.content_type)
+
+        # `path` est la clé de stockage à recopier dans invoice_path / attachments
         return {
             "filename": filename,
-            "path": str(file_path),
-            "size": file_path.stat().st_size
+            "path": key,
+            "size": size
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+@app.get("/storage/usage", tags=["Utils"])
+async def get_storage_usage(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Occupation du stockage par projet et par client (+ fichiers en quarantaine)."""
+    return await storage_usage(db)
+
+
+@app.get("/metrics/rate-limit", tags=["Utils"])
+async def get_rate_limit_metrics(current_user: User = Depends(get_current_active_user)):
+    """Compteurs du rate limiting et du délestage (propres au worker qui répond)."""
+    return rate_limit_metrics()
+
+
+@app.get("/metrics/pool", tags=["Utils"])
+async def get_pool_metrics(current_user: User = Depends(get_current_active_user)):
+    """Connexions prises par route : durée moyenne/max et part de la requête passée à tenir une connexion."""
+    return pool_metrics()
+
+
+@app.get("/metrics/single-flight", tags=["Utils"])
+async def get_single_flight_metrics(current_user: User = Depends(get_current_active_user)):
+    """Lectures regroupées : calculs lancés (leader), partagés (shared), servis du micro-cache (cached)."""
+    return single_flight_stats()
+
+
+# ========== AUDIT ==========
+@app.get("/audit", response_model=List[AuditEventOut], tags=["Audit"])
+async def get_audit_log(
+    entity: Optional[str] = Query(default=None, description="Table : clients, tasks, finances…"),
+    entity_id: Optional[UUID] = Query(default=None),
+    via: Optional[Literal["jwt", "api_key", "system"]] = Query(default=None),
+    before: Optional[datetime] = Query(default=None, description="Pagination : événements antérieurs à ts"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Journal des modifications, du plus récent au plus ancien."""
+    query = select(AuditLog)
+    if entity is not None:
+        query = query.where(AuditLog.entity == entity)
+    if entity_id is not None:
+        query = query.where(AuditLog.entity_id == entity_id)
+    if via is not None:
+        query = query.where(AuditLog.via == via)
+    if before is not None:
+        query = query.where(AuditLog.ts < before)
+    result = await db.execute(query.order_by(AuditLog.ts.desc(), AuditLog.id.desc()).limit(limit))
+    return result.scalars().all()
+
+
+# ========== BATCH ==========
+@app.post("/batch", response_model=BatchResponse, tags=["Assistant"])
+async def batch(
+    batch_data: BatchRequest,
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Exécute plusieurs appels de l'API en un aller-retour, dans l'ordre.
+
+    Mêmes routes, même authentification, une seule session base ; `atomic=true`
+    pour du tout-ou-rien. Le kill-switch d'écriture de l'assistant et le rate
+    limiting s'appliquent à chaque sous-requête (429 dans son résultat)."""
+    if not 1 <= len(batch_data.requests) <= BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {BATCH_MAX_REQUESTS} requests per batch")
+    operations = [(item.method, item.path, item.body) for item in batch_data.requests]
+    return await run_batch(
+        app, request.scope, operations, batch_data.atomic, assistant_write_refusal, request_principal(request)
+    )
+
+
+# ========== JOBS ==========
+@app.get("/jobs/{job_id}", response_model=JobOut, tags=["Jobs"])
+async def get_job(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Statut d'un job d'arrière-plan."""
+    result = await db.execute(select(Job).where(Job.id == job_id))
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 # ========== ASSISTANT: AGRÉGAT DU JOUR ==========
 @app.get("/today", tags=["Assistant"])
+@coalesce()
 async def get_today(
+    fresh: bool = Query(default=False, description="Recalcule au lieu de servir l'instantané"),
     db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Agrégat 'aujourd'hui' pour l'assistant : tâches en retard/dues,
-    prochaines actions clients, renouvellements d'abonnements à 7 jours."""
-    now = datetime.now()
-    start = datetime(now.year, now.month, now.day)
-    end = start + timedelta(days=1)
-
-    # Tâches non terminées avec échéance passée ou aujourd'hui
-    result = await db.execute(
-        select(Task)
-        .where(Task.status != TaskStatus.DONE, Task.due_date.is_not(None), Task.due_date < end)
-        .order_by(Task.due_date)
-    )
-    due_tasks = result.scalars().all()
-    tasks_overdue = [t for t in due_tasks if t.due_date < start]
-    tasks_due_today = [t for t in due_tasks if t.due_date >= start]
-
-    # Clients (non archivés) avec une prochaine action passée ou aujourd'hui
-    result = await db.execute(
-        select(Client)
-        .where(
-            Client.status != ClientStatus.ARCHIVE,
-            Client.next_action_date.is_not(None),
-            Client.next_action_date < end,
-        )
-        .order_by(Client.next_action_date)
-    )
-    actions = result.scalars().all()
-
-    # Abonnements à renouveler dans les 7 jours
-    result = await db.execute(
-        select(Finance)
-        .where(
-            Finance.type == FinanceType.SUBSCRIPTION,
-            Finance.renewal_date.is_not(None),
-            Finance.renewal_date >= start.date(),
-            Finance.renewal_date <= (start + timedelta(days=7)).date(),
-        )
-        .order_by(Finance.renewal_date)
-    )
-    renewals = result.scalars().all()
+    prochaines actions clients, renouvellements d'abonnements à 7 jours.
 
-    def task_brief(t: Task) -> dict:
-        return {
-            "id": str(t.id),
-            "title": t.title,
-            "status": t.status.value,
-            "priority": t.priority.value,
-            "due_date": t.due_date.isoformat() if t.due_date else None,
-            "client_id": str(t.client_id) if t.client_id else None,
-        }
+    Servi depuis l'instantané du jour, rafraîchi en job après chaque modification
+    (quelques secondes de décalage possibles ; `fresh=true` pour forcer le calcul)."""
+    return await get_digest(db, fresh=fresh, read_db=read_db)
 
-    def client_brief(c: Client) -> dict:
-        return {
-            "id": str(c.id),
-            "company_name": c.company_name,
-            "status": c.status.value,
-            "pipeline_stage": c.pipeline_stage.value,
-            "next_action_date": c.next_action_date.isoformat() if c.next_action_date else None,
-            "notes": c.notes,
-        }
 
-    return {
-        "date": start.date().isoformat(),
-        "tasks_overdue": [task_brief(t) for t in tasks_overdue],
-        "tasks_due_today": [task_brief(t) for t in tasks_due_today],
-        "client_next_actions": [client_brief(c) for c in actions],
-        "subscription_renewals_7d": [
-            {
-                "id": str(f.id),
-                "name": f.name,
-                "amount": float(f.amount),
-                "currency": f.currency,
-                "renewal_date": f.renewal_date.isoformat() if f.renewal_date else None,
-            }
-            for f in renewals
-        ],
-    }
+# ========== DASHBOARD STATS ==========
+STATS_COALESCE_TTL = float(os.getenv("STATS_COALESCE_TTL", "2"))
 
 
-# ========== DASHBOARD STATS ==========
 @app.get("/stats", response_model=DashboardStats, tags=["Dashboard"])
+@coalesce(ttl=STATS_COALESCE_TTL)
 async def get_dashboard_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Retourne les statistiques pour le dashboard."""
+    """Retourne les statistiques pour le dashboard.
+
+    Requêtes simultanées regroupées en un seul calcul, résultat gardé
+    `STATS_COALESCE_TTL` secondes (agrégats : quelques secondes de retard admises)."""
     return await build_dashboard_stats(db)
@@ -0,0 +1,89 @@
+"""Accès programmatique à Alembic : migrate.py, init_db.py et vérification au démarrage.
+
+Au démarrage, chaque process lit `alembic_version` et la compare à la révision
+head des scripts : si elles sont égales, aucune DDL, un seul SELECT. Sinon, la
+montée de version est faite par un seul process sous `pg_advisory_lock` ; les
+autres attendent le verrou, relisent la version et repartent sans rien faire.
+Le même verrou est pris par `python migrate.py`, qui ne peut donc pas tourner
+en même temps qu'un démarrage.
+"""
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+MIGRATION_LOCK = text("SELECT pg_advisory_lock(hashtext('aetheria_schema_migration'))")
+MIGRATION_UNLOCK = text("SELECT pg_advisory_unlock(hashtext('aetheria_schema_migration'))")
+
+# false : un schéma en retard empêche le démarrage (migrations lancées à part).
+SCHEMA_AUTO_UPGRADE = os.getenv("SCHEMA_AUTO_UPGRADE", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+
+class SchemaOutdated(RuntimeError):
+    """La base n'est pas à la révision attendue par le code."""
+
+
+def alembic_config() -> Config:
+    """Config Alembic indépendante du répertoire courant."""
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    config.set_main_option("prepend_sys_path", str(BACKEND_DIR))
+    return config
+
+
+def upgrade(revision: str = "head") -> None:
+    """Applique les migrations (bloquant : à appeler hors boucle asyncio)."""
+    command.upgrade(alembic_config(), revision)
+
+
+@lru_cache(maxsize=1)
+def head_revision() -> str | None:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+async def current_revision(conn: AsyncConnection) -> str | None:
+    exists = await conn.scalar(text("SELECT to_regclass('alembic_version') IS NOT NULL"))
+    if not exists:
+        return None
+    return await conn.scalar(text("SELECT version_num FROM alembic_version"))
+
+
+def _upgrade_on(connection: Connection) -> None:
+    config = alembic_config()
+    # Connexion fournie : env.py ne reconfigure pas le logging et ne reprend pas le verrou.
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+async def ensure_schema(engine: AsyncEngine) -> str:
+    """Vérifie (et au besoin monte) la version du schéma ; renvoie ce qui a été fait."""
+    head = head_revision()
+    async with engine.connect() as conn:
+        if await current_revision(conn) == head:
+            return "current"
+        if not SCHEMA_AUTO_UPGRADE:
+            raise SchemaOutdated(
+                f"Database schema is not at revision {head}: run `python migrate.py upgrade`"
+            )
+
+        await conn.execute(MIGRATION_LOCK)
+        # Verrou de session : il survit au commit, qui laisse Alembic gérer ses transactions.
+        await conn.commit()
+        try:
+            if await current_revision(conn) == head:
+                await conn.commit()
+                return "upgraded by another process"
+            await conn.commit()
+            await conn.run_sync(_upgrade_on)
+            return f"upgraded to {head}"
+        finally:
+            await conn.execute(MIGRATION_UNLOCK)
+            await conn.commit()
@@ -1,8 +1,8 @@
 """SQLAlchemy Models - Tous les modèles regroupés ici."""
 import uuid
-from datetime import datetime
-from sqlalchemy import String, Text, DateTime, Boolean, Enum as SQLEnum, Numeric, Date, ARRAY, ForeignKey, BigInteger
-from sqlalchemy.dialects.postgresql import UUID
+from datetime import date, datetime
+from sqlalchemy import Column, Table, String, Text, DateTime, Boolean, Enum as SQLEnum, Numeric, Date, ARRAY, ForeignKey, BigInteger, Integer, Index, Computed, Float, func, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .database import Base
 import enum
@@ -64,6 +64,18 @@ class ProjectStatus(str, enum.Enum):
     ARCHIVED = "Archived"
 
 
+class ExtractionStatus(str, enum.Enum):
+    DONE = "Done"
+    UNSUPPORTED = "Unsupported"
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
+
+
 # ========== MODELS ==========
 class User(Base):
     """Table User pour l'authentification."""
@@ -80,11 +92,17 @@ class User(Base):
 class Client(Base):
     """Table Clients - CRM et Prospection."""
     __tablename__ = "clients"
+    __table_args__ = (
+        Index(
+            "ix_clients_next_action_date", "next_action_date",
+            postgresql_where=text("next_action_date IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     company_name: Mapped[str] = mapped_column(String(255), nullable=False)
     contact_person: Mapped[str | None] = mapped_column(String(255), nullable=True)
-    status: Mapped[ClientStatus] = mapped_column(SQLEnum(ClientStatus), default=ClientStatus.PROSPECT)
+    status: Mapped[ClientStatus] = mapped_column(SQLEnum(ClientStatus), default=ClientStatus.PROSPECT, index=True)
     pipeline_stage: Mapped[PipelineStage] = mapped_column(SQLEnum(PipelineStage), default=PipelineStage.NEW)
     priority: Mapped[Priority] = mapped_column(SQLEnum(Priority), default=Priority.MEDIUM)
     sector: Mapped[str | None] = mapped_column(String(255), nullable=True)
@@ -94,6 +112,10 @@ class Client(Base):
     next_action_date: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Entrée dans l'étape courante : durée passée dans l'étape sans relire l'historique.
+    pipeline_stage_since: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.utcnow, nullable=True)
+    # Passage au statut Archive : départ du délai avant la table froide (services/archive.py).
+    archived_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     # Relations
     tasks = relationship("Task", back_populates="client", cascade="all, delete-orphan")
@@ -101,9 +123,45 @@ class Client(Base):
     projects = relationship("Project", back_populates="client", cascade="all, delete-orphan")
 
 
+class PipelineTransition(Base):
+    """Table Pipeline Transitions - Historique append-only des changements d'étape."""
+    __tablename__ = "pipeline_transitions"
+    __table_args__ = (
+        Index("ix_pipeline_transitions_client_changed", "client_id", "changed_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    client_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("clients.id", ondelete="CASCADE"), nullable=False
+    )
+    # NULL : entrée initiale dans le pipeline (création du client).
+    from_stage: Mapped[PipelineStage | None] = mapped_column(SQLEnum(PipelineStage), nullable=True)
+    to_stage: Mapped[PipelineStage] = mapped_column(SQLEnum(PipelineStage), nullable=False)
+    seconds_in_from_stage: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    changed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PipelineWeeklyStat(Base):
+    """Table Pipeline Weekly Stats - Agrégats hebdomadaires par étape, tenus à jour à chaque transition."""
+    __tablename__ = "pipeline_weekly_stats"
+
+    week: Mapped[date] = mapped_column(Date, primary_key=True)
+    stage: Mapped[PipelineStage] = mapped_column(SQLEnum(PipelineStage), primary_key=True)
+    entered: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    advanced: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    regressed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Somme des durées passées dans l'étape par les clients qui en sont sortis cette semaine.
+    seconds_in_stage: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+
+
 class Task(Base):
     """Table Tasks - Kanban."""
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_status_due_date", "status", "due_date"),
+        # Filtres tags_any (&&) / tags_all (@>) de GET /tasks
+        Index("ix_tasks_tags", "tags", postgresql_using="gin"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title: Mapped[str] = mapped_column(String(500), nullable=False)
@@ -115,17 +173,54 @@ class Task(Base):
     actual_hours: Mapped[float | None] = mapped_column(Numeric(10, 2), nullable=True)
     tags: Mapped[list[str] | None] = mapped_column(ARRAY(String), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Passage en Done : départ du délai avant la table froide (services/archive.py).
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     
     # FK
-    client_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("clients.id"), nullable=True)
+    client_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("clients.id"), nullable=True, index=True)
     
     # Relations
     client = relationship("Client", back_populates="tasks")
 
 
+# Semaine d'effort d'une tâche (services/effort.py) : échéance, à défaut création.
+Index("ix_tasks_effort_at", func.coalesce(Task.due_date, Task.created_at))
+
+
+class EffortWeeklyRollup(Base):
+    """Table Effort Weekly Rollups - Heures estimées/réelles par semaine close, par client ou par tag."""
+    __tablename__ = "effort_weekly_rollups"
+
+    week: Mapped[date] = mapped_column(Date, primary_key=True)
+    # "client" (clé : id du client, '' sans client) ou "tag"
+    dimension: Mapped[str] = mapped_column(String(10), primary_key=True)
+    key: Mapped[str] = mapped_column(Text, primary_key=True)
+    tasks: Mapped[int] = mapped_column(Integer, nullable=False)
+    estimated_hours: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False)
+    actual_hours: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False)
+    # Tâches ayant estimation ET réel : base de l'écart et du dépassement
+    compared_tasks: Mapped[int] = mapped_column(Integer, nullable=False)
+    compared_estimated: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False)
+    compared_actual: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False)
+    overrun_tasks: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class EffortRollupWeek(Base):
+    """Table Effort Rollup Weeks - Semaines closes matérialisées ; `dirty` : à recalculer."""
+    __tablename__ = "effort_rollup_weeks"
+
+    week: Mapped[date] = mapped_column(Date, primary_key=True)
+    dirty: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    refreshed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
 class Finance(Base):
     """Table Finances - Dépenses et Abonnements."""
     __tablename__ = "finances"
+    __table_args__ = (
+        Index("ix_finances_type_billing_date", "type", "billing_date"),
+        Index("ix_finances_renewal_date", "renewal_date", postgresql_where=text("renewal_date IS NOT NULL")),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -133,16 +228,41 @@ class Finance(Base):
     category: Mapped[FinanceCategory] = mapped_column(SQLEnum(FinanceCategory), default=FinanceCategory.SOFTWARE)
     amount: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     currency: Mapped[str] = mapped_column(String(10), default="EUR")
+    # Montant converti en EUR à l'écriture (cf. services/fx.py) ; NULL si taux inconnu.
+    amount_eur: Mapped[float | None] = mapped_column(Numeric(12, 2), nullable=True)
     billing_date: Mapped[datetime] = mapped_column(Date, nullable=False)
     renewal_date: Mapped[datetime | None] = mapped_column(Date, nullable=True)
     is_paid: Mapped[bool] = mapped_column(Boolean, default=False)
-    invoice_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    invoice_path: Mapped[str | None] = mapped_column(String(500), nullable=True, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
+class FxRate(Base):
+    """Table FX Rates - Taux de change vers l'EUR (maintenus via fx_rates.py)."""
+    __tablename__ = "fx_rates"
+
+    currency: Mapped[str] = mapped_column(String(10), primary_key=True)
+    rate_to_eur: Mapped[float] = mapped_column(Numeric(18, 8), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class FinanceForecast(Base):
+    """Table Finance Forecast - Projection matérialisée des abonnements (mois x catégorie)."""
+    __tablename__ = "finance_forecast"
+
+    month: Mapped[date] = mapped_column(Date, primary_key=True)
+    category: Mapped[FinanceCategory] = mapped_column(SQLEnum(FinanceCategory), primary_key=True)
+    amount: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
+    subscriptions: Mapped[int] = mapped_column(Integer, nullable=False)
+    generated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class MeetingNote(Base):
     """Table Meeting Notes - Comptes-rendus."""
     __tablename__ = "meeting_notes"
+    __table_args__ = (
+        Index("ix_meeting_notes_attachments", "attachments", postgresql_using="gin"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title: Mapped[str] = mapped_column(String(500), nullable=False)
@@ -151,7 +271,7 @@ class MeetingNote(Base):
     attachments: Mapped[list[str] | None] = mapped_column(ARRAY(String), nullable=True)
     
     # FK
-    client_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("clients.id"), nullable=False)
+    client_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("clients.id"), nullable=False, index=True)
 
     # Relations
     client = relationship("Client", back_populates="meeting_notes")
@@ -168,7 +288,7 @@ class Project(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     # FK
-    client_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("clients.id"), nullable=False)
+    client_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("clients.id"), nullable=False, index=True)
 
     # Relations
     client = relationship("Client", back_populates="projects")
@@ -181,13 +301,142 @@ class Document(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(String(500), nullable=False)
-    file_path: Mapped[str] = mapped_column(String(1000), nullable=False)
+    file_path: Mapped[str] = mapped_column(String(1000), nullable=False, index=True)
     file_size: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     content_type: Mapped[str | None] = mapped_column(String(255), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     # FK
-    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False)
+    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, index=True)
 
     # Relations
     project = relationship("Project", back_populates="documents")
+
+
+class DocumentText(Base):
+    """Table Document Texts - Texte extrait des documents, indexé plein texte."""
+    __tablename__ = "document_texts"
+    __table_args__ = (
+        Index("ix_document_texts_tsv", "tsv", postgresql_using="gin"),
+    )
+
+    # ON DELETE CASCADE : les Document sont supprimés via DELETE … RETURNING ou
+    # par la cascade ORM de Project, sans passer par cette table.
+    document_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True
+    )
+    project_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    status: Mapped[ExtractionStatus] = mapped_column(SQLEnum(ExtractionStatus), nullable=False)
+    content: Mapped[str | None] = mapped_column(Text, nullable=True)
+    truncated: Mapped[bool] = mapped_column(Boolean, default=False)
+    tsv = mapped_column(
+        TSVECTOR, Computed("to_tsvector('french', coalesce(content, ''))", persisted=True)
+    )
+    extracted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class StorageQuarantine(Base):
+    """Table Storage Quarantine - Fichiers non référencés en attente de suppression."""
+    __tablename__ = "storage_quarantine"
+
+    key: Mapped[str] = mapped_column(String(1000), primary_key=True)
+    size: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    quarantined_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_seen_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class Job(Base):
+    """Table Jobs - File de travaux en arrière-plan (claim via FOR UPDATE SKIP LOCKED)."""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_claim", "status", "priority", "run_at"),
+        Index("ix_jobs_kind_status_run_at", "kind", "status", "run_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    status: Mapped[JobStatus] = mapped_column(SQLEnum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    priority: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=5, nullable=False)
+    run_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    result: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class AuditLog(Base):
+    """Table Audit Log - Qui a modifié quoi (écrite par lots, cf. services/audit.py)."""
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_entity", "entity", "entity_id", "ts"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    ts: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    entity: Mapped[str] = mapped_column(String(50), nullable=False)
+    entity_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    action: Mapped[str] = mapped_column(String(10), nullable=False)
+    actor_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
+    actor_email: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    # jwt (app web), api_key (bot n8n) ou system
+    via: Mapped[str] = mapped_column(String(20), nullable=False)
+    changes: Mapped[dict | None] = mapped_column(JSONB(none_as_null=True), nullable=True)
+
+
+class DigestSnapshot(Base):
+    """Table Digest Snapshots - Point du jour précalculé (servi par /today, poussé au webhook)."""
+    __tablename__ = "digest_snapshots"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    generated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    pushed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    pushed_fingerprint: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
+
+class RateLimitBucket(Base):
+    """Table Rate Limit Buckets - Seaux de jetons partagés entre workers (RATE_LIMIT_BACKEND=postgres)."""
+    __tablename__ = "rate_limit_buckets"
+    # UNLOGGED : état jetable, pas de WAL ; vidé après un crash de Postgres.
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    # Résultat du dernier tirage (le solde seul ne dit pas si le jeton a été pris)
+    allowed: Mapped[bool] = mapped_column(Boolean, nullable=False)
+
+
+# ========== TABLES FROIDES ==========
+def _cold_copy(source: Table) -> Table:
+    """`<table>_archive` : mêmes colonnes que `source`, sans clés étrangères, + moved_at.
+
+    Remplie et vidée par services/archive.py ; lue via `include_archived`.
+    """
+    return Table(
+        f"{source.name}_archive",
+        Base.metadata,
+        *(Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable) for column in source.columns),
+        Column("moved_at", DateTime, nullable=False, server_default=func.now()),
+    )
+
+
+tasks_archive = _cold_copy(Task.__table__)
+clients_archive = _cold_copy(Client.__table__)
+meeting_notes_archive = _cold_copy(MeetingNote.__table__)
+pipeline_transitions_archive = _cold_copy(PipelineTransition.__table__)
+
+Index("ix_tasks_archive_client_id", tasks_archive.c.client_id)
+Index("ix_tasks_archive_tags", tasks_archive.c.tags, postgresql_using="gin")
+Index("ix_tasks_archive_effort_at", func.coalesce(tasks_archive.c.due_date, tasks_archive.c.created_at))
+Index("ix_meeting_notes_archive_client_id", meeting_notes_archive.c.client_id)
+# Le GC du stockage vérifie aussi les pièces jointes des notes archivées.
+Index("ix_meeting_notes_archive_attachments", meeting_notes_archive.c.attachments, postgresql_using="gin")
+Index("ix_pipeline_transitions_archive_client_id", pipeline_transitions_archive.c.client_id)
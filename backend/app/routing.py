@@ -0,0 +1,52 @@
+"""Classe de route FastAPI : connexions rendues au pool dès la fin du handler.
+
+Par défaut, une dépendance à `yield` (get_db) n'est refermée qu'après la
+sérialisation de la réponse : la connexion reste prise pendant l'encodage JSON
+des grosses listes. Ici, les sessions de la requête sont fermées dès que le
+handler rend la main (succès ou exception) ; la sérialisation travaille sur des
+objets déjà chargés. Mesure aussi la durée de chaque requête pour les
+métriques de pool (services/pool_metrics.py).
+"""
+import asyncio
+import functools
+import time
+from typing import Any, Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from .database import release_request_sessions, request_sessions
+from .services.pool_metrics import current_route, record_request
+
+
+class SessionReleasingRoute(APIRoute):
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        endpoint = self.dependant.call
+        # Les handlers synchrones tournent dans un thread : rien à libérer depuis là.
+        if asyncio.iscoroutinefunction(endpoint) and not getattr(endpoint, "_releases_sessions", False):
+
+            @functools.wraps(endpoint)
+            async def call_and_release(*args: Any, **kwargs: Any) -> Any:
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    await release_request_sessions()
+
+            call_and_release._releases_sessions = True
+            self.dependant.call = call_and_release
+
+        handler = super().get_route_handler()
+        name = f"{','.join(sorted(self.methods))} {self.path}"
+
+        async def route_handler(request: Request) -> Response:
+            sessions_token = request_sessions.set([])
+            route_token = current_route.set(name)
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                record_request(name, time.perf_counter() - started)
+                current_route.reset(route_token)
+                request_sessions.reset(sessions_token)
+
+        return route_handler
@@ -2,8 +2,8 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime, date
 from uuid import UUID
-from typing import Optional
-from .models import ClientStatus, PipelineStage, Priority, CompanySize, TaskStatus, FinanceType, FinanceCategory, ProjectStatus
+from typing import Any, Literal, Optional
+from .models import ClientStatus, PipelineStage, Priority, CompanySize, TaskStatus, FinanceType, FinanceCategory, ProjectStatus, JobStatus
 
 
 # ========== USER SCHEMAS ==========
@@ -72,10 +72,33 @@ class ClientUpdate(BaseModel):
 class ClientOut(ClientBase):
     id: UUID
     created_at: datetime
+    archived_at: Optional[datetime] = None
     
     model_config = ConfigDict(from_attributes=True)
 
 
+class PipelineStageStats(BaseModel):
+    stage: PipelineStage
+    entered: int
+    advanced: int
+    regressed: int
+    conversion_rate: Optional[float] = None
+    avg_days_in_stage: Optional[float] = None
+    current: Optional[int] = None
+
+
+class PipelineWeek(BaseModel):
+    week: date
+    stages: list[PipelineStageStats]
+
+
+class PipelineAnalytics(BaseModel):
+    weeks: int
+    start: date
+    stages: list[PipelineStageStats]
+    by_week: list[PipelineWeek]
+
+
 # ========== TASK SCHEMAS ==========
 class TaskBase(BaseModel):
     title: str
@@ -108,10 +131,36 @@ class TaskUpdate(BaseModel):
 class TaskOut(TaskBase):
     id: UUID
     created_at: datetime
+    completed_at: Optional[datetime] = None
     
     model_config = ConfigDict(from_attributes=True)
 
 
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+
+class EffortGroup(BaseModel):
+    key: Optional[str] = None
+    label: str
+    tasks: int
+    estimated_hours: float
+    actual_hours: float
+    # Écart et dépassement sur les seules tâches ayant estimation et réel
+    compared_tasks: int
+    variance_hours: float
+    overrun_ratio: Optional[float] = None
+    overrun_tasks: int
+
+
+class EffortReport(BaseModel):
+    group_by: str
+    start: date
+    end: date
+    groups: list[EffortGroup]
+
+
 # ========== FINANCE SCHEMAS ==========
 class FinanceBase(BaseModel):
     name: str
@@ -143,11 +192,37 @@ class FinanceUpdate(BaseModel):
 
 class FinanceOut(FinanceBase):
     id: UUID
+    amount_eur: Optional[float] = None
     created_at: datetime
     
     model_config = ConfigDict(from_attributes=True)
 
 
+class FinanceTimeseriesBucket(BaseModel):
+    bucket: date
+    total: float
+    groups: dict[str, float]
+
+
+class FinanceTimeseries(BaseModel):
+    granularity: str
+    group_by: Optional[str] = None
+    buckets: list[FinanceTimeseriesBucket]
+
+
+class FinanceForecastMonth(BaseModel):
+    month: date
+    total: float
+    categories: dict[str, float]
+
+
+class FinanceForecastOut(BaseModel):
+    horizon_months: int
+    generated_at: Optional[datetime] = None
+    total: float
+    months: list[FinanceForecastMonth]
+
+
 # ========== MEETING NOTE SCHEMAS ==========
 class MeetingNoteBase(BaseModel):
     title: str
@@ -214,6 +289,56 @@ class DocumentOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class DocumentSearchHit(BaseModel):
+    id: UUID
+    name: str
+    project_id: UUID
+    content_type: Optional[str] = None
+    rank: float
+    snippet: Optional[str] = None
+
+
+# ========== BATCH SCHEMAS ==========
+class BatchOperation(BaseModel):
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"]
+    # Chemin de l'API, query string comprise : "/tasks?tags_any=dev"
+    path: str
+    body: Optional[Any] = None
+
+
+class BatchRequest(BaseModel):
+    requests: list[BatchOperation]
+    # Tout ou rien : une transaction, arrêt à la première sous-requête en erreur
+    atomic: bool = False
+
+
+class BatchResult(BaseModel):
+    status: int
+    body: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: list[BatchResult]
+
+
+# ========== JOB SCHEMAS ==========
+class JobOut(BaseModel):
+    id: UUID
+    kind: str
+    status: JobStatus
+    priority: int
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    last_error: Optional[str] = None
+    result: Optional[dict[str, Any]] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 # ========== STATS SCHEMA ==========
 class DashboardStats(BaseModel):
     total_mrr: float
@@ -222,3 +347,18 @@ class DashboardStats(BaseModel):
     active_clients_count: int
     pending_tasks_count: int
     tasks_due_today: int
+
+
+# ========== AUDIT SCHEMAS ==========
+class AuditEventOut(BaseModel):
+    id: int
+    ts: datetime
+    entity: str
+    entity_id: UUID
+    action: str
+    actor_id: Optional[UUID] = None
+    actor_email: Optional[str] = None
+    via: str
+    changes: Optional[dict[str, Any]] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,249 @@
+"""Hot/cold split of finished tasks and archived clients.
+
+Done tasks and Archive clients are rarely read again, yet every query on
+``tasks`` and ``clients`` (kanban lists, ``/today``, dashboard counts) walks
+past them. The ``archive_cold_rows`` job moves them into ``<table>_archive``
+tables with the same columns (``models._cold_copy``). This keeps the hot tables
+and their indexes small enough to stay in shared buffers:
+
+- tasks in ``Done`` for more than ``ARCHIVE_TASKS_AFTER_DAYS`` (``completed_at``);
+- clients in ``Archive`` for more than ``ARCHIVE_CLIENTS_AFTER_DAYS``
+  (``archived_at``), together with their meeting notes, tasks and pipeline
+  history. Clients that still have projects stay hot, because their documents
+  and stored files are not moved.
+
+Each batch is one ``WITH moved AS (DELETE … RETURNING …) INSERT INTO …_archive``
+statement per table, in one transaction. A row is therefore always in exactly
+one of the two tables. Cold tables carry no foreign keys: an archived task may
+point to a hot client.
+
+Declarative partitioning was not used. ``clients`` is referenced by foreign keys,
+which a partitioned parent cannot serve on ``id`` alone, and the split depends on
+age as well as status.
+
+Reads opt in with ``include_archived``. ``with_archived(Model)`` is an ORM
+entity over ``hot UNION ALL cold``. Postgres pushes filters into both branches,
+so lookups stay index-driven on each side. ``restore_client`` / ``restore_task``
+move rows back, and writes only ever target the hot tables.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from functools import cache
+from typing import Any, TypeVar
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import Table, case, func, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ..database import AsyncSessionLocal
+from ..models import (
+    Client,
+    ClientStatus,
+    MeetingNote,
+    PipelineTransition,
+    Task,
+    TaskStatus,
+    clients_archive,
+    meeting_notes_archive,
+    pipeline_transitions_archive,
+    tasks_archive,
+)
+from .daily_digest import schedule_digest_refresh
+from .jobs import job_handler
+from .task_tags import invalidate_tag_counts
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT")
+
+ARCHIVE_JOB = "archive_cold_rows"
+ARCHIVE_TASKS_AFTER_DAYS = int(os.getenv("ARCHIVE_TASKS_AFTER_DAYS", "90"))
+ARCHIVE_CLIENTS_AFTER_DAYS = int(os.getenv("ARCHIVE_CLIENTS_AFTER_DAYS", "30"))
+# Lignes par transaction : verrous et WAL bornés, les écritures concurrentes passent entre deux lots.
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+_COLD = {
+    Task.__table__: tasks_archive,
+    Client.__table__: clients_archive,
+    MeetingNote.__table__: meeting_notes_archive,
+    PipelineTransition.__table__: pipeline_transitions_archive,
+}
+
+
+def _column_list(table: Table) -> str:
+    return ", ".join(column.name for column in table.columns)
+
+
+# `tasks` chaude et froide, pour les requêtes SQL brutes (services/effort.py).
+ALL_TASKS_SQL = (
+    f"(SELECT {_column_list(Task.__table__)} FROM tasks "
+    f"UNION ALL SELECT {_column_list(Task.__table__)} FROM tasks_archive)"
+)
+
+
+@cache
+def with_archived(model: type[ModelT]) -> type[ModelT]:
+    """Read-only ORM entity over the hot and cold rows of ``model``."""
+    hot = model.__table__
+    cold = _COLD[hot]
+    rows = union_all(select(*hot.columns), select(*(cold.c[column.name] for column in hot.columns)))
+    return aliased(model, rows.subquery(f"{hot.name}_all"))
+
+
+def entity_for(model: type[ModelT], include_archived: bool) -> type[ModelT]:
+    return with_archived(model) if include_archived else model
+
+
+# ========== ÉTAT FROID ==========
+def stamp_cold_since(model: Any, values: dict[str, Any]) -> None:
+    """Set ``completed_at`` / ``archived_at`` in an update payload that changes ``status``.
+
+    Entering the cold status keeps the first stamp (a repeated ``status=Done``
+    does not restart the delay); leaving it clears the stamp.
+    """
+    if "status" not in values:
+        return
+    column, cold_status = _cold_since(model)
+    if values["status"] == cold_status:
+        now = datetime.utcnow()
+        values[column.key] = case((model.status == cold_status, func.coalesce(column, now)), else_=now)
+    else:
+        values[column.key] = None
+
+
+def cold_since_on_create(model: Any, status_value: Any) -> dict[str, Any]:
+    column, cold_status = _cold_since(model)
+    return {column.key: datetime.utcnow() if status_value == cold_status else None}
+
+
+def _cold_since(model: Any) -> tuple[Any, Any]:
+    if model is Task:
+        return Task.completed_at, TaskStatus.DONE
+    return Client.archived_at, ClientStatus.ARCHIVE
+
+
+# ========== DÉPLACEMENTS ==========
+async def _move(db: AsyncSession, source: Table, target: Table, where: str, params: dict[str, Any]) -> int:
+    columns = _column_list(source if source in _COLD else target)
+    result = await db.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {source.name} WHERE {where} RETURNING {columns}) "
+            f"INSERT INTO {target.name} ({columns}) SELECT {columns} FROM moved"
+        ),
+        params,
+    )
+    return result.rowcount
+
+
+async def _archive_tasks(db: AsyncSession, cutoff: datetime) -> int:
+    where = (
+        "id IN (SELECT id FROM tasks WHERE status = 'DONE' AND completed_at < :cutoff "
+        "LIMIT :batch FOR UPDATE SKIP LOCKED)"
+    )
+    return await _move(db, Task.__table__, tasks_archive, where, {"cutoff": cutoff, "batch": ARCHIVE_BATCH_SIZE})
+
+
+async def _archive_clients(db: AsyncSession, cutoff: datetime) -> dict[str, int]:
+    result = await db.execute(
+        text(
+            "SELECT c.id FROM clients c WHERE c.status = 'ARCHIVE' AND c.archived_at < :cutoff "
+            "AND NOT EXISTS (SELECT 1 FROM projects p WHERE p.client_id = c.id) "
+            "LIMIT :batch FOR UPDATE SKIP LOCKED"
+        ),
+        {"cutoff": cutoff, "batch": ARCHIVE_BATCH_SIZE},
+    )
+    ids = list(result.scalars().all())
+    moved = {"clients": 0, "client_tasks": 0, "meeting_notes": 0}
+    if not ids:
+        return moved
+    params = {"ids": ids}
+    # Enfants d'abord : leurs clés étrangères visent la ligne client.
+    moved["client_tasks"] = await _move(db, Task.__table__, tasks_archive, "client_id = ANY(:ids)", params)
+    moved["meeting_notes"] = await _move(db, MeetingNote.__table__, meeting_notes_archive, "client_id = ANY(:ids)", params)
+    # Sinon supprimé par ON DELETE CASCADE avec le client.
+    await _move(db, PipelineTransition.__table__, pipeline_transitions_archive, "client_id = ANY(:ids)", params)
+    moved["clients"] = await _move(db, Client.__table__, clients_archive, "id = ANY(:ids)", params)
+    return moved
+
+
+async def archive_cold_rows(now: datetime | None = None) -> dict[str, int]:
+    """Move every eligible row, one batch per transaction."""
+    now = now or datetime.utcnow()
+    totals = {"tasks": 0, "clients": 0, "client_tasks": 0, "meeting_notes": 0}
+    async with AsyncSessionLocal() as db:
+        while True:
+            moved = await _archive_clients(db, now - timedelta(days=ARCHIVE_CLIENTS_AFTER_DAYS))
+            if moved["clients"]:
+                # Les tâches ouvertes d'un client archivé quittent /today.
+                await schedule_digest_refresh(db)
+            await db.commit()
+            for key, count in moved.items():
+                totals[key] += count
+            if moved["clients"] < ARCHIVE_BATCH_SIZE:
+                break
+        while True:
+            count = await _archive_tasks(db, now - timedelta(days=ARCHIVE_TASKS_AFTER_DAYS))
+            await db.commit()
+            totals["tasks"] += count
+            if count < ARCHIVE_BATCH_SIZE:
+                break
+    if totals["tasks"] or totals["client_tasks"]:
+        invalidate_tag_counts()
+    logger.info("Cold rows archived", extra={"fields": totals})
+    return totals
+
+
+@job_handler(ARCHIVE_JOB, every=timedelta(hours=24))
+async def run_archive(payload: dict[str, Any]) -> dict[str, Any]:
+    return await archive_cold_rows()
+
+
+async def restore_task(db: AsyncSession, task_id: UUID) -> None:
+    """Move an archived task back to ``tasks`` (caller commits).
+
+    Its Done delay restarts, so the next run does not archive it straight away.
+    """
+    result = await db.execute(select(tasks_archive.c.client_id).where(tasks_archive.c.id == task_id))
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Archived task not found")
+    if row.client_id is not None:
+        archived_client = await db.scalar(select(clients_archive.c.id).where(clients_archive.c.id == row.client_id))
+        if archived_client is not None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="Client is archived: restore the client first"
+            )
+    await _move(db, tasks_archive, Task.__table__, "id = :id", {"id": task_id})
+    await db.execute(
+        text("UPDATE tasks SET completed_at = :now WHERE id = :id AND status = 'DONE'"),
+        {"id": task_id, "now": datetime.utcnow()},
+    )
+    invalidate_tag_counts()
+
+
+async def restore_client(db: AsyncSession, client_id: UUID) -> None:
+    """Move an archived client back with its notes, tasks and pipeline history (caller commits).
+
+    The client keeps its ``Archive`` status with a fresh ``archived_at``: it
+    gets a full delay to be reactivated before the next move.
+    """
+    params = {"id": client_id}
+    if not await _move(db, clients_archive, Client.__table__, "id = :id", params):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Archived client not found")
+    await db.execute(
+        text("UPDATE clients SET archived_at = :now WHERE id = :id AND status = 'ARCHIVE'"),
+        {**params, "now": datetime.utcnow()},
+    )
+    await _move(db, pipeline_transitions_archive, PipelineTransition.__table__, "client_id = :id", params)
+    await _move(db, meeting_notes_archive, MeetingNote.__table__, "client_id = :id", params)
+    await _move(db, tasks_archive, Task.__table__, "client_id = :id", params)
+    invalidate_tag_counts()
+
+
+async def delete_archived_tasks(db: AsyncSession, client_id: UUID) -> None:
+    """Cold tasks of a client being deleted (the ORM cascade only sees hot rows)."""
+    await db.execute(tasks_archive.delete().where(tasks_archive.c.client_id == client_id))
@@ -0,0 +1,190 @@
+"""Audit log of every mutation, buffered in memory and written in batches.
+
+Handlers call ``record_*`` after their commit. The call only builds a dict and
+puts it on a bounded ``asyncio.Queue``: the request never waits for an audit
+INSERT. An ``AuditWriter`` task drains the queue. It waits for a first event,
+collects up to ``AUDIT_BATCH_SIZE`` events or waits ``AUDIT_FLUSH_INTERVAL``
+seconds, then writes them with a single multi-row INSERT. ``stop()`` flushes
+whatever is still buffered, so a clean shutdown loses nothing.
+
+If the queue is full (database down for a long time), new events are dropped
+and counted instead of blocking writes. The drop count is logged.
+
+Inside ``deferred_events()`` (an atomic ``POST /batch``), events are held
+back and only queued by ``publish()`` once the enclosing transaction commits.
+
+The actor is the authenticated principal. ``get_current_user`` stores it in a
+context variable together with how it authenticated (``jwt`` or ``api_key``,
+i.e. the n8n bot), so handlers don't have to pass it around.
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Iterator, NamedTuple
+from uuid import UUID
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import insert
+
+from ..database import AsyncSessionLocal
+from ..models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+
+
+class Actor(NamedTuple):
+    user_id: UUID | None
+    email: str | None
+    via: str
+
+
+_current_actor: ContextVar[Actor | None] = ContextVar("audit_actor", default=None)
+_deferred: ContextVar[list[dict[str, Any]] | None] = ContextVar("audit_deferred", default=None)
+_queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=AUDIT_QUEUE_SIZE)
+_dropped = 0
+
+
+def set_current_actor(user: Any, via: str) -> None:
+    _current_actor.set(Actor(user.id, user.email, via))
+
+
+def current_actor() -> Actor | None:
+    return _current_actor.get()
+
+
+def _columns(obj: Any) -> dict[str, Any]:
+    values = {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+    return {key: value for key, value in values.items() if key != "id" and value is not None}
+
+
+def _entity(obj: Any) -> str:
+    return obj.__tablename__
+
+
+def record(entity: str, entity_id: Any, action: str, changes: dict[str, list[Any]] | None) -> None:
+    """Queue one audit event (never blocks, never raises on a full buffer)."""
+    actor = _current_actor.get() or Actor(None, None, "system")
+    event = {
+        "ts": datetime.utcnow(),
+        "entity": entity,
+        "entity_id": entity_id,
+        "action": action,
+        "actor_id": actor.user_id,
+        "actor_email": actor.email,
+        "via": actor.via,
+        "changes": jsonable_encoder(changes) if changes else None,
+    }
+    deferred = _deferred.get()
+    if deferred is not None:
+        deferred.append(event)
+    else:
+        _enqueue(event)
+
+
+def _enqueue(event: dict[str, Any]) -> None:
+    global _dropped
+    try:
+        _queue.put_nowait(event)
+    except asyncio.QueueFull:
+        _dropped += 1
+        if _dropped == 1 or _dropped % 1000 == 0:
+            logger.warning("Audit buffer full: %d event(s) dropped", _dropped)
+
+
+@contextmanager
+def deferred_events() -> Iterator[list[dict[str, Any]]]:
+    """Collect the events recorded in this context instead of queueing them."""
+    events: list[dict[str, Any]] = []
+    token = _deferred.set(events)
+    try:
+        yield events
+    finally:
+        _deferred.reset(token)
+
+
+def publish(events: list[dict[str, Any]]) -> None:
+    """Queue events held by ``deferred_events()``, once their transaction committed."""
+    for event in events:
+        _enqueue(event)
+
+
+def record_create(obj: Any) -> None:
+    record(_entity(obj), obj.id, "create", {k: [None, v] for k, v in _columns(obj).items()})
+
+
+def record_update(obj: Any, changes: dict[str, list[Any]]) -> None:
+    if changes:
+        record(_entity(obj), obj.id, "update", changes)
+
+
+def record_delete(obj: Any) -> None:
+    record(_entity(obj), obj.id, "delete", {k: [v, None] for k, v in _columns(obj).items()})
+
+
+async def _write(batch: list[dict[str, Any]]) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(AuditLog).values(batch))
+        await db.commit()
+
+
+class AuditWriter:
+    """Background task moving buffered events to ``audit_log``."""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name="audit-writer")
+
+    async def stop(self) -> None:
+        # Pas d'annulation : un lot en cours d'écriture va jusqu'au commit.
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        while not _queue.empty():
+            await self._flush(self._drain([]))
+
+    def _drain(self, batch: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        while len(batch) < AUDIT_BATCH_SIZE and not _queue.empty():
+            batch.append(_queue.get_nowait())
+        return batch
+
+    async def _flush(self, batch: list[dict[str, Any]]) -> None:
+        for attempt in range(3):
+            try:
+                await _write(batch)
+                return
+            except Exception as exc:
+                error = exc
+                await asyncio.sleep(2**attempt)
+        logger.error("Audit flush failed, %d event(s) lost: %r", len(batch), error)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            try:
+                batch = [await asyncio.wait_for(_queue.get(), AUDIT_FLUSH_INTERVAL)]
+            except asyncio.TimeoutError:
+                continue
+            deadline = loop.time() + AUDIT_FLUSH_INTERVAL
+            while len(self._drain(batch)) < AUDIT_BATCH_SIZE and not self._stopping.is_set():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
@@ -0,0 +1,201 @@
+"""In-process execution of ``POST /batch`` sub-requests.
+
+The assistant chains several REST calls per user message (``get_today``, then
+``list_clients``, then ``update_task``…). A batch runs them in order, in the
+same process, against the existing route handlers. Each sub-request goes
+through ``app.router`` with the exception handlers of the app: same
+validation, same responses, same status codes as over HTTP. The outer HTTP
+middlewares (CORS, rate limiting, write guard) only see ``POST /batch``
+itself. The runner checks the write guard for each sub-request and takes a
+token from the caller's bucket for the sub-request's route class: a batch of
+writes costs as many ``write`` tokens as the same calls over HTTP.
+
+Sub-requests carry the caller's credentials and share one DB session, exposed
+to ``get_db`` / ``get_read_db`` through ``database.batch_session``:
+
+- by default each sub-request commits as it would over HTTP, and a failure
+  does not stop the following ones;
+- with ``atomic=True`` the session runs inside one outer transaction. Handler
+  commits only release a savepoint. The first sub-request answering 4xx/5xx
+  rolls everything back and the remaining ones are not run (424). Audit events
+  are published only once the outer transaction commits.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Callable, Mapping
+from urllib.parse import urlsplit
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.middleware.exceptions import ExceptionMiddleware
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Scope
+
+from ..database import AsyncSessionLocal, batch_session, engine
+from .audit import deferred_events, publish
+from .finance_timeseries import invalidate_finance_timeseries
+from .rate_limit import RATE_LIMIT_ENABLED, charge
+from .single_flight import flights
+from .task_tags import invalidate_tag_counts
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+
+# En-têtes de la requête parente transmis aux sous-requêtes (même principal).
+FORWARDED_HEADERS = {b"authorization", b"x-api-key", b"user-agent", b"x-forwarded-for"}
+
+Guard = Callable[[str, Mapping[str, str]], Response | None]
+
+
+def router_app(app: Any) -> ASGIApp:
+    """``app.router`` wrapped with the app's exception handlers (HTTPException, 422…)."""
+    handlers = {key: value for key, value in app.exception_handlers.items() if key not in (500, Exception)}
+    return ExceptionMiddleware(app.router, handlers=handlers)
+
+
+async def _call(asgi: ASGIApp, scope: Scope, body: bytes) -> tuple[int, dict[str, str], bytes]:
+    chunks: list[bytes] = []
+    start: dict[str, Any] = {}
+    request_sent = False
+    response_complete = asyncio.Event()
+
+    async def receive() -> Message:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            start.update(message)
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    await asgi(scope, receive, send)
+    headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in start.get("headers", [])}
+    return start.get("status", 500), headers, b"".join(chunks)
+
+
+def _decode(headers: dict[str, str], body: bytes) -> Any:
+    if not body:
+        return None
+    if headers.get("content-type", "").startswith("application/json"):
+        return json.loads(body)
+    return body.decode("utf-8", errors="replace")
+
+
+class BatchRunner:
+    def __init__(self, asgi: ASGIApp, parent: Scope, guard: Guard, principal: tuple[str, str]) -> None:
+        self.asgi = asgi
+        self.parent = parent
+        self.guard = guard
+        self.principal = principal
+        self.headers = [(key, value) for key, value in parent["headers"] if key in FORWARDED_HEADERS]
+
+    def _scope(self, method: str, path: str, body: bytes) -> Scope:
+        url = urlsplit(path)
+        headers = list(self.headers)
+        if body:
+            headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        return {
+            **{key: self.parent[key] for key in ("app", "client", "server", "scheme", "http_version") if key in self.parent},
+            "type": "http",
+            "method": method,
+            "path": url.path,
+            "raw_path": url.path.encode(),
+            "root_path": "",
+            "query_string": url.query.encode(),
+            "headers": headers,
+            "state": {},
+        }
+
+    async def run_one(self, method: str, path: str, body: Any) -> dict[str, Any]:
+        if not path.startswith("/") or urlsplit(path).path == "/batch":
+            return {"status": 400, "body": {"detail": "Invalid sub-request path"}}
+        blocked = self.guard(method, {key.decode(): value.decode() for key, value in self.headers})
+        if blocked is not None:
+            return {"status": blocked.status_code, "body": json.loads(blocked.body)}
+        if RATE_LIMIT_ENABLED:
+            refused = await charge(self.principal, method, urlsplit(path).path)
+            if refused is not None:
+                return {"status": refused.status_code, "body": json.loads(refused.body)}
+        payload = json.dumps(body).encode() if body is not None else b""
+        try:
+            status, headers, content = await _call(self.asgi, self._scope(method, path, payload), payload)
+        except Exception:
+            logger.exception("Batch sub-request failed", extra={"fields": {"method": method, "path": path}})
+            return {"status": 500, "body": {"detail": "Internal Server Error"}}
+        return {"status": status, "body": _decode(headers, content)}
+
+    async def run(self, operations: list[tuple[str, str, Any]], atomic: bool) -> dict[str, Any]:
+        if atomic:
+            return await self._run_atomic(operations)
+        results = []
+        async with AsyncSessionLocal() as session:
+            token = batch_session.set(session)
+            try:
+                for method, path, body in operations:
+                    result = await self.run_one(method, path, body)
+                    if result["status"] >= 400:
+                        # Repart d'une transaction propre pour la sous-requête suivante.
+                        await session.rollback()
+                    results.append(result)
+            finally:
+                batch_session.reset(token)
+        return {"committed": True, "results": results}
+
+    async def _run_atomic(self, operations: list[tuple[str, str, Any]]) -> dict[str, Any]:
+        results: list[dict[str, Any]] = []
+        async with engine.connect() as conn:
+            outer = await conn.begin()
+            # commit() des handlers : RELEASE SAVEPOINT ; rollback() : ROLLBACK TO SAVEPOINT.
+            session = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+            token = batch_session.set(session)
+            failed = False
+            try:
+                with deferred_events() as events:
+                    for method, path, body in operations:
+                        if failed:
+                            results.append(
+                                {"status": 424, "body": {"detail": "Not run: an earlier sub-request failed"}}
+                            )
+                            continue
+                        result = await self.run_one(method, path, body)
+                        failed = result["status"] >= 400
+                        results.append(result)
+            finally:
+                batch_session.reset(token)
+                await session.close()
+                if failed:
+                    await outer.rollback()
+            if not failed:
+                await outer.commit()
+                publish(events)
+                _after_commit()
+        return {"committed": not failed, "results": results}
+
+
+def _after_commit() -> None:
+    # Les caches vidés par les handlers ont pu être remplis entre-temps par une
+    # lecture qui ne voyait pas encore le lot : on les vide de nouveau.
+    invalidate_finance_timeseries()
+    invalidate_tag_counts()
+    flights.invalidate()
+
+
+async def run_batch(
+    app: Any,
+    scope: Scope,
+    operations: list[tuple[str, str, Any]],
+    atomic: bool,
+    guard: Guard,
+    principal: tuple[str, str],
+) -> dict[str, Any]:
+    return await BatchRunner(router_app(app), scope, guard, principal).run(operations, atomic)
@@ -0,0 +1,97 @@
+"""Single-statement write path shared by the CRUD routes.
+
+``update_returning`` and ``delete_returning`` replace the classic
+SELECT -> setattr -> COMMIT -> refresh sequence by one ``UPDATE … RETURNING``
+(or ``DELETE … RETURNING``) statement followed by the COMMIT: two round trips
+instead of four, and the pool connection is released as soon as the commit
+returns.
+
+These helpers bypass ORM relationship cascades. Models whose deletion relies on
+``cascade="all, delete-orphan"`` (``Client``, ``Project``) must keep going
+through ``session.delete()``.
+"""
+
+from typing import Any, Mapping, TypeVar
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+ModelT = TypeVar("ModelT")
+
+
+def _not_found(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+
+
+async def update_returning(
+    db: AsyncSession,
+    model: type[ModelT],
+    object_id: Any,
+    values: Mapping[str, Any],
+    not_found: str,
+) -> tuple[ModelT, dict[str, list[Any]]]:
+    """Run ``UPDATE … SET … WHERE id = … RETURNING *`` and commit.
+
+    Returns the updated object and the ``{field: [old, new]}`` diff of the
+    fields whose value actually changed. The previous values come from a
+    locked ``FROM (SELECT … FOR UPDATE)`` in the same statement, so the diff
+    costs no extra round trip.
+
+    Zero matched rows raise a 404. An empty payload degrades to a plain SELECT
+    so that a no-op PUT still returns the current row.
+    """
+    if not values:
+        result = await db.execute(select(model).where(model.id == object_id))
+        obj = result.scalar_one_or_none()
+        if obj is None:
+            raise _not_found(not_found)
+        await db.commit()
+        return obj, {}
+
+    fields = list(values)
+    previous = (
+        select(model.id, *(getattr(model, field) for field in fields))
+        .where(model.id == object_id)
+        .with_for_update()
+        .subquery("previous")
+    )
+    stmt = (
+        update(model)
+        .where(model.id == previous.c.id)
+        .values(**values)
+        .returning(model, *(previous.c[field] for field in fields))
+    )
+    result = await db.execute(stmt)
+    row = result.first()
+    if row is None:
+        raise _not_found(not_found)
+    await db.commit()
+
+    obj = row[0]
+    changes = {
+        field: [old, getattr(obj, field)]
+        for field, old in zip(fields, row[1:])
+        if old != getattr(obj, field)
+    }
+    return obj, changes
+
+
+async def delete_returning(
+    db: AsyncSession,
+    model: type[ModelT],
+    object_id: Any,
+    not_found: str,
+) -> ModelT:
+    """Run ``DELETE … WHERE id = … RETURNING *`` and commit.
+
+    The deleted row is returned (e.g. for a file path that must be cleaned up
+    once the row is gone, or for the audit log). Zero matched rows raise a 404.
+    """
+    stmt = delete(model).where(model.id == object_id).returning(model)
+    result = await db.execute(stmt)
+    obj = result.scalar_one_or_none()
+    if obj is None:
+        raise _not_found(not_found)
+    await db.commit()
+    return obj
@@ -0,0 +1,264 @@
+"""Daily digest ("/today"): precomputed snapshot, morning schedule and webhook push.
+
+The digest (overdue and due tasks, due client actions, renewals within 7
+days) is computed by the ``digest.refresh`` job and stored in
+``digest_snapshots``, one row per day. ``/today`` serves that row, so polling
+costs one primary-key read.
+
+A refresh is queued:
+
+- every morning at ``DIGEST_HOUR`` by ``DigestScheduler``, an asyncio task in
+  the API process. It takes a transaction-level advisory lock, so with several
+  replicas only one of them enqueues;
+- after every write to tasks, clients or finances (``schedule_digest_refresh``,
+  debounced by ``DIGEST_DEBOUNCE_SECONDS`` so a burst of writes costs one
+  refresh).
+
+When the digest content changes, the refresh queues a ``digest.push`` job to
+``DIGEST_WEBHOOK_URL`` (e.g. an n8n webhook). A failed push is retried by the
+job queue with its usual exponential backoff. Pushes are deduplicated on a
+hash of the content, so a refresh that changes nothing sends nothing.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import urllib.request
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from sqlalchemy import select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from ..models import Client, ClientStatus, DigestSnapshot, Finance, FinanceType, Task, TaskStatus
+from .jobs import enqueue, enqueue_once, job_handler
+
+logger = logging.getLogger(__name__)
+
+DIGEST_JOB = "digest.refresh"
+DIGEST_PUSH_JOB = "digest.push"
+
+DIGEST_HOUR = int(os.getenv("DIGEST_HOUR", "8"))
+DIGEST_DEBOUNCE_SECONDS = float(os.getenv("DIGEST_DEBOUNCE_SECONDS", "5"))
+DIGEST_WEBHOOK_URL = os.getenv("DIGEST_WEBHOOK_URL", "").strip()
+DIGEST_WEBHOOK_TIMEOUT = float(os.getenv("DIGEST_WEBHOOK_TIMEOUT", "10"))
+DIGEST_PUSH_MAX_ATTEMPTS = int(os.getenv("DIGEST_PUSH_MAX_ATTEMPTS", "8"))
+
+
+def _task_brief(t: Task) -> dict:
+    return {
+        "id": str(t.id),
+        "title": t.title,
+        "status": t.status.value,
+        "priority": t.priority.value,
+        "due_date": t.due_date.isoformat() if t.due_date else None,
+        "client_id": str(t.client_id) if t.client_id else None,
+    }
+
+
+def _client_brief(c: Client) -> dict:
+    return {
+        "id": str(c.id),
+        "company_name": c.company_name,
+        "status": c.status.value,
+        "pipeline_stage": c.pipeline_stage.value,
+        "next_action_date": c.next_action_date.isoformat() if c.next_action_date else None,
+        "notes": c.notes,
+    }
+
+
+async def build_digest(db: AsyncSession, now: datetime | None = None) -> dict[str, Any]:
+    """Compute the digest from the live tables (the query ``/today`` used to run)."""
+    now = now or datetime.now()
+    start = datetime(now.year, now.month, now.day)
+    end = start + timedelta(days=1)
+
+    # Tâches non terminées avec échéance passée ou aujourd'hui
+    result = await db.execute(
+        select(Task)
+        .where(Task.status != TaskStatus.DONE, Task.due_date.is_not(None), Task.due_date < end)
+        .order_by(Task.due_date)
+    )
+    due_tasks = result.scalars().all()
+
+    # Clients (non archivés) avec une prochaine action passée ou aujourd'hui
+    result = await db.execute(
+        select(Client)
+        .where(
+            Client.status != ClientStatus.ARCHIVE,
+            Client.next_action_date.is_not(None),
+            Client.next_action_date < end,
+        )
+        .order_by(Client.next_action_date)
+    )
+    actions = result.scalars().all()
+
+    # Abonnements à renouveler dans les 7 jours
+    result = await db.execute(
+        select(Finance)
+        .where(
+            Finance.type == FinanceType.SUBSCRIPTION,
+            Finance.renewal_date.is_not(None),
+            Finance.renewal_date >= start.date(),
+            Finance.renewal_date <= (start + timedelta(days=7)).date(),
+        )
+        .order_by(Finance.renewal_date)
+    )
+    renewals = result.scalars().all()
+
+    return {
+        "date": start.date().isoformat(),
+        "tasks_overdue": [_task_brief(t) for t in due_tasks if t.due_date < start],
+        "tasks_due_today": [_task_brief(t) for t in due_tasks if t.due_date >= start],
+        "client_next_actions": [_client_brief(c) for c in actions],
+        "subscription_renewals_7d": [
+            {
+                "id": str(f.id),
+                "name": f.name,
+                "amount": float(f.amount),
+                "currency": f.currency,
+                "renewal_date": f.renewal_date.isoformat() if f.renewal_date else None,
+            }
+            for f in renewals
+        ],
+    }
+
+
+def _fingerprint(payload: dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+async def store_digest(db: AsyncSession, now: datetime | None = None) -> tuple[DigestSnapshot, bool]:
+    """Compute and upsert today's snapshot; returns it and whether a push is due."""
+    payload = await build_digest(db, now)
+    fingerprint = _fingerprint(payload)
+    stmt = insert(DigestSnapshot).values(
+        day=date.fromisoformat(payload["date"]),
+        payload=payload,
+        fingerprint=fingerprint,
+        generated_at=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DigestSnapshot.day],
+        set_={
+            "payload": stmt.excluded.payload,
+            "fingerprint": stmt.excluded.fingerprint,
+            "generated_at": stmt.excluded.generated_at,
+        },
+    ).returning(DigestSnapshot)
+    snapshot = (await db.execute(stmt)).scalar_one()
+    return snapshot, snapshot.pushed_fingerprint != fingerprint
+
+
+async def get_digest(db: AsyncSession, fresh: bool = False, read_db: AsyncSession | None = None) -> dict[str, Any]:
+    """Today's snapshot; computed inline (without push) if the refresh has not run yet.
+
+    The snapshot is read from ``read_db`` (a replica) when given; computing and
+    storing it always goes through ``db``, the primary.
+    """
+    if not fresh:
+        result = await (read_db or db).execute(select(DigestSnapshot.payload).where(DigestSnapshot.day == date.today()))
+        payload = result.scalar_one_or_none()
+        if payload is not None:
+            return payload
+    snapshot, _ = await store_digest(db)
+    await db.commit()
+    return snapshot.payload
+
+
+async def schedule_digest_refresh(db: AsyncSession) -> None:
+    """Call from task, client and finance writes, before the commit."""
+    await enqueue_once(db, DIGEST_JOB, delay=timedelta(seconds=DIGEST_DEBOUNCE_SECONDS))
+
+
+@job_handler(DIGEST_JOB)
+async def run_digest_refresh(payload: dict[str, Any]) -> dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        snapshot, changed = await store_digest(db)
+        push = changed and bool(DIGEST_WEBHOOK_URL)
+        if push:
+            enqueue(db, DIGEST_PUSH_JOB, {"day": snapshot.day.isoformat()}, max_attempts=DIGEST_PUSH_MAX_ATTEMPTS)
+        await db.commit()
+    return {"day": snapshot.day.isoformat(), "changed": changed, "push": push}
+
+
+def _post_json(url: str, body: bytes) -> int:
+    request = urllib.request.Request(
+        url, data=body, method="POST", headers={"Content-Type": "application/json"}
+    )
+    # urlopen lève HTTPError sur 4xx/5xx : le job repart alors en backoff.
+    with urllib.request.urlopen(request, timeout=DIGEST_WEBHOOK_TIMEOUT) as response:
+        return response.status
+
+
+@job_handler(DIGEST_PUSH_JOB)
+async def run_digest_push(payload: dict[str, Any]) -> dict[str, Any]:
+    day = date.fromisoformat(payload["day"])
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(DigestSnapshot).where(DigestSnapshot.day == day))
+        snapshot = result.scalar_one_or_none()
+        if snapshot is None or snapshot.pushed_fingerprint == snapshot.fingerprint:
+            return {"skipped": True}
+        # Toujours la dernière version du jour, même pour un push mis en file plus tôt.
+        status = await asyncio.to_thread(_post_json, DIGEST_WEBHOOK_URL, json.dumps(snapshot.payload).encode())
+        await db.execute(
+            update(DigestSnapshot)
+            .where(DigestSnapshot.day == day)
+            .values(pushed_at=datetime.utcnow(), pushed_fingerprint=snapshot.fingerprint)
+        )
+        await db.commit()
+    return {"status": status}
+
+
+def next_run(now: datetime) -> datetime:
+    run = now.replace(hour=DIGEST_HOUR, minute=0, second=0, microsecond=0)
+    return run if run > now else run + timedelta(days=1)
+
+
+class DigestScheduler:
+    """Queues the morning refresh; one runner at a time across API replicas."""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name="digest-scheduler")
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _trigger(self, only_if_missing: bool) -> None:
+        async with AsyncSessionLocal() as db:
+            locked = await db.execute(text("SELECT pg_try_advisory_xact_lock(hashtext('digest_scheduler'))"))
+            if not locked.scalar():
+                return
+            if only_if_missing:
+                result = await db.execute(select(DigestSnapshot.day).where(DigestSnapshot.day == date.today()))
+                if result.first() is not None:
+                    return
+            await enqueue_once(db, DIGEST_JOB, {"reason": "scheduled"})
+            await db.commit()
+
+    async def _run(self) -> None:
+        # Rattrapage au démarrage : pas encore de digest aujourd'hui (API arrêtée à l'heure prévue).
+        only_if_missing = True
+        while not self._stopping.is_set():
+            try:
+                await self._trigger(only_if_missing)
+            except Exception:
+                logger.exception("Digest scheduler failed")
+            only_if_missing = False
+            delay = (next_run(datetime.now()) - datetime.now()).total_seconds()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
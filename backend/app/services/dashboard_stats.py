@@ -10,17 +10,17 @@ from ..schemas import DashboardStats
 
 
 async def get_recurring_expenses_monthly(db: AsyncSession) -> float:
-    """All subscriptions are treated as monthly recurring expenses."""
+    """All subscriptions are treated as monthly recurring expenses (in EUR)."""
     result = await db.execute(
-        select(func.sum(Finance.amount)).where(Finance.type == FinanceType.SUBSCRIPTION)
+        select(func.sum(Finance.amount_eur)).where(Finance.type == FinanceType.SUBSCRIPTION)
     )
     return float(result.scalar() or 0.0)
 
 
 async def get_one_off_expenses_for_month(db: AsyncSession, reference: datetime) -> float:
-    """One-off expenses billed in the target month."""
+    """One-off expenses billed in the target month (in EUR)."""
     result = await db.execute(
-        select(func.sum(Finance.amount)).where(
+        select(func.sum(Finance.amount_eur)).where(
             Finance.type == FinanceType.ONE_OFF,
             extract("month", Finance.billing_date) == reference.month,
             extract("year", Finance.billing_date) == reference.year,
@@ -0,0 +1,136 @@
+"""Post-upload text extraction and full-text search over project documents.
+
+``upload_project_document`` only enqueues a ``documents.extract_text`` job; the
+job handler runs the CPU-bound extraction in a process pool so neither the API
+event loop nor the job workers are blocked, then upserts ``document_texts``.
+Search uses the generated ``tsv`` column and its GIN index.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from ..models import Document, DocumentText, ExtractionStatus
+from .jobs import enqueue, job_handler
+from .storage import get_storage
+from .text_extraction import UnsupportedDocument, extract_text
+
+EXTRACT_JOB = "documents.extract_text"
+
+# to_tsvector refuse les entrées > 1 Mo : on borne le texte conservé.
+DOC_TEXT_MAX_CHARS = int(os.getenv("DOC_TEXT_MAX_CHARS", "500000"))
+DOC_TEXT_PROCESSES = int(os.getenv("DOC_TEXT_PROCESSES", "2"))
+TS_CONFIG = "french"
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: never fork a process that owns an event loop and DB connections.
+        _pool = ProcessPoolExecutor(
+            max_workers=DOC_TEXT_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def enqueue_extraction(db: AsyncSession, document_id: UUID) -> None:
+    enqueue(db, EXTRACT_JOB, {"document_id": str(document_id)})
+
+
+async def _save(document: Document, status: ExtractionStatus, content: str | None, truncated: bool) -> None:
+    values = {
+        "document_id": document.id,
+        "project_id": document.project_id,
+        "status": status,
+        "content": content,
+        "truncated": truncated,
+        "extracted_at": datetime.utcnow(),
+    }
+    stmt = insert(DocumentText).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DocumentText.document_id],
+        set_={key: stmt.excluded[key] for key in values if key != "document_id"},
+    )
+    async with AsyncSessionLocal() as db:
+        await db.execute(stmt)
+        await db.commit()
+
+
+@job_handler(EXTRACT_JOB)
+async def extract_document_text(payload: dict[str, Any]) -> dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Document).where(Document.id == UUID(payload["document_id"])))
+        document = result.scalar_one_or_none()
+    if document is None:
+        return {"status": "skipped", "reason": "document deleted"}
+
+    loop = asyncio.get_running_loop()
+    try:
+        # S3 : copie temporaire en streaming, supprimée après extraction.
+        async with get_storage().local_path(document.file_path) as path:
+            content, truncated = await loop.run_in_executor(
+                _get_pool(),
+                extract_text,
+                str(path),
+                document.name,
+                document.content_type,
+                DOC_TEXT_MAX_CHARS,
+            )
+    except UnsupportedDocument as exc:
+        await _save(document, ExtractionStatus.UNSUPPORTED, None, False)
+        return {"status": "unsupported", "reason": str(exc)}
+
+    await _save(document, ExtractionStatus.DONE, content, truncated)
+    return {"status": "done", "chars": len(content), "truncated": truncated}
+
+
+async def search_documents(
+    db: AsyncSession,
+    query: str,
+    project_id: UUID | None = None,
+    limit: int = 20,
+) -> list[dict[str, Any]]:
+    ts_query = func.websearch_to_tsquery(literal_column(f"'{TS_CONFIG}'"), query)
+    rank = func.ts_rank_cd(DocumentText.tsv, ts_query).label("rank")
+    matches = (
+        select(DocumentText.document_id, DocumentText.content, rank)
+        .where(DocumentText.tsv.op("@@")(ts_query))
+        .order_by(rank.desc())
+        .limit(limit)
+    )
+    if project_id is not None:
+        matches = matches.where(DocumentText.project_id == project_id)
+    matches = matches.subquery()
+
+    # ts_headline relit le texte : on ne le calcule que pour les `limit` meilleurs.
+    snippet = func.ts_headline(
+        literal_column(f"'{TS_CONFIG}'"),
+        matches.c.content,
+        ts_query,
+        "MaxFragments=2, MaxWords=25, MinWords=8",
+    ).label("snippet")
+    result = await db.execute(
+        select(Document.id, Document.name, Document.project_id, Document.content_type, matches.c.rank, snippet)
+        .join(matches, matches.c.document_id == Document.id)
+        .order_by(matches.c.rank.desc())
+    )
+    return [dict(row._mapping) for row in result]
@@ -0,0 +1,279 @@
+"""Estimated vs actual hours, per client, tag or week.
+
+A task counts in the week of its due date, or of its creation when it has no
+due date (``COALESCE(due_date, created_at)``, indexed by ``ix_tasks_effort_at``).
+Archived tasks count too: every query reads ``tasks`` and ``tasks_archive``
+(``archive.ALL_TASKS_SQL``), and ``ix_tasks_archive_effort_at`` covers the cold side.
+Variance and overrun only consider tasks that have both an estimate and an
+actual: an estimated task that is still open is not an overrun.
+
+Closed weeks (before the current one) are materialized in
+``effort_weekly_rollups``, one row per (week, dimension, key). The ``client``
+dimension gives the client and week reports; the ``tag`` dimension counts a task
+once under each of its tags. ``effort_rollup_weeks`` lists the materialized
+weeks. Task writes that touch a closed week flag it ``dirty`` in their own
+transaction and queue a debounced refresh, which recomputes only the flagged
+weeks and the weeks that closed since the last run.
+
+A report reads the rollups of the fresh weeks in its range and computes the
+rest (open weeks, weeks not refreshed yet) from ``tasks``, by index range. Its
+cost depends on the number of weeks and keys, not on the number of tasks.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Literal
+from uuid import UUID
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from ..models import Client
+from .archive import ALL_TASKS_SQL, with_archived
+from .jobs import enqueue_once, job_handler
+from .pipeline import week_start
+
+EFFORT_JOB = "effort_rollup_refresh"
+EFFORT_DEBOUNCE_SECONDS = 10
+
+GroupBy = Literal["client", "week", "tag"]
+
+# Champs de tâche dont la modification change un agrégat d'effort
+EFFORT_FIELDS = {"due_date", "estimated_hours", "actual_hours", "tags", "client_id"}
+
+EFFORT_AT = "COALESCE(t.due_date, t.created_at)"
+
+_KEYS = {
+    "client": "COALESCE(t.client_id::text, '')",
+    "tag": "tag",
+}
+
+# Agrégats par (semaine, clé) sur les tâches dont la date d'effort vérifie {where}.
+_AGG_SQL = f"""
+SELECT
+    date_trunc('week', {EFFORT_AT})::date AS week,
+    {{key}} AS key,
+    count(*) AS tasks,
+    COALESCE(sum(t.estimated_hours), 0) AS estimated_hours,
+    COALESCE(sum(t.actual_hours), 0) AS actual_hours,
+    count(*) FILTER (WHERE t.estimated_hours IS NOT NULL AND t.actual_hours IS NOT NULL) AS compared_tasks,
+    COALESCE(sum(t.estimated_hours) FILTER (WHERE t.actual_hours IS NOT NULL), 0) AS compared_estimated,
+    COALESCE(sum(t.actual_hours) FILTER (WHERE t.estimated_hours IS NOT NULL), 0) AS compared_actual,
+    count(*) FILTER (WHERE t.actual_hours > t.estimated_hours) AS overrun_tasks
+FROM {ALL_TASKS_SQL} t {{join}}
+WHERE {{where}}
+GROUP BY 1, 2
+"""
+
+_COLUMNS = (
+    "tasks, estimated_hours, actual_hours, compared_tasks, compared_estimated, compared_actual, overrun_tasks"
+)
+
+
+def _agg_sql(dimension: str, where: str) -> str:
+    join = "CROSS JOIN unnest(t.tags) AS tag" if dimension == "tag" else ""
+    return _AGG_SQL.format(key=_KEYS[dimension], join=join, where=where)
+
+
+def _ranges_sql(ranges: list[tuple[date, date]], params: dict[str, Any]) -> str:
+    """``effort_at`` in any of the [start, end) ranges: one index range scan each."""
+    if not ranges:
+        return "false"
+    clauses = []
+    for index, (start, end) in enumerate(ranges):
+        params[f"start_{index}"] = datetime.combine(start, datetime.min.time())
+        params[f"end_{index}"] = datetime.combine(end, datetime.min.time())
+        clauses.append(f"({EFFORT_AT} >= :start_{index} AND {EFFORT_AT} < :end_{index})")
+    return " OR ".join(clauses)
+
+
+# ========== MAINTENANCE ==========
+_MARK_SQL = f"""
+INSERT INTO effort_rollup_weeks (week, dirty)
+SELECT DISTINCT date_trunc('week', effort_at)::date, true
+FROM (
+    SELECT unnest(CAST(:at AS timestamp[])) AS effort_at
+    UNION ALL
+    -- created_at aussi : c'est la date d'effort si l'écriture retire l'échéance.
+    SELECT unnest(ARRAY[{EFFORT_AT}, t.created_at]) FROM {ALL_TASKS_SQL} t WHERE t.id = :task_id OR t.client_id = :client_id
+) AS touched
+WHERE effort_at < :current_week
+ON CONFLICT (week) DO UPDATE SET dirty = true
+"""
+
+
+async def mark_effort_weeks(
+    db: AsyncSession,
+    *at: datetime | None,
+    task_id: UUID | None = None,
+    client_id: UUID | None = None,
+) -> None:
+    """Flag the closed weeks touched by a task write, before the commit.
+
+    ``at``: effort dates the write brings in; ``task_id`` / ``client_id``: rows
+    whose current effort date the write takes away (update, delete). Writes in
+    the open weeks flag nothing: reports compute those weeks live.
+    """
+    current = datetime.combine(week_start(date.today()), datetime.min.time())
+    stamps = [stamp.replace(tzinfo=None) for stamp in at if stamp is not None]
+    if task_id is None and client_id is None and all(stamp >= current for stamp in stamps):
+        return
+    result = await db.execute(
+        text(_MARK_SQL),
+        {"at": stamps, "task_id": task_id, "client_id": client_id, "current_week": current},
+    )
+    if result.rowcount:
+        await enqueue_once(db, EFFORT_JOB, delay=timedelta(seconds=EFFORT_DEBOUNCE_SECONDS))
+
+
+async def schedule_effort_refresh(db: AsyncSession) -> None:
+    await enqueue_once(db, EFFORT_JOB)
+
+
+async def refresh_effort_rollups(db: AsyncSession, today: date | None = None) -> int:
+    """Recompute the dirty closed weeks and materialize the newly closed ones."""
+    current = week_start(today or date.today())
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('effort_rollups'))"))
+    # Semaines closes jamais matérialisées, depuis la première tâche.
+    await db.execute(
+        text(
+            f"""
+            INSERT INTO effort_rollup_weeks (week, dirty)
+            SELECT week::date, true
+            FROM generate_series(
+                (SELECT date_trunc('week', min({EFFORT_AT})) FROM {ALL_TASKS_SQL} t),
+                CAST(:current_week AS date) - 7,
+                interval '1 week'
+            ) AS week
+            ON CONFLICT (week) DO NOTHING
+            """
+        ),
+        {"current_week": current},
+    )
+    # Réclamer les semaines à recalculer : une écriture qui les marque de nouveau
+    # attend notre COMMIT, puis relance un refresh.
+    result = await db.execute(
+        text(
+            "UPDATE effort_rollup_weeks SET dirty = false, refreshed_at = now() "
+            "WHERE dirty AND week < :current_week RETURNING week"
+        ),
+        {"current_week": current},
+    )
+    weeks = sorted(result.scalars().all())
+    if weeks:
+        params: dict[str, Any] = {"weeks": weeks}
+        where = f"({_ranges_sql([(weeks[0], weeks[-1] + timedelta(weeks=1))], params)})"
+        where += f" AND date_trunc('week', {EFFORT_AT})::date = ANY(:weeks)"
+        await db.execute(text("DELETE FROM effort_weekly_rollups WHERE week = ANY(:weeks)"), {"weeks": weeks})
+        for dimension in _KEYS:
+            await db.execute(
+                text(
+                    f"INSERT INTO effort_weekly_rollups (week, dimension, key, {_COLUMNS}) "
+                    f"SELECT week, '{dimension}', key, {_COLUMNS} FROM ({_agg_sql(dimension, where)}) AS agg"
+                ),
+                params,
+            )
+    await db.commit()
+    return len(weeks)
+
+
+@job_handler(EFFORT_JOB, every=timedelta(hours=6))
+async def run_effort_refresh(payload: dict[str, Any]) -> dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        weeks = await refresh_effort_rollups(db)
+    return {"weeks": weeks}
+
+
+# ========== REPORT ==========
+def _row_stats(row: Any) -> dict[str, Any]:
+    compared_estimated = float(row.compared_estimated)
+    compared_actual = float(row.compared_actual)
+    return {
+        "tasks": int(row.tasks),
+        "estimated_hours": round(float(row.estimated_hours), 2),
+        "actual_hours": round(float(row.actual_hours), 2),
+        "compared_tasks": int(row.compared_tasks),
+        "variance_hours": round(compared_actual - compared_estimated, 2),
+        "overrun_ratio": round(compared_actual / compared_estimated, 4) if compared_estimated else None,
+        "overrun_tasks": int(row.overrun_tasks),
+    }
+
+
+async def effort_report(
+    db: AsyncSession, group_by: GroupBy, start: date, end: date, today: date | None = None
+) -> dict[str, Any]:
+    """Effort between the weeks of ``start`` and ``end`` (both included)."""
+    first_week, last_week = week_start(start), week_start(end)
+    current = week_start(today or date.today())
+    dimension = "tag" if group_by == "tag" else "client"
+
+    result = await db.execute(
+        text(
+            "SELECT week FROM effort_rollup_weeks "
+            "WHERE week BETWEEN :first_week AND :last_week AND week < :current_week AND NOT dirty"
+        ),
+        {"first_week": first_week, "last_week": last_week, "current_week": current},
+    )
+    fresh = set(result.scalars().all())
+
+    # Le reste est calculé depuis `tasks` : semaines ouvertes et semaines closes pas encore à jour.
+    live: list[tuple[date, date]] = []
+    week = first_week
+    while week <= last_week and week < current:
+        if week not in fresh:
+            live.append((week, week + timedelta(weeks=1)))
+        week += timedelta(weeks=1)
+    if last_week >= current:
+        live.append((max(first_week, current), last_week + timedelta(weeks=1)))
+
+    params: dict[str, Any] = {"dimension": dimension, "fresh": sorted(fresh)}
+    group = "week" if group_by == "week" else "key"
+    order = "grp" if group_by == "week" else "actual_hours DESC, grp"
+    result = await db.execute(
+        text(
+            f"""
+            WITH rows AS (
+                SELECT week, key, {_COLUMNS}
+                FROM effort_weekly_rollups
+                WHERE dimension = :dimension AND week = ANY(:fresh)
+                UNION ALL
+                {_agg_sql(dimension, _ranges_sql(live, params))}
+            )
+            SELECT {group} AS grp, sum(tasks) AS tasks, sum(estimated_hours) AS estimated_hours,
+                sum(actual_hours) AS actual_hours, sum(compared_tasks) AS compared_tasks,
+                sum(compared_estimated) AS compared_estimated, sum(compared_actual) AS compared_actual,
+                sum(overrun_tasks) AS overrun_tasks
+            FROM rows
+            GROUP BY 1
+            ORDER BY {order}
+            """
+        ),
+        params,
+    )
+    rows = result.all()
+
+    labels: dict[str, str] = {}
+    if group_by == "client":
+        ids = [UUID(row.grp) for row in rows if row.grp]
+        if ids:
+            # Clients archivés compris : leurs tâches restent dans le rapport.
+            clients = with_archived(Client)
+            names = await db.execute(select(clients.id, clients.company_name).where(clients.id.in_(ids)))
+            labels = {str(client_id): name for client_id, name in names.all()}
+
+    groups = []
+    for row in rows:
+        if group_by == "week":
+            key, label = row.grp.isoformat(), row.grp.isoformat()
+        elif group_by == "client":
+            key, label = row.grp or None, labels.get(row.grp, "Sans client") if row.grp else "Sans client"
+        else:
+            key, label = row.grp, row.grp
+        groups.append({"key": key, "label": label, **_row_stats(row)})
+
+    return {
+        "group_by": group_by,
+        "start": first_week,
+        "end": last_week + timedelta(days=6),
+        "groups": groups,
+    }
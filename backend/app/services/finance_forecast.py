@@ -0,0 +1,101 @@
+"""Forward cash-flow projection of subscriptions, materialized in ``finance_forecast``.
+
+Each subscription is expanded into its monthly occurrences over the next
+``FORECAST_MAX_MONTHS`` months with a ``generate_series`` lateral join,
+aggregated per month and category, and written in a single
+``DELETE`` + ``INSERT … SELECT`` transaction. Readers only ever scan the small
+materialized table.
+
+The refresh job is debounced-enqueued by every finance write, and also runs
+daily so the horizon rolls forward at month boundaries.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from ..models import FinanceForecast, FinanceType
+from .finance_timeseries import add_months
+from .jobs import enqueue_once, job_handler
+
+FORECAST_JOB = "finances.refresh_forecast"
+FORECAST_MIN_MONTHS = 12
+FORECAST_MAX_MONTHS = 36
+
+_EXPAND_SQL = text(
+    """
+    INSERT INTO finance_forecast (month, category, amount, subscriptions, generated_at)
+    SELECT occurrence.month::date, f.category, coalesce(sum(f.amount_eur), 0), count(*), :generated_at
+    FROM finances f
+    CROSS JOIN LATERAL generate_series(
+        greatest(date_trunc('month', f.billing_date), CAST(:first_month AS date)),
+        CAST(:last_month AS date),
+        interval '1 month'
+    ) AS occurrence(month)
+    WHERE f.type = :subscription
+    GROUP BY occurrence.month, f.category
+    """
+)
+
+
+async def schedule_forecast_refresh(db: AsyncSession) -> None:
+    """Call from finance writes, before the commit: the refresh ships with it."""
+    await enqueue_once(db, FORECAST_JOB)
+
+
+async def refresh_forecast(db: AsyncSession, today: date | None = None) -> int:
+    first_month = (today or date.today()).replace(day=1)
+    last_month = add_months(first_month, FORECAST_MAX_MONTHS - 1)
+    # Deux refresh concurrents se heurteraient sur la clé primaire : on les sérialise.
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('finance_forecast'))"))
+    await db.execute(delete(FinanceForecast))
+    result = await db.execute(
+        _EXPAND_SQL,
+        {
+            "first_month": first_month,
+            "last_month": last_month,
+            "generated_at": datetime.utcnow(),
+            "subscription": FinanceType.SUBSCRIPTION.name,
+        },
+    )
+    await db.commit()
+    return result.rowcount
+
+
+@job_handler(FORECAST_JOB, every=timedelta(hours=24))
+async def run_forecast_refresh(payload: dict[str, Any]) -> dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        rows = await refresh_forecast(db)
+    return {"rows": rows}
+
+
+async def get_forecast(db: AsyncSession, months: int, today: date | None = None) -> dict[str, Any]:
+    first_month = (today or date.today()).replace(day=1)
+    last_month = add_months(first_month, months - 1)
+    result = await db.execute(
+        select(FinanceForecast)
+        .where(FinanceForecast.month >= first_month, FinanceForecast.month <= last_month)
+        .order_by(FinanceForecast.month)
+    )
+    rows = result.scalars().all()
+
+    by_month: dict[date, dict[str, float]] = {}
+    for row in rows:
+        by_month.setdefault(row.month, {})[row.category.value] = float(row.amount)
+
+    series = []
+    month = first_month
+    while month <= last_month:
+        categories = by_month.get(month, {})
+        series.append({"month": month, "total": round(sum(categories.values()), 2), "categories": categories})
+        month = add_months(month, 1)
+
+    return {
+        "horizon_months": months,
+        "generated_at": max((row.generated_at for row in rows), default=None),
+        "total": round(sum(point["total"] for point in series), 2),
+        "months": series,
+    }
@@ -0,0 +1,161 @@
+"""Finance spend time series, computed in SQL and cached per closed period.
+
+Same accounting rule as ``dashboard_stats``: a subscription costs its amount
+every month from its first billing month on, and a one-off costs its amount in
+its billing month. The whole series comes from one statement. Subscriptions are
+expanded over a ``generate_series`` of months and one-offs are read by range on
+the ``(type, billing_date)`` index. Amounts are the persisted ``amount_eur``.
+
+Buckets are aligned on calendar months or quarters. A bucket that ended before
+the current month is closed and will not change, so its result is cached in the
+process. Finance writes clear the cache. ``FINANCE_TS_CACHE_TTL`` bounds how
+long other workers can serve stale data after a backdated edit.
+"""
+
+import os
+import time
+from datetime import date
+from typing import Literal
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import FinanceCategory, FinanceType
+
+Granularity = Literal["month", "quarter"]
+GroupBy = Literal["category", "type"]
+
+FINANCE_TS_CACHE_TTL = float(os.getenv("FINANCE_TS_CACHE_TTL", "3600"))
+
+_GROUP_EXPRESSIONS = {
+    None: "'total'",
+    "category": "f.category::text",
+    "type": "f.type::text",
+}
+# Les enums sont stockés par nom en base (SOFTWARE) : on renvoie leur valeur (Software).
+_GROUP_LABELS = {
+    "category": {member.name: member.value for member in FinanceCategory},
+    "type": {member.name: member.value for member in FinanceType},
+}
+
+_SERIES_SQL = """
+WITH months AS (
+    SELECT generate_series(CAST(:start AS date), CAST(:last_month AS date), interval '1 month')::date AS month
+),
+spend AS (
+    SELECT date_trunc('month', f.billing_date)::date AS month, {group} AS grp, sum(f.amount_eur) AS amount
+    FROM finances f
+    WHERE f.type = :one_off AND f.billing_date >= :start AND f.billing_date < :end
+    GROUP BY 1, 2
+    UNION ALL
+    SELECT m.month, {group} AS grp, sum(f.amount_eur) AS amount
+    FROM months m
+    JOIN finances f ON f.type = :subscription AND f.billing_date < m.month + interval '1 month'
+    GROUP BY 1, 2
+)
+SELECT date_trunc(:granularity, s.month)::date AS bucket, s.grp, sum(s.amount) AS amount
+FROM spend s
+GROUP BY 1, 2
+"""
+
+# (granularity, group_by, bucket_start) -> (cached_at, {group: amount})
+_closed_buckets: dict[tuple[str, str | None, date], tuple[float, dict[str, float]]] = {}
+
+
+def invalidate_finance_timeseries() -> None:
+    _closed_buckets.clear()
+
+
+def _bucket_start(day: date, granularity: Granularity) -> date:
+    month = day.month if granularity == "month" else 3 * ((day.month - 1) // 3) + 1
+    return date(day.year, month, 1)
+
+
+def add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bucket_months(granularity: Granularity) -> int:
+    return 1 if granularity == "month" else 3
+
+
+def bucket_range(start: date, end: date, granularity: Granularity) -> list[date]:
+    step = _bucket_months(granularity)
+    bucket = _bucket_start(start, granularity)
+    buckets = []
+    while bucket <= end:
+        buckets.append(bucket)
+        bucket = add_months(bucket, step)
+    return buckets
+
+
+def _cached(key: tuple[str, str | None, date]) -> dict[str, float] | None:
+    entry = _closed_buckets.get(key)
+    if entry is None or time.monotonic() - entry[0] > FINANCE_TS_CACHE_TTL:
+        return None
+    return entry[1]
+
+
+async def _query_buckets(
+    db: AsyncSession,
+    first: date,
+    last: date,
+    granularity: Granularity,
+    group_by: GroupBy | None,
+) -> dict[date, dict[str, float]]:
+    end = add_months(last, _bucket_months(granularity))
+    sql = text(_SERIES_SQL.format(group=_GROUP_EXPRESSIONS[group_by]))
+    result = await db.execute(
+        sql,
+        {
+            "start": first,
+            "last_month": add_months(end, -1),
+            "end": end,
+            "granularity": granularity,
+            "one_off": FinanceType.ONE_OFF.name,
+            "subscription": FinanceType.SUBSCRIPTION.name,
+        },
+    )
+    labels = _GROUP_LABELS.get(group_by, {})
+    buckets: dict[date, dict[str, float]] = {}
+    for bucket, group, amount in result:
+        buckets.setdefault(bucket, {})[labels.get(group, group)] = float(amount or 0)
+    return buckets
+
+
+async def finance_timeseries(
+    db: AsyncSession,
+    start: date,
+    end: date,
+    granularity: Granularity = "month",
+    group_by: GroupBy | None = None,
+    today: date | None = None,
+) -> list[dict]:
+    """Spend per bucket between ``start`` and ``end`` (both snapped to bucket starts)."""
+    current_month = _bucket_start(today or date.today(), "month")
+    buckets = bucket_range(start, end, granularity)
+    step = _bucket_months(granularity)
+
+    values: dict[date, dict[str, float]] = {}
+    missing: list[date] = []
+    for bucket in buckets:
+        closed = add_months(bucket, step) <= current_month
+        cached = _cached((granularity, group_by, bucket)) if closed else None
+        if cached is None:
+            missing.append(bucket)
+        else:
+            values[bucket] = cached
+
+    if missing:
+        fresh = await _query_buckets(db, missing[0], missing[-1], granularity, group_by)
+        now = time.monotonic()
+        for bucket in missing:
+            values[bucket] = fresh.get(bucket, {})
+            if add_months(bucket, step) <= current_month:
+                _closed_buckets[(granularity, group_by, bucket)] = (now, values[bucket])
+
+    return [
+        {"bucket": bucket, "total": round(sum(values[bucket].values()), 2), "groups": values[bucket]}
+        for bucket in buckets
+    ]
@@ -0,0 +1,85 @@
+"""Currency normalization: local FX rates and the persisted ``Finance.amount_eur``.
+
+``amount_eur`` is computed in SQL when a finance row is written, from a scalar
+lookup in ``fx_rates``. Aggregations can then stay a plain indexed
+``SUM(amount_eur)`` with no per-row conversion at query time. When rates change
+(``fx_rates.py`` CLI), the affected rows are recomputed with one bulk UPDATE.
+
+A currency with no known rate leaves ``amount_eur`` NULL. Such rows are left out
+of the totals until a rate is imported; ``fx_rates.py missing`` lists them.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Iterable, Mapping
+
+from sqlalchemy import Numeric, case, cast, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from ..models import Finance, FxRate
+
+BASE_CURRENCY = "EUR"
+
+
+def normalize_currency(code: str) -> str:
+    return code.strip().upper()
+
+
+def eur_rate(currency: Any) -> ColumnElement:
+    """SQL expression: rate converting ``currency`` to EUR (NULL if unknown)."""
+    code = func.upper(currency)
+    stored = select(FxRate.rate_to_eur).where(FxRate.currency == code).scalar_subquery()
+    return func.coalesce(stored, case((code == BASE_CURRENCY, literal(Decimal(1))), else_=None))
+
+
+def amount_eur(amount: Any, currency: Any) -> ColumnElement:
+    """SQL expression for the EUR amount; accepts Python values or columns."""
+    return func.round(cast(amount, Numeric(12, 2)) * eur_rate(currency), 2)
+
+
+def amount_eur_for_update(values: Mapping[str, Any]) -> ColumnElement | None:
+    """``amount_eur`` SET expression for a partial update, or None if untouched.
+
+    In an UPDATE, a column reference reads the value *before* the update, so the
+    unchanged side of (amount, currency) is taken from the row itself.
+    """
+    if "amount" not in values and "currency" not in values:
+        return None
+    return amount_eur(
+        values["amount"] if "amount" in values else Finance.amount,
+        values["currency"] if "currency" in values else Finance.currency,
+    )
+
+
+async def recompute_amounts_eur(db: AsyncSession, currencies: Iterable[str] | None = None) -> int:
+    """Bulk-recompute ``amount_eur`` (all rows, or only the given currencies)."""
+    stmt = update(Finance).values(amount_eur=amount_eur(Finance.amount, Finance.currency))
+    if currencies is not None:
+        stmt = stmt.where(func.upper(Finance.currency).in_([normalize_currency(c) for c in currencies]))
+    result = await db.execute(stmt.execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+async def upsert_rates(db: AsyncSession, rates: Mapping[str, Decimal]) -> None:
+    if not rates:
+        return
+    stmt = insert(FxRate).values(
+        [{"currency": normalize_currency(code), "rate_to_eur": rate} for code, rate in rates.items()]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FxRate.currency],
+        set_={"rate_to_eur": stmt.excluded.rate_to_eur, "updated_at": datetime.utcnow()},
+    )
+    await db.execute(stmt)
+
+
+async def currencies_missing_rate(db: AsyncSession) -> list[tuple[str, int]]:
+    result = await db.execute(
+        select(Finance.currency, func.count(Finance.id))
+        .where(Finance.amount_eur.is_(None))
+        .group_by(Finance.currency)
+        .order_by(Finance.currency)
+    )
+    return [(currency, count) for currency, count in result]
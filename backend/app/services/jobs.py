@@ -0,0 +1,321 @@
+"""Durable background jobs backed by the ``jobs`` table.
+
+Handlers enqueue work with ``enqueue()`` inside their own transaction, so a job
+only becomes visible once the data it refers to is committed. Workers claim jobs
+with ``FOR UPDATE SKIP LOCKED``: any number of workers (in-process or started
+with ``python -m app.worker``) can poll the same table without blocking each
+other or running a job twice.
+
+A claimed job stays invisible until ``locked_until`` (the visibility timeout,
+``JOB_VISIBILITY_TIMEOUT`` or the handler's own ``timeout=``), and the handler
+is cancelled when it runs past it. If a worker dies mid-job, the job is
+claimed again once that deadline passes.
+Failed attempts are retried with exponential backoff until ``max_attempts``.
+
+Handlers registered with ``every=`` are periodic: the worker pool makes sure one
+scheduled run (payload ``{"periodic": true}``) is queued at startup, and each
+finished scheduled run queues the next one. Runs of the same kind enqueued by
+writes (``enqueue_once``) do not chain.
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import and_, case, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from ..models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict[str, Any]], Awaitable[dict[str, Any] | None]]
+
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "5"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "3600"))
+
+# Modules declaring handlers with @job_handler; imported by load_handlers().
+HANDLER_MODULES: tuple[str, ...] = (
+    "app.services.document_index",
+    "app.services.storage_gc",
+    "app.services.finance_forecast",
+    "app.services.daily_digest",
+    "app.services.effort",
+    "app.services.archive",
+)
+
+_handlers: dict[str, JobHandler] = {}
+_periodic: dict[str, timedelta] = {}
+_timeouts: dict[str, int] = {}
+
+ACTIVE_STATUSES = (JobStatus.QUEUED, JobStatus.RUNNING)
+
+# Marks the runs queued by the scheduler: only those queue the next one.
+PERIODIC_PAYLOAD = {"periodic": True}
+
+
+def job_handler(
+    kind: str, every: timedelta | None = None, timeout: int | None = None
+) -> Callable[[JobHandler], JobHandler]:
+    """Register the coroutine that processes jobs of the given kind.
+
+    ``timeout`` (seconds) replaces ``JOB_VISIBILITY_TIMEOUT`` for jobs that
+    cannot be split into shorter runs.
+    """
+
+    def decorator(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        if every is not None:
+            _periodic[kind] = every
+        if timeout is not None:
+            _timeouts[kind] = timeout
+        return func
+
+    return decorator
+
+
+def load_handlers() -> None:
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: dict[str, Any] | None = None,
+    *,
+    priority: int = 0,
+    delay: timedelta | None = None,
+    max_attempts: int = 5,
+) -> Job:
+    """Add a job to the caller's session; it is persisted by the caller's commit."""
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        priority=priority,
+        max_attempts=max_attempts,
+        run_at=datetime.utcnow() + (delay or timedelta()),
+    )
+    db.add(job)
+    return job
+
+
+async def enqueue_once(
+    db: AsyncSession,
+    kind: str,
+    payload: dict[str, Any] | None = None,
+    *,
+    delay: timedelta | None = None,
+    **options: Any,
+) -> Job | None:
+    """Debounced enqueue: skip if a queued job of this kind will already run by then.
+
+    A *running* job does not count: it may have read the data before the
+    caller's change. Concurrent callers may still both enqueue, so only use it
+    for idempotent jobs (refreshes, recomputations).
+    """
+    run_at = datetime.utcnow() + (delay or timedelta())
+    result = await db.execute(
+        select(Job.id)
+        .where(Job.kind == kind, Job.status == JobStatus.QUEUED, Job.run_at <= run_at)
+        .limit(1)
+    )
+    if result.first() is not None:
+        return None
+    return enqueue(db, kind, payload, delay=delay, **options)
+
+
+async def _enqueue_periodic(db: AsyncSession, kind: str, delay: timedelta | None = None) -> None:
+    """Queue the next scheduled run of a periodic job unless one is already queued or running.
+
+    Every API and worker process calls this at startup: the advisory lock
+    serializes check and insert until the caller commits, so concurrent starts
+    cannot each queue a run (and each run then chain itself forever).
+    """
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"periodic_job:{kind}"})
+    result = await db.execute(
+        select(Job.id)
+        .where(Job.kind == kind, Job.status.in_(ACTIVE_STATUSES), Job.payload.contains(PERIODIC_PAYLOAD))
+        .limit(1)
+    )
+    if result.first() is None:
+        # Seul le marqueur : une exécution planifiée ne reprend pas les options d'un lancement manuel.
+        enqueue(db, kind, dict(PERIODIC_PAYLOAD), delay=delay)
+
+
+async def schedule_periodic_jobs() -> None:
+    """Queue a first run of every periodic job that has none pending."""
+    async with AsyncSessionLocal() as db:
+        for kind in _periodic:
+            await _enqueue_periodic(db, kind)
+        await db.commit()
+
+
+def job_timeout(kind: str) -> int:
+    return _timeouts.get(kind, JOB_VISIBILITY_TIMEOUT)
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    seconds = min(JOB_BACKOFF_BASE * (2 ** max(attempts - 1, 0)), JOB_BACKOFF_MAX)
+    return timedelta(seconds=seconds)
+
+
+async def claim_jobs(db: AsyncSession, limit: int = 1) -> list[Job]:
+    """Atomically claim up to ``limit`` runnable jobs, highest priority first.
+
+    Runnable means queued and due, or running with an expired visibility timeout.
+    """
+    now = datetime.utcnow()
+    locked_until = now + timedelta(seconds=JOB_VISIBILITY_TIMEOUT)
+    if _timeouts:
+        locked_until = case(
+            {kind: now + timedelta(seconds=seconds) for kind, seconds in _timeouts.items()},
+            value=Job.kind,
+            else_=locked_until,
+        )
+    candidates = (
+        select(Job.id)
+        .where(
+            or_(
+                and_(Job.status == JobStatus.QUEUED, Job.run_at <= now),
+                and_(Job.status == JobStatus.RUNNING, Job.locked_until < now),
+            )
+        )
+        .order_by(Job.priority.desc(), Job.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(Job)
+        .where(Job.id.in_(candidates.scalar_subquery()))
+        .values(
+            status=JobStatus.RUNNING,
+            attempts=Job.attempts + 1,
+            locked_until=locked_until,
+        )
+        .returning(Job)
+        .execution_options(synchronize_session=False)
+    )
+    jobs = list(result.scalars().all())
+    await db.commit()
+    return jobs
+
+
+async def _finish(job: Job, **values: Any) -> None:
+    # The attempts guard makes a late finish a no-op if the job was re-claimed
+    # after its visibility timeout expired.
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.attempts == job.attempts)
+            .values(locked_until=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        final = values.get("status") in (JobStatus.DONE, JobStatus.FAILED)
+        # Seules les exécutions planifiées enchaînent : un refresh déclenché par une
+        # écriture (enqueue_once) ne démarre pas une nouvelle chaîne.
+        if final and result.rowcount and job.kind in _periodic and job.payload.get("periodic"):
+            await _enqueue_periodic(db, job.kind, delay=_periodic[job.kind])
+        await db.commit()
+
+
+async def run_job(job: Job) -> None:
+    handler = _handlers.get(job.kind)
+    if handler is None:
+        await _finish(
+            job,
+            status=JobStatus.FAILED,
+            last_error=f"No handler registered for job kind '{job.kind}'",
+            finished_at=datetime.utcnow(),
+        )
+        return
+    if job.attempts > job.max_attempts:
+        await _finish(
+            job,
+            status=JobStatus.FAILED,
+            last_error=job.last_error or "Visibility timeout expired too many times",
+            finished_at=datetime.utcnow(),
+        )
+        return
+
+    try:
+        result = await asyncio.wait_for(handler(job.payload or {}), timeout=job_timeout(job.kind))
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+        logger.warning(
+            "Job attempt failed",
+            extra={"fields": {"job_id": job.id, "kind": job.kind, "attempt": job.attempts, "error": error}},
+        )
+        if job.attempts >= job.max_attempts:
+            await _finish(job, status=JobStatus.FAILED, last_error=error, finished_at=datetime.utcnow())
+        else:
+            await _finish(
+                job,
+                status=JobStatus.QUEUED,
+                last_error=error,
+                run_at=datetime.utcnow() + backoff_delay(job.attempts),
+            )
+        return
+
+    await _finish(job, status=JobStatus.DONE, result=result, finished_at=datetime.utcnow())
+
+
+class WorkerPool:
+    """A fixed number of asyncio workers polling the jobs table."""
+
+    def __init__(self, concurrency: int, poll_interval: float = JOB_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._stopping = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        load_handlers()
+        await schedule_periodic_jobs()
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{n}")
+            for n in range(self.concurrency)
+        ]
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stop polling and let in-flight jobs finish (cancelled after ``timeout``)."""
+        self._stopping.set()
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                async with AsyncSessionLocal() as db:
+                    jobs = await claim_jobs(db)
+            except Exception:
+                logger.exception("Job claim failed")
+                jobs = []
+
+            if not jobs:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for job in jobs:
+                try:
+                    await run_job(job)
+                except Exception:
+                    logger.exception("Job run failed", extra={"fields": {"job_id": job.id, "kind": job.kind}})
@@ -0,0 +1,134 @@
+"""Pipeline stage history and weekly funnel rollups.
+
+Every stage change appends a row to ``pipeline_transitions`` and increments the
+matching ``pipeline_weekly_stats`` counters, in the caller's transaction.
+History and rollups therefore commit or roll back together with the client
+update. The client row is locked (``SELECT … FOR UPDATE``) before the previous
+stage is read, so two concurrent moves of the same client cannot both record
+the same ``from_stage``.
+
+Time spent in a stage is known when the client leaves it, from
+``Client.pipeline_stage_since``, and is credited to the week of the exit. The
+analytics endpoint only reads the rollups: one row per (week, stage), whatever
+the number of transitions.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Client, PipelineStage, PipelineTransition, PipelineWeeklyStat
+
+_STAGE_ORDER = {stage: index for index, stage in enumerate(PipelineStage)}
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+async def _bump(db: AsyncSession, at: datetime, stage: PipelineStage, **increments: int) -> None:
+    values = {"entered": 0, "advanced": 0, "regressed": 0, "seconds_in_stage": 0, **increments}
+    stmt = insert(PipelineWeeklyStat).values(week=week_start(at.date()), stage=stage, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PipelineWeeklyStat.week, PipelineWeeklyStat.stage],
+        set_={
+            name: getattr(PipelineWeeklyStat, name) + getattr(stmt.excluded, name)
+            for name, amount in increments.items()
+            if amount
+        },
+    )
+    await db.execute(stmt)
+
+
+async def record_pipeline_entry(
+    db: AsyncSession, client_id: UUID, stage: PipelineStage, at: datetime
+) -> None:
+    """Initial transition of a newly created (already flushed) client."""
+    db.add(PipelineTransition(client_id=client_id, from_stage=None, to_stage=stage, changed_at=at))
+    await _bump(db, at, stage, entered=1)
+
+
+async def record_stage_change(db: AsyncSession, client_id: UUID, new_stage: PipelineStage) -> dict[str, Any]:
+    """Lock the client, record the move and return the extra columns for its UPDATE.
+
+    A no-op move (same stage) records nothing and returns an empty dict. The
+    caller commits; it must run the client UPDATE in the same transaction.
+    """
+    result = await db.execute(
+        select(Client.pipeline_stage, Client.pipeline_stage_since, Client.created_at)
+        .where(Client.id == client_id)
+        .with_for_update()
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
+    if row.pipeline_stage == new_stage:
+        return {}
+
+    now = datetime.utcnow()
+    since = row.pipeline_stage_since or row.created_at or now
+    seconds = max(int((now - since).total_seconds()), 0)
+    db.add(
+        PipelineTransition(
+            client_id=client_id,
+            from_stage=row.pipeline_stage,
+            to_stage=new_stage,
+            seconds_in_from_stage=seconds,
+            changed_at=now,
+        )
+    )
+    direction = "advanced" if _STAGE_ORDER[new_stage] > _STAGE_ORDER[row.pipeline_stage] else "regressed"
+    await _bump(db, now, row.pipeline_stage, **{direction: 1, "seconds_in_stage": seconds})
+    await _bump(db, now, new_stage, entered=1)
+    return {"pipeline_stage_since": now}
+
+
+def _stage_stats(stage: PipelineStage, entered: int, advanced: int, regressed: int, seconds: int) -> dict[str, Any]:
+    exited = advanced + regressed
+    return {
+        "stage": stage,
+        "entered": entered,
+        "advanced": advanced,
+        "regressed": regressed,
+        "conversion_rate": round(advanced / exited, 4) if exited else None,
+        "avg_days_in_stage": round(seconds / exited / 86400, 2) if exited else None,
+    }
+
+
+async def pipeline_analytics(db: AsyncSession, weeks: int, today: date | None = None) -> dict[str, Any]:
+    """Funnel over the last ``weeks`` weeks (current week included), from the rollups."""
+    start = week_start(today or date.today()) - timedelta(weeks=weeks - 1)
+    result = await db.execute(
+        select(PipelineWeeklyStat)
+        .where(PipelineWeeklyStat.week >= start)
+        .order_by(PipelineWeeklyStat.week)
+    )
+    rows = result.scalars().all()
+
+    totals = {stage: [0, 0, 0, 0] for stage in PipelineStage}
+    by_week: dict[date, list[dict[str, Any]]] = {}
+    for row in rows:
+        counters = (row.entered, row.advanced, row.regressed, row.seconds_in_stage)
+        totals[row.stage] = [total + value for total, value in zip(totals[row.stage], counters)]
+        by_week.setdefault(row.week, []).append(_stage_stats(row.stage, *counters))
+
+    current = await db.execute(select(Client.pipeline_stage, func.count(Client.id)).group_by(Client.pipeline_stage))
+    current_counts = dict(current.all())
+
+    return {
+        "weeks": weeks,
+        "start": start,
+        "stages": [
+            {**_stage_stats(stage, *totals[stage]), "current": current_counts.get(stage, 0)}
+            for stage in PipelineStage
+        ],
+        "by_week": [
+            {"week": week, "stages": sorted(stats, key=lambda item: _STAGE_ORDER[item["stage"]])}
+            for week, stats in by_week.items()
+        ],
+    }
@@ -0,0 +1,84 @@
+"""Connection pool hold times, per route.
+
+Pool ``checkout`` / ``checkin`` events time how long each connection stays out
+of the pool and attribute it to the route that took it (``current_route``, set
+by ``app.routing.SessionReleasingRoute``; ``background`` for jobs and other
+tasks). Compared with the request duration of the same route, ``hold_ratio``
+shows how much of a request actually needs a connection: the lower it is, the
+more concurrent requests a pool connection can serve. Counters are per worker
+process and reset on restart.
+"""
+
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+current_route: ContextVar[str] = ContextVar("pool_route", default="background")
+
+
+class RouteStats:
+    __slots__ = ("requests", "request_seconds", "checkouts", "hold_seconds", "max_hold_seconds")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.request_seconds = 0.0
+        self.checkouts = 0
+        self.hold_seconds = 0.0
+        self.max_hold_seconds = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "checkouts": self.checkouts,
+            "avg_request_ms": round(self.request_seconds / self.requests * 1000, 2) if self.requests else None,
+            "avg_hold_ms": round(self.hold_seconds / self.checkouts * 1000, 2) if self.checkouts else None,
+            "max_hold_ms": round(self.max_hold_seconds * 1000, 2),
+            "hold_ratio": round(self.hold_seconds / self.request_seconds, 4) if self.request_seconds else None,
+        }
+
+
+_routes: defaultdict[str, RouteStats] = defaultdict(RouteStats)
+_engines: dict[str, AsyncEngine] = {}
+
+
+def record_request(route: str, seconds: float) -> None:
+    stats = _routes[route]
+    stats.requests += 1
+    stats.request_seconds += seconds
+
+
+def instrument(name: str, engine: AsyncEngine) -> None:
+    _engines[name] = engine
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _checkout(dbapi_connection: Any, record: Any, proxy: Any) -> None:
+        # Contexte de la tâche appelante : SQLAlchemy le propage au greenlet.
+        record.info["pool_hold"] = (time.perf_counter(), current_route.get())
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _checkin(dbapi_connection: Any, record: Any) -> None:
+        started = record.info.pop("pool_hold", None)
+        if started is None:
+            return
+        held = time.perf_counter() - started[0]
+        stats = _routes[started[1]]
+        stats.checkouts += 1
+        stats.hold_seconds += held
+        stats.max_hold_seconds = max(stats.max_hold_seconds, held)
+
+
+def pool_metrics() -> dict[str, Any]:
+    pools = {
+        name: {
+            "size": engine.pool.size(),
+            "checked_out": engine.pool.checkedout(),
+            "overflow": engine.pool.overflow(),
+        }
+        for name, engine in _engines.items()
+    }
+    routes = sorted(_routes.items(), key=lambda item: item[1].hold_seconds, reverse=True)
+    return {"pools": pools, "routes": {route: stats.as_dict() for route, stats in routes}}
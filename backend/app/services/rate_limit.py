@@ -0,0 +1,348 @@
+"""Per-principal rate limiting and load shedding (ASGI middleware).
+
+Two protections, checked before the request reaches a route, so nothing here
+touches the application's DB pool:
+
+1. **Token buckets** per principal and route class. The principal comes from
+   ``auth.request_principal``: the n8n bot (``api_key``), a web user (``user``,
+   by JWT subject) or an ``anonymous`` caller (by IP). The route class is
+   ``read``, ``heavy`` (aggregations, search), ``write`` or ``upload``. Each
+   (principal type, class) pair has a rate and a burst (``RATE_LIMITS``).
+   An empty bucket gets an immediate 429 with ``Retry-After``.
+2. **In-flight caps**, per worker: at most ``MAX_IN_FLIGHT`` requests run at
+   once, and at most ``API_KEY_MAX_IN_FLIGHT`` of them for the bot, so a
+   runaway agent loop cannot take every DB connection from the web UI. A
+   request over the cap waits at most ``IN_FLIGHT_QUEUE_TIMEOUT`` seconds for
+   a slot (``MAX_QUEUED`` waiters at most), then gets a 503 with
+   ``Retry-After`` instead of queueing until its client times out.
+
+Buckets live in worker memory by default. With ``RATE_LIMIT_BACKEND=postgres``
+they live in the UNLOGGED ``rate_limit_buckets`` table: the limits then hold
+across workers and replicas. That costs one upsert per request on a small
+dedicated pool. If Postgres does not answer within ``RATE_LIMIT_DB_TIMEOUT_MS``,
+the request is let through (fail open) and counted.
+
+Counters (rejections, queueing, in-flight peak) are per worker; see
+``rate_limit_metrics``.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..database import DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_SIZE, RATE_LIMIT_BACKEND, RATE_LIMIT_POOL_SIZE
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+RATE_LIMIT_DB_TIMEOUT_MS = int(os.getenv("RATE_LIMIT_DB_TIMEOUT_MS", "200"))
+
+# Par défaut : deux requêtes en cours par connexion du pool (les routes sans base passent aussi).
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT") or (DB_POOL_SIZE + DB_MAX_OVERFLOW) * 2)
+API_KEY_MAX_IN_FLIGHT = int(os.getenv("API_KEY_MAX_IN_FLIGHT") or max(MAX_IN_FLIGHT // 2, 1))
+MAX_QUEUED = int(os.getenv("MAX_QUEUED") or MAX_IN_FLIGHT)
+IN_FLIGHT_QUEUE_TIMEOUT = float(os.getenv("IN_FLIGHT_QUEUE_TIMEOUT", "0.5"))
+
+# (type d'appelant, classe de route) -> (jetons par seconde, rafale)
+# Les seaux `anonymous` sont par IP : derrière un proxy, TRUSTED_PROXY_HOPS doit
+# valoir le nombre de proxys (auth.client_address), sinon un X-Forwarded-For
+# changé à chaque requête donne un seau neuf à chaque requête.
+DEFAULT_LIMITS: dict[tuple[str, str], tuple[float, float]] = {
+    ("api_key", "read"): (10, 30),
+    ("api_key", "heavy"): (1, 5),
+    ("api_key", "write"): (5, 15),
+    ("api_key", "upload"): (1, 3),
+    ("user", "read"): (50, 150),
+    ("user", "heavy"): (5, 20),
+    ("user", "write"): (20, 60),
+    ("user", "upload"): (5, 15),
+    ("anonymous", "read"): (5, 20),
+    ("anonymous", "heavy"): (1, 5),
+    # Inclut POST /auth/token : freine aussi le bourrage de mots de passe.
+    ("anonymous", "write"): (1, 10),
+    ("anonymous", "upload"): (1, 2),
+}
+
+HEAVY_PREFIXES = (
+    "/stats",
+    "/finances/timeseries",
+    "/finances/forecast",
+    "/pipeline/analytics",
+    "/documents/search",
+    "/audit",
+    "/storage/usage",
+)
+EXEMPT_PATHS = {"/", "/healthz", "/readyz", "/docs", "/redoc", "/openapi.json", "/docs/oauth2-redirect"}
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def parse_limits(spec: str) -> dict[tuple[str, str], tuple[float, float]]:
+    """``"api_key.read=10/30,user.heavy=5/20"`` -> overrides of ``DEFAULT_LIMITS``."""
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        target, _, value = item.partition("=")
+        kind, _, route_class = target.strip().partition(".")
+        rate, _, burst = value.partition("/")
+        if (kind, route_class) not in DEFAULT_LIMITS:
+            raise ValueError(f"Unknown rate limit '{target}'")
+        limits[(kind, route_class)] = (float(rate), max(float(burst or rate), 1.0))
+    return limits
+
+
+LIMITS = parse_limits(os.getenv("RATE_LIMITS", ""))
+
+
+def route_class(method: str, path: str) -> str:
+    if path == "/batch":
+        # L'enveloppe : chaque sous-requête est en plus décomptée dans sa propre classe (services/batch.py).
+        return "heavy"
+    if method == "POST" and (path == "/upload" or path.endswith("/documents")):
+        return "upload"
+    if method in WRITE_METHODS:
+        return "write"
+    if path.startswith(HEAVY_PREFIXES):
+        return "heavy"
+    return "read"
+
+
+# ========== METRICS ==========
+class _Metrics:
+    def __init__(self) -> None:
+        self.allowed = 0
+        self.rejected_rate: Counter[str] = Counter()
+        self.rejected_overload: Counter[str] = Counter()
+        self.queued = 0
+        self.queue_wait_seconds = 0.0
+        self.backend_errors = 0
+        self.in_flight_peak = 0
+
+
+metrics = _Metrics()
+
+
+# ========== TOKEN BUCKETS ==========
+class MemoryBuckets:
+    """Buckets held by this worker (``time.monotonic`` based), least recently used first.
+
+    Past ``MAX_KEYS`` the least recently used bucket is dropped: O(1) per
+    request whatever the number of callers.
+    """
+
+    MAX_KEYS = 10000
+
+    def __init__(self) -> None:
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.MAX_KEYS:
+            # Le seau oublié repart plein : c'est celui resté inactif le plus longtemps.
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+_BURST = "CAST(:burst AS double precision)"
+_REFILL = (
+    f"LEAST({_BURST}, b.tokens + GREATEST(EXTRACT(EPOCH FROM EXCLUDED.updated_at - b.updated_at), 0)"
+    " * CAST(:rate AS double precision))"
+)
+_TAKE_SQL = text(
+    f"""
+    INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at, allowed)
+    VALUES (:key, {_BURST} - 1, clock_timestamp()::timestamp, true)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = CASE WHEN {_REFILL} >= 1 THEN {_REFILL} - 1 ELSE {_REFILL} END,
+        allowed = {_REFILL} >= 1,
+        updated_at = EXCLUDED.updated_at
+    RETURNING tokens, allowed
+    """
+)
+_PRUNE_SQL = text("DELETE FROM rate_limit_buckets WHERE updated_at < clock_timestamp() - interval '1 hour'")
+
+
+class PostgresBuckets:
+    """Buckets shared by every worker, one atomic upsert per request."""
+
+    PRUNE_EVERY = 300.0
+
+    def __init__(self) -> None:
+        # Pool dédié et minuscule : jamais en concurrence avec le pool applicatif
+        # (déduit de DB_CONNECTION_BUDGET, cf. database.pool_sizing).
+        self.engine = create_async_engine(
+            DATABASE_URL,
+            pool_size=RATE_LIMIT_POOL_SIZE,
+            max_overflow=0,
+            pool_timeout=RATE_LIMIT_DB_TIMEOUT_MS / 1000,
+            connect_args={"server_settings": {"statement_timeout": str(RATE_LIMIT_DB_TIMEOUT_MS)}},
+        )
+        self._last_prune = time.monotonic()
+
+    async def take(self, key: str, rate: float, burst: float) -> tuple[bool, float]:
+        try:
+            async with self.engine.begin() as conn:
+                row = (await conn.execute(_TAKE_SQL, {"key": key, "rate": rate, "burst": burst})).one()
+                if time.monotonic() - self._last_prune > self.PRUNE_EVERY:
+                    self._last_prune = time.monotonic()
+                    await conn.execute(_PRUNE_SQL)
+        except Exception:
+            metrics.backend_errors += 1
+            return True, burst
+        return row.allowed, row.tokens
+
+    async def dispose(self) -> None:
+        await self.engine.dispose()
+
+
+# ========== IN-FLIGHT CAP ==========
+class InFlightLimiter:
+    """Counting semaphore with a bounded, time-limited FIFO of waiters."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if timeout <= 0 or len(self._waiters) >= MAX_QUEUED:
+            return False
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        timer = loop.call_later(timeout, lambda: waiter.done() or waiter.set_result(False))
+        try:
+            # True : la place a été transmise par release(), `active` est déjà compté.
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()
+            raise
+        finally:
+            timer.cancel()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+
+buckets: MemoryBuckets | PostgresBuckets = PostgresBuckets() if RATE_LIMIT_BACKEND == "postgres" else MemoryBuckets()
+global_slots = InFlightLimiter(MAX_IN_FLIGHT)
+api_key_slots = InFlightLimiter(API_KEY_MAX_IN_FLIGHT)
+
+
+async def close_rate_limiter() -> None:
+    if isinstance(buckets, PostgresBuckets):
+        await buckets.dispose()
+
+
+def rate_limit_metrics() -> dict[str, Any]:
+    return {
+        "pid": os.getpid(),
+        "enabled": RATE_LIMIT_ENABLED,
+        "backend": RATE_LIMIT_BACKEND,
+        "in_flight": global_slots.active,
+        "in_flight_api_key": api_key_slots.active,
+        "in_flight_peak": metrics.in_flight_peak,
+        "max_in_flight": MAX_IN_FLIGHT,
+        "api_key_max_in_flight": API_KEY_MAX_IN_FLIGHT,
+        "queued_now": global_slots.queued + api_key_slots.queued,
+        "queued_total": metrics.queued,
+        "queue_wait_seconds_total": round(metrics.queue_wait_seconds, 3),
+        "allowed": metrics.allowed,
+        "rejected_rate_limit": dict(metrics.rejected_rate),
+        "rejected_overload": dict(metrics.rejected_overload),
+        "backend_errors": metrics.backend_errors,
+    }
+
+
+# ========== MIDDLEWARE ==========
+def _reject(status_code: int, retry_after: float, detail: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+    )
+
+
+async def charge(principal: tuple[str, str], method: str, path: str) -> JSONResponse | None:
+    """Take one token from the principal's bucket for this route; the 429 to send if empty."""
+    kind, identity = principal
+    bucket_class = route_class(method, path)
+    rate, burst = LIMITS[(kind, bucket_class)]
+    allowed, tokens = await buckets.take(f"{kind}:{identity}:{bucket_class}", rate, burst)
+    if allowed:
+        return None
+    metrics.rejected_rate[f"{kind}.{bucket_class}"] += 1
+    return _reject(429, (1 - tokens) / rate, "Too many requests")
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware: the in-flight slot is held until the response body is sent."""
+
+    def __init__(self, app: ASGIApp, principal: Callable[[Request], tuple[str, str]]) -> None:
+        self.app = app
+        self.principal = principal
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not RATE_LIMIT_ENABLED
+            or scope["method"] == "OPTIONS"
+            or scope["path"] in EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        kind, identity = self.principal(Request(scope))
+        refused = await charge((kind, identity), scope["method"], scope["path"])
+        if refused is not None:
+            await refused(scope, receive, send)
+            return
+
+        slots = [api_key_slots, global_slots] if kind == "api_key" else [global_slots]
+        acquired: list[InFlightLimiter] = []
+        try:
+            for limiter in slots:
+                started = time.perf_counter()
+                immediate = limiter.active < limiter.limit and not limiter.queued
+                if not await limiter.acquire(IN_FLIGHT_QUEUE_TIMEOUT):
+                    metrics.rejected_overload[kind] += 1
+                    response = _reject(503, 1, "Server busy, retry later")
+                    await response(scope, receive, send)
+                    return
+                acquired.append(limiter)
+                if not immediate:
+                    metrics.queued += 1
+                    metrics.queue_wait_seconds += time.perf_counter() - started
+            metrics.allowed += 1
+            metrics.in_flight_peak = max(metrics.in_flight_peak, global_slots.active)
+            await self.app(scope, receive, send)
+        finally:
+            for limiter in acquired:
+                limiter.release()
@@ -0,0 +1,158 @@
+"""Single-flight coalescing of identical concurrent reads.
+
+When the dashboard opens, its widgets and the bot often request ``/stats``,
+``/today`` or ``/clients`` at the same moment. Without coalescing, each
+request runs the same queries. With ``@coalesce``, the first request (the
+leader) starts the computation. Identical requests arriving before it
+finishes wait for that same computation and receive the same result. DB load
+then follows the number of distinct requests, not the number of viewers.
+
+A key is made of the route, its parameters (minus the DB sessions and the
+current user), the read target (primary or replica, from the sessions the route
+received), the write generation and a scope:
+
+- ``"global"``: every authenticated caller sees the same data (the case for
+  this single-tenant CRM);
+- ``"principal"``: one flight per caller (``audit.current_actor``), for
+  routes whose result depends on who asks.
+
+Read target: a caller pinned to the primary after a write (replica stickiness)
+never joins a flight reading a lagging replica.
+
+Write generation: a per-process counter, bumped by ``note_write()`` once a
+write request has committed and before its response is sent (see the
+``read_your_writes`` middleware). A read issued after that response therefore
+never joins a flight, or reuses a micro-cached result, from before the write,
+as long as it reaches the same worker process. Another worker has not seen the
+bump: there, the read may still join a flight that started before the write
+committed. The same holds for writes made by background jobs.
+
+``ttl`` optionally keeps the result for a few seconds after the flight lands
+(micro-cache). Leave it at 0 on routes that must reflect a write immediately.
+
+The computation runs in its own task and callers await it through
+``asyncio.shield``. It does not use the leader's request sessions, which are
+closed as soon as the leader's handler exits, including when it is cancelled.
+It opens its own session on the same engine for each one instead. A caller
+that disconnects therefore does not cancel, or break, the flight shared by the
+others. An exception reaches every waiter and is never
+cached. State is per worker process.
+"""
+
+import asyncio
+import functools
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Hashable, Literal
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal, batch_session, engine
+from .audit import current_actor
+
+Scope = Literal["global", "principal"]
+
+
+class SingleFlight:
+    """Flights in progress and micro-cached results, keyed by any hashable."""
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, asyncio.Task] = {}
+        self._results: dict[Hashable, tuple[float, Any]] = {}
+        self.stats: Counter[str] = Counter()
+        self.generation = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], ttl: float = 0.0) -> Any:
+        if ttl > 0:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self.stats["cached"] += 1
+                return cached[1]
+
+        task = self._flights.get(key)
+        if task is None:
+            self.stats["leader"] += 1
+            task = asyncio.create_task(fn())
+            self._flights[key] = task
+            task.add_done_callback(functools.partial(self._landed, key, ttl))
+        else:
+            self.stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    def _landed(self, key: Hashable, ttl: float, task: asyncio.Task) -> None:
+        self._flights.pop(key, None)
+        if ttl > 0 and not task.cancelled() and task.exception() is None:
+            self._prune()
+            self._results[key] = (time.monotonic() + ttl, task.result())
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        self._results = {key: value for key, value in self._results.items() if value[0] > now}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def note_write(self) -> None:
+        """A write committed: later calls start new flights (see the module docstring)."""
+        self.generation += 1
+
+    def invalidate(self) -> None:
+        """Drop micro-cached results (flights in progress are left alone)."""
+        self._results.clear()
+
+
+flights = SingleFlight()
+
+
+def coalesce(
+    ttl: float = 0.0,
+    scope: Scope = "global",
+    exclude: tuple[str, ...] = ("db", "read_db", "current_user"),
+) -> Callable:
+    """Decorator for async read routes (place it under ``@app.get``)."""
+
+    def decorator(endpoint: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        route = f"{endpoint.__module__}.{endpoint.__qualname__}"
+
+        # functools.wraps garde la signature : FastAPI résout les mêmes dépendances.
+        @functools.wraps(endpoint)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if batch_session.get() is not None:
+                # Sous-requête de POST /batch : sa session peut porter des écritures
+                # non commitées, elle ne doit ni rejoindre ni servir un vol partagé.
+                return await endpoint(*args, **kwargs)
+            params = tuple(sorted((name, repr(value)) for name, value in kwargs.items() if name not in exclude))
+            # Réplica ou primaire : selon les sessions injectées dans la route.
+            target = "primary"
+            if any(isinstance(value, AsyncSession) and value.bind is not engine for value in kwargs.values()):
+                target = "replica"
+            who = None
+            if scope == "principal":
+                actor = current_actor()
+                who = (actor.user_id, actor.via) if actor else None
+            key = (route, who, target, flights.generation, args, params)
+
+            async def flight() -> Any:
+                # Sessions propres au vol, sur les mêmes engines : celles du leader
+                # sont fermées dès que son handler se termine.
+                sessions = {
+                    name: AsyncSessionLocal(bind=value.bind)
+                    for name, value in kwargs.items()
+                    if isinstance(value, AsyncSession)
+                }
+                try:
+                    return await endpoint(*args, **{**kwargs, **sessions})
+                finally:
+                    for session in sessions.values():
+                        await session.close()
+
+            return await flights.do(key, flight, ttl=ttl)
+
+        return wrapper
+
+    return decorator
+
+
+def single_flight_stats() -> dict[str, int]:
+    return {"in_flight": flights.in_flight, "write_generation": flights.generation, **flights.stats}
@@ -0,0 +1,296 @@
+"""File storage backends for uploads (local sharded disk or S3-compatible).
+
+Rows keep a storage *key* (``Document.file_path``, the ``path`` returned by
+``/upload``) rather than an absolute path. Keys are sharded on a random prefix
+(``ab/cd/<uuid>_<name>``) so no directory or listing prefix grows without bound.
+
+Choose the backend with ``STORAGE_BACKEND``:
+
+- ``local`` (default): files under ``UPLOAD_DIR``. Legacy rows that still hold
+  an absolute path inside ``UPLOAD_DIR`` keep working.
+- ``s3``: any S3-compatible object store (AWS, MinIO, ...). With it, several API
+  replicas can serve documents without a shared volume. boto3 is imported
+  lazily and is only needed for this backend.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from itertools import islice
+from pathlib import Path
+from typing import AsyncContextManager, AsyncIterator, BinaryIO, Iterator, NamedTuple
+
+CHUNK_SIZE = 1024 * 1024
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").strip().lower()
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "/app/uploads"))
+
+S3_BUCKET = os.getenv("S3_BUCKET", "aetheria-uploads")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+# Endpoint vu par le navigateur pour les URLs présignées (ex: MinIO derrière Traefik).
+S3_PUBLIC_ENDPOINT_URL = os.getenv("S3_PUBLIC_ENDPOINT_URL") or S3_ENDPOINT_URL
+S3_PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_EXPIRES", "300"))
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "16")) * 1024 * 1024
+
+
+class StorageError(Exception):
+    """Invalid key or unreachable object."""
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+
+
+def new_key(filename: str) -> str:
+    """Sharded storage key for an already sanitized file name."""
+    token = uuid.uuid4().hex
+    return f"{token[:2]}/{token[2:4]}/{token}_{filename}"
+
+
+class StorageBackend(ABC):
+    """Interface shared by the storage drivers.
+
+    Methods taking a key raise ``StorageError`` when the key is not valid for
+    the backend (e.g. a local key escaping ``UPLOAD_DIR``).
+    """
+
+    @abstractmethod
+    async def save(self, key: str, fileobj: BinaryIO, content_type: str | None = None) -> int:
+        """Stream ``fileobj`` to ``key`` and return the number of bytes written."""
+
+    @abstractmethod
+    def open_stream(self, key: str) -> AsyncIterator[bytes]:
+        """Object bytes, in chunks of at most ``CHUNK_SIZE``."""
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Whether an object is stored under ``key``."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove the object; a missing object is not an error."""
+
+    def local_file(self, key: str) -> Path | None:
+        """Filesystem path when the object lives on local disk, else None."""
+        return None
+
+    def presigned_url(self, key: str, filename: str, content_type: str | None) -> str | None:
+        """Direct, time-limited download URL when the backend supports it."""
+        return None
+
+    @abstractmethod
+    def local_path(self, key: str) -> AsyncContextManager[Path]:
+        """A local file holding the object's bytes, for tools needing a real path."""
+
+    @abstractmethod
+    def iter_objects(self, batch_size: int = 1000) -> AsyncIterator[list[StoredObject]]:
+        """Stream every stored object in batches, without listing everything first."""
+
+    def reference_forms(self, key: str) -> list[str]:
+        """Values a database column may hold when it references ``key``."""
+        return [key]
+
+    async def check_writable(self) -> None:
+        """Raise if new uploads cannot be stored (readiness probe)."""
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: Path):
+        self.root = root.resolve()
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if path != self.root and self.root not in path.parents:
+            raise StorageError(f"Key outside of storage root: {key}")
+        return path
+
+    def _write(self, path: Path, fileobj: BinaryIO) -> int:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as buffer:
+            shutil.copyfileobj(fileobj, buffer, CHUNK_SIZE)
+        return path.stat().st_size
+
+    async def save(self, key: str, fileobj: BinaryIO, content_type: str | None = None) -> int:
+        return await asyncio.to_thread(self._write, self._path(key), fileobj)
+
+    async def open_stream(self, key: str) -> AsyncIterator[bytes]:
+        handle = await asyncio.to_thread(open, self._path(key), "rb")
+        try:
+            while chunk := await asyncio.to_thread(handle.read, CHUNK_SIZE):
+                yield chunk
+        finally:
+            handle.close()
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._path(key).is_file)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._path(key).unlink, True)
+
+    def local_file(self, key: str) -> Path | None:
+        return self._path(key)
+
+    def _probe(self) -> None:
+        # Fichier temporaire créé puis supprimé : vérifie montage et droits.
+        with tempfile.NamedTemporaryFile(dir=self.root, prefix=".readyz_"):
+            pass
+
+    async def check_writable(self) -> None:
+        await asyncio.to_thread(self._probe)
+
+    @asynccontextmanager
+    async def local_path(self, key: str) -> AsyncIterator[Path]:
+        yield self._path(key)
+
+    def _walk(self) -> Iterator[StoredObject]:
+        # Parcours en profondeur avec os.scandir : la mémoire dépend de la
+        # profondeur de l'arborescence, pas du nombre de fichiers.
+        stack = [self.root]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        key = Path(entry.path).relative_to(self.root).as_posix()
+                        yield StoredObject(key, entry.stat(follow_symlinks=False).st_size)
+
+    async def iter_objects(self, batch_size: int = 1000) -> AsyncIterator[list[StoredObject]]:
+        walker = self._walk()
+        while batch := await asyncio.to_thread(lambda: list(islice(walker, batch_size))):
+            yield batch
+
+    def reference_forms(self, key: str) -> list[str]:
+        # Les anciennes lignes stockent le chemin absolu (/app/uploads/<nom>).
+        return [key, str(UPLOAD_DIR / key)]
+
+
+class _CountingReader:
+    """File wrapper counting bytes handed to boto3's managed upload."""
+
+    def __init__(self, fileobj: BinaryIO):
+        self.fileobj = fileobj
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        self.size += len(data)
+        return data
+
+
+class S3Storage(StorageBackend):
+    def __init__(self, bucket: str):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        options = {
+            "region_name": S3_REGION,
+            "aws_access_key_id": os.getenv("S3_ACCESS_KEY_ID") or None,
+            "aws_secret_access_key": os.getenv("S3_SECRET_ACCESS_KEY") or None,
+            # Path-style: requis par MinIO et la plupart des stockages compatibles S3.
+            "config": Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        }
+        self.client = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL, **options)
+        self.presign_client = boto3.client("s3", endpoint_url=S3_PUBLIC_ENDPOINT_URL, **options)
+        # Au-delà du seuil, boto3 découpe en multipart upload (parts envoyées en parallèle).
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_THRESHOLD,
+        )
+
+    def _is_missing(self, exc: Exception) -> bool:
+        code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+        return code in {"404", "NoSuchKey", "NotFound"}
+
+    async def save(self, key: str, fileobj: BinaryIO, content_type: str | None = None) -> int:
+        reader = _CountingReader(fileobj)
+        extra = {"ContentType": content_type} if content_type else None
+        await asyncio.to_thread(
+            self.client.upload_fileobj,
+            reader,
+            self.bucket,
+            key,
+            ExtraArgs=extra,
+            Config=self.transfer_config,
+        )
+        return reader.size
+
+    async def open_stream(self, key: str) -> AsyncIterator[bytes]:
+        response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key)
+        body = response["Body"]
+        try:
+            while chunk := await asyncio.to_thread(body.read, CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+        except Exception as exc:
+            if self._is_missing(exc):
+                return False
+            raise
+        return True
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def check_writable(self) -> None:
+        await asyncio.to_thread(self.client.head_bucket, Bucket=self.bucket)
+
+    def presigned_url(self, key: str, filename: str, content_type: str | None) -> str | None:
+        params = {
+            "Bucket": self.bucket,
+            "Key": key,
+            "ResponseContentDisposition": f'attachment; filename="{filename}"',
+        }
+        if content_type:
+            params["ResponseContentType"] = content_type
+        return self.presign_client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=S3_PRESIGN_EXPIRES
+        )
+
+    async def iter_objects(self, batch_size: int = 1000) -> AsyncIterator[list[StoredObject]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        pages = iter(paginator.paginate(Bucket=self.bucket, PaginationConfig={"PageSize": batch_size}))
+        while page := await asyncio.to_thread(next, pages, None):
+            batch = [StoredObject(item["Key"], item["Size"]) for item in page.get("Contents", [])]
+            if batch:
+                yield batch
+
+    @asynccontextmanager
+    async def local_path(self, key: str) -> AsyncIterator[Path]:
+        fd, name = tempfile.mkstemp(prefix="aetheria_", suffix=Path(key).suffix)
+        os.close(fd)
+        try:
+            await asyncio.to_thread(
+                self.client.download_file, self.bucket, key, name, Config=self.transfer_config
+            )
+            yield Path(name)
+        finally:
+            Path(name).unlink(missing_ok=True)
+
+
+_storage: StorageBackend | None = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "s3":
+            _storage = S3Storage(S3_BUCKET)
+        elif STORAGE_BACKEND == "local":
+            UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+            _storage = LocalStorage(UPLOAD_DIR)
+        else:
+            raise StorageError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return _storage
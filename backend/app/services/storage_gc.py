@@ -0,0 +1,199 @@
+"""Orphan file garbage collection and storage usage reporting.
+
+Files become orphans when rows go away through ORM cascades (``delete_client``,
+``delete_project``) or when a ``/upload`` result is never copied into
+``Finance.invoice_path`` or ``MeetingNote.attachments``. Notes moved to
+``meeting_notes_archive`` (``services/archive.py``) still reference their
+attachments: ``restore_client`` brings them back.
+
+The collector streams the storage listing in batches. For each batch, one
+set-based query (``unnest`` + ``NOT EXISTS`` on indexed columns) finds the keys
+no row references, so memory depends on the batch size and not on the number of
+files. An unreferenced file is first quarantined: it gets a row in
+``storage_quarantine`` and stays on disk. It is deleted only if it is still
+unreferenced after ``STORAGE_GC_GRACE_HOURS``. That leaves time for in-flight
+uploads and for paths pasted into forms after the upload.
+
+A scan is not resumable (the local backend walks in directory order), so the
+job gets ``STORAGE_GC_TIMEOUT_SECONDS`` instead of the generic job timeout.
+Quarantine entries whose file has disappeared are only dropped at the end of a
+complete scan.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from ..models import Client, Document, Project, StorageQuarantine
+from .jobs import job_handler
+from .storage import get_storage
+
+GC_JOB = "storage.gc"
+STORAGE_GC_GRACE = timedelta(hours=int(os.getenv("STORAGE_GC_GRACE_HOURS", "72")))
+STORAGE_GC_INTERVAL = timedelta(hours=int(os.getenv("STORAGE_GC_INTERVAL_HOURS", "24")))
+# Un scan interrompu repart du début : le délai doit couvrir tout le stockage.
+STORAGE_GC_TIMEOUT = int(os.getenv("STORAGE_GC_TIMEOUT_SECONDS", str(6 * 3600)))
+SCAN_BATCH_SIZE = 1000
+
+# `alt` est la forme historique (chemin absolu) d'une clé du stockage local.
+_UNREFERENCED_KEYS = text(
+    """
+    SELECT c.key
+    FROM unnest(CAST(:keys AS text[]), CAST(:alts AS text[])) AS c(key, alt)
+    WHERE NOT EXISTS (SELECT 1 FROM documents d WHERE d.file_path IN (c.key, c.alt))
+      AND NOT EXISTS (SELECT 1 FROM finances f WHERE f.invoice_path IN (c.key, c.alt))
+      AND NOT EXISTS (
+          SELECT 1 FROM meeting_notes m
+          WHERE m.attachments && ARRAY[c.key, c.alt]::varchar[]
+      )
+      AND NOT EXISTS (
+          SELECT 1 FROM meeting_notes_archive m
+          WHERE m.attachments && ARRAY[c.key, c.alt]::varchar[]
+      )
+    """
+)
+
+
+async def _unreferenced(db: AsyncSession, keys: list[str]) -> set[str]:
+    if not keys:
+        return set()
+    storage = get_storage()
+    alts = [storage.reference_forms(key)[-1] for key in keys]
+    result = await db.execute(_UNREFERENCED_KEYS, {"keys": keys, "alts": alts})
+    return set(result.scalars().all())
+
+
+async def collect_garbage(dry_run: bool = False) -> dict[str, Any]:
+    storage = get_storage()
+    run_started = datetime.utcnow()
+    expiry = run_started - STORAGE_GC_GRACE
+    report = {
+        "scanned_files": 0,
+        "scanned_bytes": 0,
+        "orphan_files": 0,
+        "orphan_bytes": 0,
+        "deleted_files": 0,
+        "deleted_bytes": 0,
+        "dry_run": dry_run,
+    }
+
+    async for batch in storage.iter_objects(SCAN_BATCH_SIZE):
+        sizes = {obj.key: obj.size for obj in batch}
+        report["scanned_files"] += len(batch)
+        report["scanned_bytes"] += sum(sizes.values())
+
+        async with AsyncSessionLocal() as db:
+            orphans = await _unreferenced(db, list(sizes))
+            report["orphan_files"] += len(orphans)
+            report["orphan_bytes"] += sum(sizes[key] for key in orphans)
+            referenced = [key for key in sizes if key not in orphans]
+
+            if dry_run:
+                if orphans:
+                    result = await db.execute(
+                        select(StorageQuarantine.key).where(
+                            StorageQuarantine.key.in_(orphans),
+                            StorageQuarantine.quarantined_at <= expiry,
+                        )
+                    )
+                    expired = result.scalars().all()
+                    report["deleted_files"] += len(expired)
+                    report["deleted_bytes"] += sum(sizes[key] for key in expired)
+                continue
+
+            # Re-référencé depuis la dernière passe : sortie de quarantaine.
+            if referenced:
+                await db.execute(delete(StorageQuarantine).where(StorageQuarantine.key.in_(referenced)))
+
+            expired: list[str] = []
+            if orphans:
+                stmt = insert(StorageQuarantine).values(
+                    [
+                        {"key": key, "size": sizes[key], "quarantined_at": run_started, "last_seen_at": run_started}
+                        for key in orphans
+                    ]
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[StorageQuarantine.key],
+                    set_={"size": stmt.excluded.size, "last_seen_at": run_started},
+                ).returning(StorageQuarantine.key, StorageQuarantine.quarantined_at)
+                rows = (await db.execute(stmt)).all()
+                expired = [row.key for row in rows if row.quarantined_at <= expiry]
+            await db.commit()
+
+            if not expired:
+                continue
+            # Dernier contrôle juste avant de supprimer : la grâce a pu servir à
+            # recopier le chemin dans une ligne.
+            expired = sorted(await _unreferenced(db, expired))
+            for key in expired:
+                await storage.delete(key)
+                report["deleted_files"] += 1
+                report["deleted_bytes"] += sizes[key]
+            await db.execute(delete(StorageQuarantine).where(StorageQuarantine.key.in_(expired)))
+            await db.commit()
+
+    if not dry_run:
+        # Entrées dont le fichier a disparu entre-temps (non revues pendant ce scan).
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(StorageQuarantine).where(StorageQuarantine.last_seen_at < run_started))
+            await db.commit()
+
+    return report
+
+
+@job_handler(GC_JOB, every=STORAGE_GC_INTERVAL, timeout=STORAGE_GC_TIMEOUT)
+async def run_storage_gc(payload: dict[str, Any]) -> dict[str, Any]:
+    return await collect_garbage(dry_run=bool(payload.get("dry_run")))
+
+
+async def storage_usage(db: AsyncSession) -> dict[str, Any]:
+    """Bytes referenced by documents, per project and per client, plus quarantine totals."""
+    doc_count = func.count(Document.id).label("documents")
+    doc_bytes = func.coalesce(func.sum(Document.file_size), 0).label("bytes")
+
+    projects = await db.execute(
+        select(Project.id, Project.name, Project.client_id, doc_count, doc_bytes)
+        .outerjoin(Document, Document.project_id == Project.id)
+        .group_by(Project.id)
+        .order_by(doc_bytes.desc())
+    )
+    clients = await db.execute(
+        select(Client.id, Client.company_name, doc_count, doc_bytes)
+        .join(Project, Project.client_id == Client.id)
+        .outerjoin(Document, Document.project_id == Project.id)
+        .group_by(Client.id)
+        .order_by(doc_bytes.desc())
+    )
+    quarantine = await db.execute(
+        select(func.count(StorageQuarantine.key), func.coalesce(func.sum(StorageQuarantine.size), 0))
+    )
+    quarantined_files, quarantined_bytes = quarantine.one()
+
+    return {
+        "projects": [
+            {
+                "id": str(row.id),
+                "name": row.name,
+                "client_id": str(row.client_id),
+                "documents": row.documents,
+                "bytes": int(row.bytes),
+            }
+            for row in projects
+        ],
+        "clients": [
+            {
+                "id": str(row.id),
+                "company_name": row.company_name,
+                "documents": row.documents,
+                "bytes": int(row.bytes),
+            }
+            for row in clients
+        ],
+        "quarantine": {"files": quarantined_files, "bytes": int(quarantined_bytes)},
+    }
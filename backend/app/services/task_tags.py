@@ -0,0 +1,73 @@
+"""Tag filters on ``Task.tags`` and tag usage counts.
+
+Filters translate to the array operators covered by the GIN index
+``ix_tasks_tags``: ``tags_any`` is ``tags && ARRAY[...]`` (at least one of the
+tags) and ``tags_all`` is ``tags @> ARRAY[...]`` (every tag). Both stay
+index-driven whatever the table size.
+
+Counts come from one ``unnest`` aggregation, which reads every tagged task.
+The result is cached in the process and cleared by task writes.
+``TAG_COUNTS_CACHE_TTL`` bounds how long other workers can serve stale counts.
+"""
+
+import os
+import time
+from typing import Any, Iterable
+
+from sqlalchemy import ARRAY, Select, String, cast, text
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Task
+
+TAG_COUNTS_CACHE_TTL = float(os.getenv("TAG_COUNTS_CACHE_TTL", "300"))
+
+_COUNTS_SQL = text(
+    """
+    SELECT tag, count(*) AS count
+    FROM tasks, unnest(tags) AS tag
+    GROUP BY tag
+    ORDER BY count DESC, tag
+    """
+)
+
+# (cached_at, [{"tag": ..., "count": ...}]) ; None tant que rien n'est calculé
+_counts: tuple[float, list[dict[str, Any]]] | None = None
+
+
+def invalidate_tag_counts() -> None:
+    global _counts
+    _counts = None
+
+
+def parse_tags(values: Iterable[str] | None) -> list[str]:
+    """``?tags_any=a&tags_any=b`` and ``?tags_any=a,b`` are equivalent."""
+    tags = []
+    for value in values or ():
+        tags.extend(tag.strip() for tag in value.split(",") if tag.strip())
+    return list(dict.fromkeys(tags))
+
+
+def _tag_array(tags: list[str]):
+    # Même type que la colonne (varchar[]) : sinon Postgres compare en text[]
+    # après conversion de `tags`, et l'index GIN n'est plus utilisable.
+    return cast(array(tags), ARRAY(String))
+
+
+def filter_by_tags(query: Select, tags_any: list[str], tags_all: list[str], entity: Any = Task) -> Select:
+    """``entity``: ``Task`` or ``archive.with_archived(Task)``."""
+    if tags_any:
+        query = query.where(entity.tags.bool_op("&&")(_tag_array(tags_any)))
+    if tags_all:
+        query = query.where(entity.tags.bool_op("@>")(_tag_array(tags_all)))
+    return query
+
+
+async def tag_counts(db: AsyncSession) -> list[dict[str, Any]]:
+    global _counts
+    if _counts is not None and time.monotonic() - _counts[0] < TAG_COUNTS_CACHE_TTL:
+        return _counts[1]
+    result = await db.execute(_COUNTS_SQL)
+    counts = [{"tag": row.tag, "count": row.count} for row in result]
+    _counts = (time.monotonic(), counts)
+    return counts
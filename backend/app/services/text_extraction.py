@@ -0,0 +1,98 @@
+"""Plain-text extraction for uploaded documents (PDF, DOCX, text).
+
+This module runs inside worker processes (see ``document_index``), so it must
+stay import-light: no app, database or FastAPI imports here.
+
+Every extractor is a generator of text chunks: PDFs are read page by page,
+DOCX bodies are stream-parsed with ``iterparse`` and text files are read in
+fixed-size blocks. ``extract_text`` stops pulling chunks once ``max_chars`` is
+reached, so memory stays bounded whatever the file size.
+"""
+
+import zipfile
+from pathlib import Path
+from typing import Iterator
+from xml.etree.ElementTree import iterparse
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # pragma: no cover - optional dependency
+    PdfReader = None
+
+TEXT_BLOCK_SIZE = 64 * 1024
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+PDF_TYPES = {"application/pdf"}
+DOCX_TYPES = {"application/vnd.openxmlformats-officedocument.wordprocessingml.document"}
+TEXT_EXTENSIONS = {".txt", ".md", ".csv", ".json", ".xml", ".html", ".htm", ".log"}
+
+
+class UnsupportedDocument(Exception):
+    """Raised when no extractor handles the document type."""
+
+
+def detect_kind(name: str, content_type: str | None) -> str | None:
+    suffix = Path(name or "").suffix.lower()
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in PDF_TYPES or suffix == ".pdf":
+        return "pdf"
+    if content_type in DOCX_TYPES or suffix == ".docx":
+        return "docx"
+    if content_type.startswith("text/") or suffix in TEXT_EXTENSIONS:
+        return "text"
+    return None
+
+
+def iter_pdf(path: str) -> Iterator[str]:
+    if PdfReader is None:
+        raise UnsupportedDocument("pypdf is not installed")
+    reader = PdfReader(path)
+    for page in reader.pages:
+        yield (page.extract_text() or "") + "\n"
+
+
+def iter_docx(path: str) -> Iterator[str]:
+    with zipfile.ZipFile(path) as archive:
+        with archive.open("word/document.xml") as xml:
+            for _, element in iterparse(xml, events=("end",)):
+                if element.tag == f"{_WORD_NS}t" and element.text:
+                    yield element.text
+                elif element.tag == f"{_WORD_NS}tab":
+                    yield "\t"
+                elif element.tag == f"{_WORD_NS}p":
+                    yield "\n"
+                    # Paragraph fully consumed: drop its subtree to bound memory.
+                    element.clear()
+
+
+def iter_text(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8", errors="replace") as handle:
+        while block := handle.read(TEXT_BLOCK_SIZE):
+            yield block
+
+
+_EXTRACTORS = {"pdf": iter_pdf, "docx": iter_docx, "text": iter_text}
+
+
+def extract_text(path: str, name: str, content_type: str | None, max_chars: int) -> tuple[str, bool]:
+    """Return ``(text, truncated)`` for the file at ``path``.
+
+    Raises ``UnsupportedDocument`` when the type has no extractor.
+    """
+    kind = detect_kind(name, content_type)
+    if kind is None:
+        raise UnsupportedDocument(f"No extractor for '{name}' ({content_type})")
+
+    chunks: list[str] = []
+    size = 0
+    truncated = False
+    for chunk in _EXTRACTORS[kind](path):
+        chunk = chunk.replace("\x00", "")
+        if size + len(chunk) > max_chars:
+            chunks.append(chunk[: max_chars - size])
+            truncated = True
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return "".join(chunks), truncated
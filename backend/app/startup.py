@@ -0,0 +1,26 @@
+"""Mesure des phases de démarrage d'un worker (imports, engine, schéma, uploads…)."""
+import os
+import time
+
+
+class StartupTimer:
+    """Chronomètre cumulatif : chaque `mark` mesure le temps depuis le précédent."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: list[tuple[str, float]] = []
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000))
+        self._last = now
+
+    def summary(self) -> str:
+        total = (self._last - self.started) * 1000
+        details = ", ".join(f"{phase} {ms:.1f} ms" for phase, ms in self.phases)
+        return f"Startup (pid {os.getpid()}): {details} - total {total:.1f} ms"
+
+
+# Créé à l'import : `app.main` l'importe en premier pour mesurer ses propres imports.
+startup_timer = StartupTimer()
@@ -0,0 +1,40 @@
+"""Worker de jobs autonome : `python -m app.worker`.
+
+Même file que les workers in-process de l'API (table `jobs`, claim via
+FOR UPDATE SKIP LOCKED) : on peut en lancer autant que nécessaire.
+"""
+import asyncio
+import logging
+import os
+import signal
+
+from .log import setup_logging
+from .database import engine
+from .services.jobs import WorkerPool
+from .services.document_index import shutdown_pool
+
+
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    setup_logging()
+    concurrency = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+    pool = WorkerPool(concurrency=concurrency)
+    await pool.start()
+    logger.info("Job worker started (%d workers)", concurrency)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    logger.info("Job worker stopping, waiting for in-flight jobs...")
+    await pool.stop()
+    shutdown_pool()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1 @@
+# Benchmarks HTTP (cf. loadtest.py) - non embarqués dans l'image de l'API
@@ -0,0 +1,418 @@
+"""Tests de charge HTTP de l'API : `python -m bench.loadtest` (depuis backend/).
+
+Scénarios calqués sur l'usage réel :
+
+- ``dashboard`` : ouverture du dashboard (/stats, /clients, /tasks, /finances en parallèle) ;
+- ``kanban`` : glisser-déposer d'une tâche (PUT du statut) puis rafraîchissement du tableau ;
+- ``today`` : polling de /today par l'assistant ;
+- ``bulk_tasks`` : création de tâches en rafale (import, n8n) ;
+- ``documents`` : upload d'un document dans un projet puis téléchargement.
+
+Chaque scénario tourne `--concurrency` utilisateurs virtuels en boucle fermée
+pendant `--warmup` puis `--duration` secondes ; seules les requêtes lancées
+après le warmup sont mesurées. Le résultat (débit, p50/p95/p99 par requête,
+erreurs) est écrit en JSON avec le commit courant et les paramètres : deux
+fichiers produits avec les mêmes options sur la même base sont comparables
+(`--compare`). Les tirages aléatoires dépendent de `--seed` uniquement.
+
+Les tâches et documents créés pendant la mesure sont supprimés à la fin, et les
+tâches déplacées par ``kanban`` reprennent leur statut d'origine, pour que des
+runs successifs partent du même jeu de données. La progression s'affiche sur
+stderr : stdout ne porte que le rapport JSON.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+
+TASK_STATUSES = ["Backlog", "Todo", "In Progress", "Validation", "Done"]
+PIPELINE_STAGES = ["New", "Contacted", "Meeting Booked", "Dev", "Signed", "Delivered"]
+PRIORITIES = ["Low", "Medium", "High"]
+BENCH_TAG = "bench"
+
+
+# ========== MESURES ==========
+class Recorder:
+    """Latences (ms) par requête, comptées seulement après le warmup."""
+
+    def __init__(self, record_from: float):
+        self.record_from = record_from
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+        self.iterations = 0
+
+    async def call(self, client: httpx.AsyncClient, op: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            await response.aread()
+        except httpx.HTTPError:
+            response = None
+        elapsed = (time.perf_counter() - start) * 1000
+        ok = response is not None and response.status_code < 400
+        if start >= self.record_from:
+            if ok:
+                self.samples[op].append(elapsed)
+            else:
+                self.errors[op] += 1
+        return response if ok else None
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Rang le plus proche : pas d'interpolation, stable d'un run à l'autre."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(recorder: Recorder, duration: float) -> dict:
+    operations = {}
+    for op in sorted(set(recorder.samples) | set(recorder.errors)):
+        values = sorted(recorder.samples[op])
+        operations[op] = {
+            "requests": len(values),
+            "errors": recorder.errors[op],
+            "rps": round(len(values) / duration, 2),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2) if values else 0.0,
+        }
+    total = sum(item["requests"] for item in operations.values())
+    return {
+        "iterations": recorder.iterations,
+        "iterations_per_s": round(recorder.iterations / duration, 2),
+        "requests": total,
+        "errors": sum(recorder.errors.values()),
+        "rps": round(total / duration, 2),
+        "operations": operations,
+    }
+
+
+# ========== SCÉNARIOS ==========
+@dataclass
+class Fixture:
+    """Identifiants du jeu de données, chargés une fois avant les scénarios."""
+
+    task_ids: list[str]
+    project_ids: list[str]
+    task_statuses: dict[str, str] = field(default_factory=dict)
+    document: bytes = b""
+    created_tasks: list[str] = field(default_factory=list)
+    created_documents: list[str] = field(default_factory=list)
+    moved_tasks: set[str] = field(default_factory=set)
+
+
+@dataclass
+class User:
+    client: httpx.AsyncClient
+    recorder: Recorder
+    rng: random.Random
+    fixture: Fixture
+    args: argparse.Namespace
+
+
+async def scenario_dashboard(user: User) -> None:
+    calls = [
+        ("GET /stats", "/stats", {}),
+        ("GET /clients", "/clients", {"limit": 100}),
+        ("GET /tasks", "/tasks", {"limit": 100}),
+        ("GET /finances", "/finances", {"limit": 100}),
+    ]
+    await asyncio.gather(
+        *(user.recorder.call(user.client, op, "GET", url, params=params) for op, url, params in calls)
+    )
+
+
+async def scenario_kanban(user: User) -> None:
+    task_id = user.rng.choice(user.fixture.task_ids)
+    status = user.rng.choice(TASK_STATUSES)
+    user.fixture.moved_tasks.add(task_id)
+    await user.recorder.call(user.client, "PUT /tasks/{id}", "PUT", f"/tasks/{task_id}", json={"status": status})
+    await user.recorder.call(user.client, "GET /tasks", "GET", "/tasks", params={"limit": 100})
+
+
+async def scenario_today(user: User) -> None:
+    await user.recorder.call(user.client, "GET /today", "GET", "/today")
+
+
+async def scenario_bulk_tasks(user: User) -> None:
+    due = datetime.now(timezone.utc).replace(microsecond=0)
+
+    async def create() -> None:
+        body = {
+            "title": f"Bench task {user.rng.randrange(10**9)}",
+            "status": user.rng.choice(TASK_STATUSES[:2]),
+            "priority": user.rng.choice(PRIORITIES),
+            "due_date": (due + timedelta(days=user.rng.randint(-5, 30))).isoformat(),
+            "tags": [BENCH_TAG],
+        }
+        response = await user.recorder.call(user.client, "POST /tasks", "POST", "/tasks", json=body)
+        if response is not None:
+            user.fixture.created_tasks.append(response.json()["id"])
+
+    await asyncio.gather(*(create() for _ in range(user.args.bulk_size)))
+
+
+async def scenario_documents(user: User) -> None:
+    project_id = user.rng.choice(user.fixture.project_ids)
+    files = {"file": ("bench.txt", user.fixture.document, "text/plain")}
+    response = await user.recorder.call(
+        user.client, "POST /projects/{id}/documents", "POST", f"/projects/{project_id}/documents", files=files
+    )
+    if response is None:
+        return
+    document_id = response.json()["id"]
+    user.fixture.created_documents.append(document_id)
+    await user.recorder.call(user.client, "GET /documents/{id}/download", "GET", f"/documents/{document_id}/download")
+
+
+SCENARIOS: dict[str, Callable[[User], Awaitable[None]]] = {
+    "dashboard": scenario_dashboard,
+    "kanban": scenario_kanban,
+    "today": scenario_today,
+    "bulk_tasks": scenario_bulk_tasks,
+    "documents": scenario_documents,
+}
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, fixture: Fixture, args: argparse.Namespace) -> dict:
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    recorder = Recorder(record_from=start + args.warmup)
+    deadline = loop.time() + args.warmup + args.duration
+    scenario = SCENARIOS[name]
+
+    async def virtual_user(index: int) -> None:
+        user = User(client, recorder, random.Random(f"{args.seed}:{name}:{index}"), fixture, args)
+        while loop.time() < deadline:
+            began = time.perf_counter()
+            await scenario(user)
+            if began >= recorder.record_from:
+                recorder.iterations += 1
+
+    await asyncio.gather(*(virtual_user(index) for index in range(args.concurrency)))
+    return summarize(recorder, args.duration)
+
+
+# ========== JEU DE DONNÉES ==========
+async def _bounded(coros: list[Awaitable], limit: int) -> list:
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro: Awaitable):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+
+async def seed_via_api(client: httpx.AsyncClient, args: argparse.Namespace) -> None:
+    """Petit jeu de données créé par l'API (`--scale` clients, 10 tâches et 1 projet sur 10 par client)."""
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+
+    async def post(url: str, body: dict) -> dict:
+        response = await client.post(url, json=body)
+        response.raise_for_status()
+        return response.json()
+
+    clients = await _bounded(
+        [
+            post("/clients", {
+                "company_name": f"Bench client {index:06d}",
+                "pipeline_stage": rng.choice(PIPELINE_STAGES),
+                "priority": rng.choice(PRIORITIES),
+                "next_action_date": (now + timedelta(days=rng.randint(-10, 20))).isoformat(),
+            })
+            for index in range(args.scale)
+        ],
+        args.concurrency,
+    )
+    client_ids = [item["id"] for item in clients]
+    await _bounded(
+        [
+            post("/tasks", {
+                "title": f"Seed task {index:07d}",
+                "status": rng.choice(TASK_STATUSES),
+                "priority": rng.choice(PRIORITIES),
+                "due_date": (now + timedelta(days=rng.randint(-30, 60))).isoformat(),
+                "client_id": rng.choice(client_ids),
+                "tags": rng.sample(["dev", "design", "admin", "seo", "support"], k=rng.randint(0, 2)),
+            })
+            for index in range(args.scale * 10)
+        ],
+        args.concurrency,
+    )
+    await _bounded(
+        [
+            post("/projects", {"name": f"Bench project {index:05d}", "client_id": client_id})
+            for index, client_id in enumerate(client_ids[::10])
+        ],
+        args.concurrency,
+    )
+    print(f"Seeded {len(client_ids)} clients, {args.scale * 10} tasks via the API", file=sys.stderr)
+
+
+def document_payload(size_kb: int, seed: int) -> bytes:
+    """Texte (indexé par l'extraction en arrière-plan comme un vrai document)."""
+    rng = random.Random(seed)
+    words = ["contrat", "devis", "livrable", "maquette", "facture", "réunion", "client", "projet", "site", "audit"]
+    text = " ".join(rng.choice(words) for _ in range(size_kb * 128)).encode()
+    return (text * (size_kb * 1024 // len(text) + 1))[: size_kb * 1024]
+
+
+async def load_fixture(client: httpx.AsyncClient, args: argparse.Namespace) -> Fixture:
+    tasks = (await client.get("/tasks", params={"limit": 1000})).json()
+    projects = (await client.get("/projects", params={"limit": 200})).json()
+    return Fixture(
+        task_ids=[task["id"] for task in tasks],
+        task_statuses={task["id"]: task["status"] for task in tasks},
+        project_ids=[project["id"] for project in projects],
+        document=document_payload(args.file_kb, args.seed),
+    )
+
+
+async def cleanup(client: httpx.AsyncClient, fixture: Fixture, concurrency: int) -> None:
+    deletes = [client.delete(f"/tasks/{task_id}") for task_id in fixture.created_tasks]
+    deletes += [client.delete(f"/documents/{document_id}") for document_id in fixture.created_documents]
+    restores = [
+        client.put(f"/tasks/{task_id}", json={"status": fixture.task_statuses[task_id]})
+        for task_id in fixture.moved_tasks
+    ]
+    await _bounded(deletes + restores, concurrency)
+    fixture.created_tasks.clear()
+    fixture.created_documents.clear()
+    fixture.moved_tasks.clear()
+
+
+# ========== RÉSULTATS ==========
+def git_revision() -> dict:
+    def git(*command: str) -> str:
+        try:
+            return subprocess.run(["git", *command], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain"))}
+
+
+def print_comparison(current: dict, baseline: dict) -> None:
+    print(f"\nvs {baseline['meta'].get('commit') or '?'} (p95 ms / rps)", file=sys.stderr)
+    for name, result in current["scenarios"].items():
+        before_scenario = baseline["scenarios"].get(name)
+        if before_scenario is None:
+            continue
+        for op, stats in result["operations"].items():
+            before = before_scenario["operations"].get(op)
+            if before is None:
+                continue
+            delta = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+            print(
+                f"  {name:<11} {op:<32} p95 {before['p95_ms']:>8.1f} -> {stats['p95_ms']:>8.1f} ({delta:+.0f}%)"
+                f"   rps {before['rps']:>7.1f} -> {stats['rps']:>7.1f}",
+                file=sys.stderr,
+            )
+
+
+async def authenticate(client: httpx.AsyncClient, args: argparse.Namespace) -> None:
+    if args.api_key:
+        client.headers["X-API-Key"] = args.api_key
+        return
+    response = await client.post("/auth/token", data={"username": args.email, "password": args.password})
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+
+async def main(args: argparse.Namespace) -> dict:
+    started_at = datetime.now(timezone.utc).isoformat()
+    limits = httpx.Limits(max_connections=args.concurrency * 4, max_keepalive_connections=args.concurrency * 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        await authenticate(client, args)
+        if args.scale:
+            await seed_via_api(client, args)
+        fixture = await load_fixture(client, args)
+        if not fixture.task_ids or not fixture.project_ids:
+            sys.exit("No tasks or projects in the database: seed it first (--scale N).")
+
+        results = {}
+        for name in args.scenarios:
+            print(
+                f"Running {name} ({args.concurrency} users, {args.warmup}s warmup + {args.duration}s)...",
+                file=sys.stderr,
+            )
+            results[name] = await run_scenario(client, name, fixture, args)
+            print(f"  {results[name]['rps']} req/s, {results[name]['errors']} error(s)", file=sys.stderr)
+            await cleanup(client, fixture, args.concurrency)
+
+    return {
+        "meta": {
+            **git_revision(),
+            "started_at": started_at,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "cpus": os.cpu_count(),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "seed": args.seed,
+            "bulk_size": args.bulk_size,
+            "file_kb": args.file_kb,
+            "dataset": {"tasks_sampled": len(fixture.task_ids), "projects_sampled": len(fixture.project_ids)},
+        },
+        "scenarios": results,
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HTTP load tests for the Aetheria API")
+    parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--email", default=os.getenv("ADMIN_EMAIL", "admin@aetheria.local"))
+    parser.add_argument("--password", default=os.getenv("ADMIN_PASSWORD", "admin123"))
+    parser.add_argument("--api-key", default=os.getenv("CRM_API_KEY", ""), help="X-API-Key instead of a login")
+    parser.add_argument(
+        "--scenario", dest="scenarios", action="append", choices=sorted(SCENARIOS),
+        help="scenario to run (repeatable, default: all)",
+    )
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users per scenario")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before each scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=int, default=0, help="seed N clients (and 10N tasks) through the API first")
+    parser.add_argument("--bulk-size", type=int, default=20, help="tasks created per bulk_tasks iteration")
+    parser.add_argument("--file-kb", type=int, default=256, help="size of uploaded documents")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", type=Path, help="JSON result file (default: stdout)")
+    parser.add_argument("--compare", type=Path, help="previous JSON result to compare with")
+    args = parser.parse_args(argv)
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(output + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    if args.compare:
+        print_comparison(report, json.loads(args.compare.read_text()))
@@ -0,0 +1,93 @@
+"""Gestion des taux de change vers l'EUR et recalcul de finances.amount_eur.
+
+Usage :
+    python fx_rates.py list
+    python fx_rates.py set USD 0.92          # 1 USD = 0.92 EUR
+    python fx_rates.py import rates.csv      # lignes "USD,0.92" (en-tête optionnel)
+    python fx_rates.py missing               # devises sans taux (amount_eur NULL)
+    python fx_rates.py recompute             # recalcule tous les montants EUR
+
+Chaque modification de taux recalcule en bloc les finances des devises
+concernées et planifie le rafraîchissement de la projection.
+"""
+import argparse
+import asyncio
+import csv
+import sys
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import select
+from app.database import AsyncSessionLocal, engine
+from app.models import FxRate
+from app.services.finance_forecast import schedule_forecast_refresh
+from app.services.fx import (
+    currencies_missing_rate,
+    normalize_currency,
+    recompute_amounts_eur,
+    upsert_rates,
+)
+
+
+def read_rates_csv(path: str) -> dict[str, Decimal]:
+    rates: dict[str, Decimal] = {}
+    with open(path, newline="") as handle:
+        for row in csv.reader(handle):
+            if len(row) < 2 or not row[0].strip():
+                continue
+            try:
+                rates[normalize_currency(row[0])] = Decimal(row[1].strip())
+            except InvalidOperation:
+                continue  # en-tête ou ligne invalide
+    return rates
+
+
+async def apply_rates(rates: dict[str, Decimal]) -> None:
+    async with AsyncSessionLocal() as db:
+        await upsert_rates(db, rates)
+        updated = await recompute_amounts_eur(db, rates.keys())
+        await schedule_forecast_refresh(db)
+        await db.commit()
+    print(f"✅ {len(rates)} rate(s) saved, {updated} finance row(s) recomputed")
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.command == "list":
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(FxRate).order_by(FxRate.currency))
+            for rate in result.scalars():
+                print(f"{rate.currency:<6} {rate.rate_to_eur:>14}  (updated {rate.updated_at:%Y-%m-%d %H:%M})")
+    elif args.command == "set":
+        await apply_rates({normalize_currency(args.currency): Decimal(args.rate)})
+    elif args.command == "import":
+        await apply_rates(read_rates_csv(args.file))
+    elif args.command == "missing":
+        async with AsyncSessionLocal() as db:
+            missing = await currencies_missing_rate(db)
+        for currency, count in missing:
+            print(f"{currency:<6} {count} row(s) without EUR amount")
+        if not missing:
+            print("✅ Every finance row has an EUR amount")
+    elif args.command == "recompute":
+        async with AsyncSessionLocal() as db:
+            updated = await recompute_amounts_eur(db)
+            await schedule_forecast_refresh(db)
+            await db.commit()
+        print(f"✅ {updated} finance row(s) recomputed")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    set_parser = commands.add_parser("set")
+    set_parser.add_argument("currency")
+    set_parser.add_argument("rate", help="Valeur de 1 unité de la devise en EUR")
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("file")
+    commands.add_parser("missing")
+    commands.add_parser("recompute")
+    asyncio.run(main(parser.parse_args()))
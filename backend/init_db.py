@@ -9,17 +9,18 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.database import AsyncSessionLocal, engine, Base
+from app.database import AsyncSessionLocal
 from app.models import User
 from app.auth import get_password_hash
+from app.migrations import upgrade
 
 
 async def init_database():
-    """Crée toutes les tables."""
-    print("🔨 Creating database tables...")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    print("✅ Database tables created!")
+    """Crée le schéma en appliquant les migrations Alembic."""
+    print("🔨 Applying database migrations...")
+    # Alembic pilote sa propre boucle asyncio : on le lance dans un thread.
+    await asyncio.to_thread(upgrade)
+    print("✅ Database schema up to date!")
 
 
 async def create_admin_user():
@@ -64,7 +65,7 @@ async def main():
     print("="*50 + "\n")
     
     try:
-        # Étape 1: Créer les tables
+        # Étape 1: Migrer le schéma
         await init_database()
         
         # Étape 2: Créer l'admin
@@ -0,0 +1,55 @@
+"""Migrations du schéma (Alembic).
+
+Usage :
+    python migrate.py upgrade [révision]      # défaut : head
+    python migrate.py downgrade <révision>    # ex : -1, 0001, base
+    python migrate.py current                 # révision appliquée en base
+    python migrate.py history
+    python migrate.py stamp <révision>        # marque sans exécuter
+    python migrate.py revision -m "message" [--autogenerate]
+
+L'API ne touche plus au schéma au démarrage : lancer `upgrade` à chaque
+déploiement, avant de démarrer les conteneurs de l'application. Une base créée
+par l'ancien démarrage (create_all) est reprise par la révision 0001, qui ne
+crée que ce qui manque.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from alembic import command
+from app.migrations import alembic_config
+
+
+def main(args: argparse.Namespace) -> None:
+    config = alembic_config()
+    if args.command == "upgrade":
+        command.upgrade(config, args.revision, sql=args.sql)
+    elif args.command == "downgrade":
+        command.downgrade(config, args.revision, sql=args.sql)
+    elif args.command == "current":
+        command.current(config, verbose=True)
+    elif args.command == "history":
+        command.history(config, indicate_current=True)
+    elif args.command == "stamp":
+        command.stamp(config, args.revision)
+    elif args.command == "revision":
+        command.revision(config, message=args.message, autogenerate=args.autogenerate)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, default in (("upgrade", "head"), ("downgrade", None)):
+        sub = commands.add_parser(name)
+        sub.add_argument("revision", nargs="?" if default else None, default=default)
+        sub.add_argument("--sql", action="store_true", help="Affiche le SQL sans l'exécuter")
+    commands.add_parser("current")
+    commands.add_parser("history")
+    commands.add_parser("stamp").add_argument("revision")
+    revision = commands.add_parser("revision")
+    revision.add_argument("-m", "--message", required=True)
+    revision.add_argument("--autogenerate", action="store_true")
+    main(parser.parse_args())
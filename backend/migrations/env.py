@@ -0,0 +1,71 @@
+"""Environnement Alembic (asyncpg) : l'URL vient de DATABASE_URL."""
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import DATABASE_URL, Base
+from app import models  # noqa: F401 - enregistre les tables sur Base.metadata
+from app.migrations import MIGRATION_LOCK, MIGRATION_UNLOCK
+
+config = context.config
+# Appelé depuis l'app (connexion fournie) : on garde sa configuration de logging.
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def _configure(**options) -> None:
+    context.configure(
+        target_metadata=target_metadata,
+        # Une transaction par révision : autocommit_block() (CREATE INDEX
+        # CONCURRENTLY) ne peut pas vivre dans une transaction englobante.
+        transaction_per_migration=True,
+        compare_type=True,
+        **options,
+    )
+
+
+def run_migrations_offline() -> None:
+    _configure(url=DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    _configure(connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    connectable = create_async_engine(DATABASE_URL, poolclass=pool.NullPool)
+    async with connectable.connect() as connection:
+        # Même verrou que la vérification au démarrage de l'API (app/migrations.py).
+        await connection.execute(MIGRATION_LOCK)
+        await connection.commit()
+        try:
+            await connection.run_sync(do_run_migrations)
+        finally:
+            await connection.execute(MIGRATION_UNLOCK)
+            await connection.commit()
+    await connectable.dispose()
+
+
+def run_migrations_online() -> None:
+    # Connexion fournie par l'appelant (ex: migration depuis l'app, dans sa boucle).
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+    else:
+        asyncio.run(run_async_migrations())
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,310 @@
+"""Baseline : schéma existant (ex create_all + migrations runtime au démarrage)
+
+Sur une base vierge, crée tout le schéma. Sur une base déjà initialisée par
+l'ancien démarrage (create_all + ALTER … IF NOT EXISTS), ne crée que ce qui
+manque : types enum et tables absents, colonnes ajoutées au fil de l'eau, index.
+Elle rejoue aussi les rattrapages de données qui tournaient à chaque boot.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _enum(name: str, *values: str) -> postgresql.ENUM:
+    return postgresql.ENUM(*values, name=name, create_type=False)
+
+
+# Valeurs = noms des membres Python (SQLEnum stocke les noms).
+clientstatus = _enum("clientstatus", "PROSPECT", "CLIENT", "ARCHIVE")
+pipelinestage = _enum("pipelinestage", "NEW", "CONTACTED", "MEETING_BOOKED", "DEV", "SIGNED", "DELIVERED")
+priority = _enum("priority", "LOW", "MEDIUM", "HIGH")
+companysize = _enum("companysize", "TPE", "PME", "ETI", "GE")
+taskstatus = _enum("taskstatus", "BACKLOG", "TODO", "IN_PROGRESS", "VALIDATION", "DONE")
+financetype = _enum("financetype", "SUBSCRIPTION", "ONE_OFF")
+financecategory = _enum("financecategory", "SOFTWARE", "HARDWARE", "SERVICE", "OFFICE")
+projectstatus = _enum("projectstatus", "ACTIVE", "ON_HOLD", "DONE", "ARCHIVED")
+extractionstatus = _enum("extractionstatus", "DONE", "UNSUPPORTED")
+jobstatus = _enum("jobstatus", "QUEUED", "RUNNING", "DONE", "FAILED")
+
+ENUMS = (
+    clientstatus, pipelinestage, priority, companysize, taskstatus,
+    financetype, financecategory, projectstatus, extractionstatus, jobstatus,
+)
+
+
+def _uuid_pk() -> sa.Column:
+    return sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True)
+
+
+TABLES = {
+    "users": lambda: op.create_table(
+        "users",
+        _uuid_pk(),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("hashed_password", sa.String(255), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("role", sa.String(50), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    ),
+    "clients": lambda: op.create_table(
+        "clients",
+        _uuid_pk(),
+        sa.Column("company_name", sa.String(255), nullable=False),
+        sa.Column("contact_person", sa.String(255), nullable=True),
+        sa.Column("status", clientstatus, nullable=True),
+        sa.Column("pipeline_stage", pipelinestage, nullable=True),
+        sa.Column("priority", priority, nullable=True),
+        sa.Column("sector", sa.String(255), nullable=True),
+        sa.Column("company_size", companysize, nullable=True),
+        sa.Column("phone", sa.String(50), nullable=True),
+        sa.Column("email", sa.String(255), nullable=True),
+        sa.Column("next_action_date", sa.DateTime(), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("pipeline_stage_since", sa.DateTime(), nullable=True),
+    ),
+    "pipeline_transitions": lambda: op.create_table(
+        "pipeline_transitions",
+        _uuid_pk(),
+        sa.Column(
+            "client_id", postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("clients.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("from_stage", pipelinestage, nullable=True),
+        sa.Column("to_stage", pipelinestage, nullable=False),
+        sa.Column("seconds_in_from_stage", sa.BigInteger(), nullable=True),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+    ),
+    "pipeline_weekly_stats": lambda: op.create_table(
+        "pipeline_weekly_stats",
+        sa.Column("week", sa.Date(), primary_key=True),
+        sa.Column("stage", pipelinestage, primary_key=True),
+        sa.Column("entered", sa.Integer(), nullable=False),
+        sa.Column("advanced", sa.Integer(), nullable=False),
+        sa.Column("regressed", sa.Integer(), nullable=False),
+        sa.Column("seconds_in_stage", sa.BigInteger(), nullable=False),
+    ),
+    "tasks": lambda: op.create_table(
+        "tasks",
+        _uuid_pk(),
+        sa.Column("title", sa.String(500), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("status", taskstatus, nullable=True),
+        sa.Column("priority", priority, nullable=True),
+        sa.Column("due_date", sa.DateTime(), nullable=True),
+        sa.Column("estimated_hours", sa.Numeric(10, 2), nullable=True),
+        sa.Column("actual_hours", sa.Numeric(10, 2), nullable=True),
+        sa.Column("tags", postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("client_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("clients.id"), nullable=True),
+    ),
+    "finances": lambda: op.create_table(
+        "finances",
+        _uuid_pk(),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("type", financetype, nullable=True),
+        sa.Column("category", financecategory, nullable=True),
+        sa.Column("amount", sa.Numeric(10, 2), nullable=False),
+        sa.Column("currency", sa.String(10), nullable=True),
+        sa.Column("amount_eur", sa.Numeric(12, 2), nullable=True),
+        sa.Column("billing_date", sa.Date(), nullable=False),
+        sa.Column("renewal_date", sa.Date(), nullable=True),
+        sa.Column("is_paid", sa.Boolean(), nullable=True),
+        sa.Column("invoice_path", sa.String(500), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    ),
+    "fx_rates": lambda: op.create_table(
+        "fx_rates",
+        sa.Column("currency", sa.String(10), primary_key=True),
+        sa.Column("rate_to_eur", sa.Numeric(18, 8), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    ),
+    "finance_forecast": lambda: op.create_table(
+        "finance_forecast",
+        sa.Column("month", sa.Date(), primary_key=True),
+        sa.Column("category", financecategory, primary_key=True),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("subscriptions", sa.Integer(), nullable=False),
+        sa.Column("generated_at", sa.DateTime(), nullable=False),
+    ),
+    "meeting_notes": lambda: op.create_table(
+        "meeting_notes",
+        _uuid_pk(),
+        sa.Column("title", sa.String(500), nullable=False),
+        sa.Column("date", sa.DateTime(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("attachments", postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column("client_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("clients.id"), nullable=False),
+    ),
+    "projects": lambda: op.create_table(
+        "projects",
+        _uuid_pk(),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("status", projectstatus, nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("client_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("clients.id"), nullable=False),
+    ),
+    "documents": lambda: op.create_table(
+        "documents",
+        _uuid_pk(),
+        sa.Column("name", sa.String(500), nullable=False),
+        sa.Column("file_path", sa.String(1000), nullable=False),
+        sa.Column("file_size", sa.BigInteger(), nullable=True),
+        sa.Column("content_type", sa.String(255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("project_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("projects.id"), nullable=False),
+    ),
+    "document_texts": lambda: op.create_table(
+        "document_texts",
+        sa.Column(
+            "document_id", postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True,
+        ),
+        sa.Column(
+            "project_id", postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("status", extractionstatus, nullable=False),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("truncated", sa.Boolean(), nullable=True),
+        sa.Column(
+            "tsv", postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('french', coalesce(content, ''))", persisted=True),
+        ),
+        sa.Column("extracted_at", sa.DateTime(), nullable=True),
+    ),
+    "storage_quarantine": lambda: op.create_table(
+        "storage_quarantine",
+        sa.Column("key", sa.String(1000), primary_key=True),
+        sa.Column("size", sa.BigInteger(), nullable=True),
+        sa.Column("quarantined_at", sa.DateTime(), nullable=False),
+        sa.Column("last_seen_at", sa.DateTime(), nullable=False),
+    ),
+    "jobs": lambda: op.create_table(
+        "jobs",
+        _uuid_pk(),
+        sa.Column("kind", sa.String(100), nullable=False),
+        sa.Column("payload", postgresql.JSONB(), nullable=False),
+        sa.Column("status", jobstatus, nullable=False),
+        sa.Column("priority", sa.Integer(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("run_at", sa.DateTime(), nullable=False),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("result", postgresql.JSONB(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    ),
+    "audit_log": lambda: op.create_table(
+        "audit_log",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("ts", sa.DateTime(), nullable=False),
+        sa.Column("entity", sa.String(50), nullable=False),
+        sa.Column("entity_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("action", sa.String(10), nullable=False),
+        sa.Column("actor_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("actor_email", sa.String(255), nullable=True),
+        sa.Column("via", sa.String(20), nullable=False),
+        sa.Column("changes", postgresql.JSONB(), nullable=True),
+    ),
+    "digest_snapshots": lambda: op.create_table(
+        "digest_snapshots",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("payload", postgresql.JSONB(), nullable=False),
+        sa.Column("fingerprint", sa.String(64), nullable=False),
+        sa.Column("generated_at", sa.DateTime(), nullable=False),
+        sa.Column("pushed_at", sa.DateTime(), nullable=True),
+        sa.Column("pushed_fingerprint", sa.String(64), nullable=True),
+    ),
+}
+
+# (nom, table, colonnes, options) - index déclarés dans models.py à cette révision.
+INDEXES = [
+    ("ix_users_email", "users", ["email"], {"unique": True}),
+    ("ix_pipeline_transitions_client_changed", "pipeline_transitions", ["client_id", "changed_at"], {}),
+    ("ix_finances_type_billing_date", "finances", ["type", "billing_date"], {}),
+    ("ix_finances_invoice_path", "finances", ["invoice_path"], {}),
+    ("ix_meeting_notes_attachments", "meeting_notes", ["attachments"], {"postgresql_using": "gin"}),
+    ("ix_documents_file_path", "documents", ["file_path"], {}),
+    ("ix_document_texts_tsv", "document_texts", ["tsv"], {"postgresql_using": "gin"}),
+    ("ix_document_texts_project_id", "document_texts", ["project_id"], {}),
+    ("ix_jobs_claim", "jobs", ["status", "priority", "run_at"], {}),
+    ("ix_audit_log_entity", "audit_log", ["entity", "entity_id", "ts"], {}),
+    ("ix_audit_log_ts", "audit_log", ["ts"], {}),
+]
+
+# Colonnes ajoutées autrefois par apply_runtime_migrations().
+LEGACY_COLUMNS = [
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS estimated_hours NUMERIC(10,2)",
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS actual_hours NUMERIC(10,2)",
+    "ALTER TABLE finances ADD COLUMN IF NOT EXISTS amount_eur NUMERIC(12,2)",
+    "ALTER TABLE clients ADD COLUMN IF NOT EXISTS pipeline_stage_since TIMESTAMP",
+]
+
+BACKFILLS = [
+    # Montants EUR des lignes antérieures à amount_eur
+    """
+    UPDATE finances f
+    SET amount_eur = round(f.amount * coalesce(
+        (SELECT r.rate_to_eur FROM fx_rates r WHERE r.currency = upper(f.currency)),
+        CASE WHEN upper(f.currency) = 'EUR' THEN 1 END
+    ), 2)
+    WHERE f.amount_eur IS NULL
+    """,
+    "UPDATE clients SET pipeline_stage_since = created_at WHERE pipeline_stage_since IS NULL",
+    # Entrée initiale dans le pipeline des clients antérieurs à l'historique
+    """
+    WITH seeded AS (
+        INSERT INTO pipeline_transitions (id, client_id, from_stage, to_stage, changed_at)
+        SELECT gen_random_uuid(), c.id, NULL, c.pipeline_stage, coalesce(c.created_at, now())
+        FROM clients c
+        WHERE c.pipeline_stage IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM pipeline_transitions t WHERE t.client_id = c.id)
+        RETURNING to_stage, changed_at
+    )
+    INSERT INTO pipeline_weekly_stats (week, stage, entered, advanced, regressed, seconds_in_stage)
+    SELECT date_trunc('week', changed_at)::date, to_stage, count(*), 0, 0, 0
+    FROM seeded
+    GROUP BY 1, 2
+    ON CONFLICT (week, stage) DO UPDATE
+    SET entered = pipeline_weekly_stats.entered + excluded.entered
+    """,
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for enum in ENUMS:
+        enum.create(bind, checkfirst=True)
+
+    # Mode --sql (pas de connexion) : script complet pour une base vierge.
+    existing = set() if op.get_context().as_sql else set(sa.inspect(bind).get_table_names())
+    for name, create in TABLES.items():
+        if name not in existing:
+            create()
+
+    for statement in LEGACY_COLUMNS:
+        op.execute(statement)
+    for name, table, columns, options in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True, **options)
+    for statement in BACKFILLS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for name in reversed(list(TABLES)):
+        op.drop_table(name)
+    bind = op.get_bind()
+    for enum in ENUMS:
+        enum.drop(bind, checkfirst=True)
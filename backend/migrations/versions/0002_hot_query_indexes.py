@@ -0,0 +1,52 @@
+"""Index des clés étrangères et des filtres statut/date des requêtes chaudes
+
+Créés avec CREATE INDEX CONCURRENTLY (hors transaction, via autocommit_block) :
+les écritures ne sont pas bloquées pendant la construction sur une base en
+production. Si une construction échoue, Postgres laisse un index INVALID ;
+relancer la migration après `DROP INDEX CONCURRENTLY <nom>`.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (nom, table, colonnes, options)
+INDEXES = [
+    # Clés étrangères : jointures, filtres par parent et suppressions en cascade ORM
+    ("ix_tasks_client_id", "tasks", ["client_id"], {}),
+    ("ix_meeting_notes_client_id", "meeting_notes", ["client_id"], {}),
+    ("ix_projects_client_id", "projects", ["client_id"], {}),
+    ("ix_documents_project_id", "documents", ["project_id"], {}),
+    # /today, /stats : tâches non terminées par échéance, comptages par statut
+    ("ix_tasks_status_due_date", "tasks", ["status", "due_date"], {}),
+    ("ix_clients_status", "clients", ["status"], {}),
+    (
+        "ix_clients_next_action_date", "clients", ["next_action_date"],
+        {"postgresql_where": sa.text("next_action_date IS NOT NULL")},
+    ),
+    (
+        "ix_finances_renewal_date", "finances", ["renewal_date"],
+        {"postgresql_where": sa.text("renewal_date IS NOT NULL")},
+    ),
+    # enqueue_once : job de même type déjà en file
+    ("ix_jobs_kind_status_run_at", "jobs", ["kind", "status", "run_at"], {}),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
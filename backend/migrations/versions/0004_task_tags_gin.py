@@ -0,0 +1,29 @@
+"""Index GIN sur tasks.tags (filtres tags_any / tags_all)
+
+Créé avec CREATE INDEX CONCURRENTLY, comme 0002 : les écritures sur `tasks`
+ne sont pas bloquées pendant la construction. En cas d'échec, supprimer l'index
+INVALID (`DROP INDEX CONCURRENTLY ix_tasks_tags`) puis relancer.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_tags", "tasks", ["tags"],
+            postgresql_using="gin", postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_tasks_tags", table_name="tasks", postgresql_concurrently=True, if_exists=True)
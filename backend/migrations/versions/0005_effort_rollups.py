@@ -0,0 +1,51 @@
+"""Agrégats hebdomadaires d'effort (heures estimées / réelles) et index de la date d'effort
+
+`effort_weekly_rollups` est rempli par le job `effort_rollup_refresh`, lancé
+à la première écriture de tâche ou au démarrage des workers de jobs.
+L'index d'expression est créé avec CREATE INDEX CONCURRENTLY, comme 0002.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "effort_weekly_rollups",
+        sa.Column("week", sa.Date(), primary_key=True),
+        sa.Column("dimension", sa.String(10), primary_key=True),
+        sa.Column("key", sa.Text(), primary_key=True),
+        sa.Column("tasks", sa.Integer(), nullable=False),
+        sa.Column("estimated_hours", sa.Numeric(14, 2), nullable=False),
+        sa.Column("actual_hours", sa.Numeric(14, 2), nullable=False),
+        sa.Column("compared_tasks", sa.Integer(), nullable=False),
+        sa.Column("compared_estimated", sa.Numeric(14, 2), nullable=False),
+        sa.Column("compared_actual", sa.Numeric(14, 2), nullable=False),
+        sa.Column("overrun_tasks", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "effort_rollup_weeks",
+        sa.Column("week", sa.Date(), primary_key=True),
+        sa.Column("dirty", sa.Boolean(), nullable=False),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=True),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_effort_at", "tasks", [sa.text("COALESCE(due_date, created_at)")],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_tasks_effort_at", table_name="tasks", postgresql_concurrently=True, if_exists=True)
+    op.drop_table("effort_rollup_weeks")
+    op.drop_table("effort_weekly_rollups")
@@ -0,0 +1,82 @@
+"""Tables froides : tâches terminées et clients archivés déplacés hors des tables chaudes
+
+`tasks.completed_at` et `clients.archived_at` datent l'entrée dans l'état froid
+(Done, Archive) ; rattrapées depuis le journal d'audit, à défaut `created_at`.
+Les tables `<table>_archive` ont les colonnes de la table chaude (LIKE), sans
+clés étrangères, plus `moved_at`. Le job `archive_cold_rows` les remplit.
+Tables neuves et vides : index créés dans la transaction.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+COLD_TABLES = ("tasks", "clients", "meeting_notes", "pipeline_transitions")
+
+# (table chaude, colonne, statut froid : nom du membre stocké / valeur dans l'audit)
+COLD_SINCE = (
+    ("tasks", "completed_at", "DONE", "Done"),
+    ("clients", "archived_at", "ARCHIVE", "Archive"),
+)
+
+INDEXES = [
+    ("ix_tasks_archive_client_id", "tasks_archive", ["client_id"], {}),
+    ("ix_tasks_archive_tags", "tasks_archive", ["tags"], {"postgresql_using": "gin"}),
+    ("ix_tasks_archive_effort_at", "tasks_archive", [sa.text("COALESCE(due_date, created_at)")], {}),
+    ("ix_meeting_notes_archive_client_id", "meeting_notes_archive", ["client_id"], {}),
+    # Pièces jointes encore référencées par des notes archivées (GC du stockage).
+    ("ix_meeting_notes_archive_attachments", "meeting_notes_archive", ["attachments"], {"postgresql_using": "gin"}),
+    ("ix_pipeline_transitions_archive_client_id", "pipeline_transitions_archive", ["client_id"], {}),
+]
+
+
+def upgrade() -> None:
+    for table, column, member, value in COLD_SINCE:
+        op.add_column(table, sa.Column(column, sa.DateTime(), nullable=True))
+        op.execute(
+            f"""
+            UPDATE {table} SET {column} = COALESCE(
+                (
+                    SELECT max(a.ts) FROM audit_log a
+                    WHERE a.entity = '{table}' AND a.entity_id = {table}.id
+                      AND a.changes -> 'status' ->> 1 = '{value}'
+                ),
+                {table}.created_at
+            )
+            WHERE status = '{member}'
+            """
+        )
+    for table in COLD_TABLES:
+        op.execute(f"CREATE TABLE {table}_archive (LIKE {table} INCLUDING DEFAULTS)")
+        op.execute(f"ALTER TABLE {table}_archive ADD PRIMARY KEY (id)")
+        op.add_column(f"{table}_archive", sa.Column("moved_at", sa.DateTime(), server_default=sa.func.now(), nullable=False))
+    for name, table, columns, options in INDEXES:
+        op.create_index(name, table, columns, **options)
+
+
+def downgrade() -> None:
+    # Les lignes froides reviennent dans les tables chaudes avant suppression.
+    for table in ("clients", "pipeline_transitions", "meeting_notes", "tasks"):
+        op.execute(
+            f"""
+            DO $$
+            DECLARE cols text;
+            BEGIN
+                SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO cols
+                FROM pg_attribute
+                WHERE attrelid = '{table}'::regclass AND attnum > 0 AND NOT attisdropped;
+                EXECUTE format('INSERT INTO {table} (%1$s) SELECT %1$s FROM {table}_archive', cols);
+            END $$
+            """
+        )
+    for table in COLD_TABLES:
+        op.drop_table(f"{table}_archive")
+    for table, column, _, _ in COLD_SINCE:
+        op.drop_column(table, column)
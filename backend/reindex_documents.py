@@ -0,0 +1,51 @@
+"""Relance l'extraction de texte des documents déjà uploadés.
+
+Usage :
+    python reindex_documents.py          # documents jamais indexés
+    python reindex_documents.py --all    # tous les documents
+
+Les jobs sont mis en file : ce sont les workers (API ou `python -m app.worker`)
+qui font l'extraction.
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import select
+from app.database import AsyncSessionLocal, engine
+from app.models import Document, DocumentText
+from app.services.document_index import enqueue_extraction
+
+BATCH_SIZE = 500
+
+
+async def reindex(all_documents: bool) -> None:
+    query = select(Document.id).order_by(Document.id)
+    if not all_documents:
+        query = query.outerjoin(DocumentText, DocumentText.document_id == Document.id).where(
+            DocumentText.document_id.is_(None)
+        )
+
+    total = 0
+    async with AsyncSessionLocal() as reader, AsyncSessionLocal() as writer:
+        # stream() + partitions : on ne charge jamais toute la table en mémoire.
+        result = await reader.stream(query.execution_options(yield_per=BATCH_SIZE))
+        async for batch in result.partitions(BATCH_SIZE):
+            for (document_id,) in batch:
+                enqueue_extraction(writer, document_id)
+            await writer.commit()
+            total += len(batch)
+            print(f"  {total} documents queued...")
+
+    print(f"✅ {total} extraction jobs queued")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all", action="store_true", help="Réindexer aussi les documents déjà traités")
+    args = parser.parse_args()
+    asyncio.run(reindex(args.all))
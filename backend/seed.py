@@ -0,0 +1,415 @@
+"""Génère un jeu de données CRM réaliste et déterministe, chargé par COPY.
+
+Usage :
+    python seed.py                                   # ~1 000 clients, 20 000 tâches
+    python seed.py --clients 50000 --tasks 1000000   # volumétrie de production
+    python seed.py --reset --seed 7                  # vide les tables métier avant
+    python seed.py --stage-weights "New=40,Contacted=30,Signed=5"
+
+Les lignes sont produites par des générateurs Python et envoyées par
+`COPY … FROM STDIN` binaire (asyncpg `copy_records_to_table`) : aucune
+requête par ligne, mémoire constante, 1M de tâches en quelques secondes.
+
+Même `--seed` et même `--anchor` : mêmes identifiants et mêmes valeurs, d'une
+machine à l'autre (les benchmarks restent comparables). Les dates sont
+réparties autour de `--anchor` (aujourd'hui par défaut) pour que /today et
+les renouvellements aient du contenu.
+
+Après le chargement : historique du pipeline et agrégats hebdomadaires,
+montants EUR, fichiers factices des documents (sauf `--no-files`), ANALYZE,
+puis rafraîchissement de la projection, du point du jour et des agrégats
+d'effort mis en file.
+Le texte des documents n'est pas extrait : `python reindex_documents.py`.
+"""
+import argparse
+import asyncio
+import bisect
+import io
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from enum import Enum
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import asyncpg
+
+from app.database import DATABASE_URL, AsyncSessionLocal, engine
+from app.migrations import ensure_schema
+from app.models import (
+    ClientStatus,
+    CompanySize,
+    FinanceCategory,
+    FinanceType,
+    PipelineStage,
+    Priority,
+    ProjectStatus,
+    TaskStatus,
+)
+from app.services.daily_digest import schedule_digest_refresh
+from app.services.effort import schedule_effort_refresh
+from app.services.finance_forecast import schedule_forecast_refresh
+from app.services.fx import recompute_amounts_eur
+from app.services.storage import get_storage
+
+# Tables remplies par ce script (ordre de TRUNCATE indifférent grâce à CASCADE)
+SEEDED_TABLES = [
+    "clients", "pipeline_transitions", "pipeline_weekly_stats", "tasks", "finances",
+    "meeting_notes", "projects", "documents", "document_texts", "finance_forecast", "digest_snapshots",
+    "effort_weekly_rollups", "effort_rollup_weeks",
+    "clients_archive", "tasks_archive", "meeting_notes_archive", "pipeline_transitions_archive",
+]
+
+WORDS = (
+    "site vitrine refonte maquette intégration contenu SEO audit devis contrat facture relance "
+    "réunion atelier livrable recette mise en ligne hébergement nom de domaine newsletter "
+    "formation support maintenance charte graphique logo photos rédaction planning budget "
+    "validation retour client priorité accès CMS analytics performance sécurité sauvegarde"
+).split()
+SECTORS = ["Restauration", "Immobilier", "Santé", "Artisanat", "Commerce", "Conseil", "Tourisme", "Associatif"]
+TAGS = ["dev", "design", "seo", "admin", "support", "contenu", "urgent", "devis", "facturation", "n8n"]
+CURRENCIES = {"EUR": 85, "USD": 10, "GBP": 5}
+FILE_SUFFIXES = [".txt", ".md"]
+# Textes courts tirés une fois puis réutilisés : générer des phrases mot à mot
+# pour chaque ligne coûterait plus cher que le COPY lui-même.
+TEXT_POOL_SIZE = 4096
+
+DEFAULT_WEIGHTS = {
+    "stage": "New=30,Contacted=25,Meeting Booked=15,Dev=10,Signed=10,Delivered=10",
+    "task_status": "Backlog=20,Todo=20,In Progress=15,Validation=5,Done=40",
+    "client_status": "Prospect=60,Client=30,Archive=10",
+}
+
+
+# ========== DISTRIBUTIONS ==========
+def parse_weights(spec: str, enum: type[Enum]) -> dict[Enum, float]:
+    """"New=30,Signed=5" -> {PipelineStage.NEW: 30, …} ; valeurs ou noms de membres acceptés."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        label, _, weight = item.rpartition("=")
+        member = next(
+            (m for m in enum if label.strip().lower() in (m.value.lower(), m.name.lower())), None
+        )
+        if member is None:
+            raise argparse.ArgumentTypeError(f"Unknown {enum.__name__} '{label}'")
+        weights[member] = float(weight)
+    if not weights or sum(weights.values()) <= 0:
+        raise argparse.ArgumentTypeError(f"Empty weights for {enum.__name__}")
+    return weights
+
+
+class Picker:
+    """Tirage pondéré rapide (poids cumulés calculés une fois, un seul `random()` par tirage)."""
+
+    def __init__(self, rng: random.Random, weights: dict):
+        self.random = rng.random
+        self.values = list(weights)
+        self.cum_weights = []
+        total = 0.0
+        for weight in weights.values():
+            total += weight
+            self.cum_weights.append(total)
+        self.total = total
+
+    def __call__(self):
+        return self.values[bisect.bisect(self.cum_weights, self.random() * self.total)]
+
+
+class Generator:
+    """Toutes les lignes dérivent d'un seul `random.Random(seed)`, tirées dans un ordre fixe."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.anchor = datetime.combine(args.anchor, dt_time(9, 0))
+        self.client_ids: list[uuid.UUID] = []
+        self.client_entries: list[tuple[uuid.UUID, str, datetime]] = []
+        self.project_ids: list[uuid.UUID] = []
+        self.documents: list[tuple[str, int]] = []
+
+    def uuid(self) -> uuid.UUID:
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def words(self, count: int) -> str:
+        return " ".join(self.rng.choices(WORDS, k=count))
+
+    def text_pool(self, low: int, high: int) -> list[str]:
+        return [self.words(self.rng.randint(low, high)) for _ in range(TEXT_POOL_SIZE)]
+
+    def pick(self, values: list):
+        return values[int(self.rng.random() * len(values))]
+
+    def days(self, low: int, high: int) -> timedelta:
+        # Résolution à la minute, sans passer par randint (trop lent sur 1M de lignes)
+        return timedelta(minutes=int((low + self.rng.random() * (high - low)) * 1440))
+
+    def client_index(self) -> int:
+        # Répartition inégale : quelques gros clients concentrent l'activité.
+        return int(len(self.client_ids) * self.rng.random() ** self.args.skew)
+
+    # ----- tables -----
+    def clients(self) -> Iterator[tuple]:
+        stage = Picker(self.rng, self.args.stage_weights)
+        status = Picker(self.rng, self.args.client_status_weights)
+        for index in range(self.args.clients):
+            client_id = self.uuid()
+            created = self.anchor - self.days(1, 720)
+            since = created + (self.anchor - created) * self.rng.random()
+            next_action = self.anchor + self.days(-15, 30) if self.rng.random() < 0.6 else None
+            current_stage = stage().name
+            picked = status()
+            self.client_ids.append(client_id)
+            self.client_entries.append((client_id, current_stage, created))
+            yield (
+                client_id,
+                f"{self.rng.choice(SECTORS)} {self.words(1).capitalize()} {index:06d}",
+                f"Contact {index:06d}",
+                picked.name,
+                current_stage,
+                self.rng.choice(list(Priority)).name,
+                self.rng.choice(SECTORS),
+                self.rng.choice(list(CompanySize)).name,
+                f"+33 6 {self.rng.randrange(10**8):08d}",
+                f"contact{index:06d}@example.com",
+                next_action,
+                self.words(self.rng.randint(0, 40)) or None,
+                created,
+                since,
+                since if picked == ClientStatus.ARCHIVE else None,
+            )
+
+    def pipeline_entries(self) -> Iterator[tuple]:
+        """Entrée initiale de chaque client dans son étape courante (comme la migration 0001)."""
+        for client_id, stage, created in self.client_entries:
+            yield (self.uuid(), client_id, None, stage, created)
+
+    def tasks(self) -> Iterator[tuple]:
+        status = Picker(self.rng, self.args.task_status_weights)
+        titles = [title.capitalize() for title in self.text_pool(2, 6)]
+        descriptions = self.text_pool(5, 60)
+        tag_sets = [self.rng.sample(TAGS, k=self.rng.choice([0, 1, 1, 2, 2, 3])) or None for _ in range(256)]
+        estimates = [Decimal(hours) for hours in (1, 2, 3, 4, 6, 8, 12, 16)]
+        ratios = [Decimal(tenths) / 10 for tenths in range(5, 16)]
+        priorities = [priority.name for priority in Priority]
+        random = self.rng.random
+        for index in range(self.args.tasks):
+            due = self.anchor + self.days(-60, 90) if random() < 0.8 else None
+            estimated = self.pick(estimates)
+            picked = status()
+            created = (due or self.anchor) - self.days(1, 60)
+            done_from = min(created, self.anchor)
+            yield (
+                self.uuid(),
+                f"{self.pick(titles)} #{index}",
+                self.pick(descriptions) if random() < 0.7 else None,
+                picked.name,
+                self.pick(priorities),
+                due,
+                estimated,
+                estimated * self.pick(ratios) if picked == TaskStatus.DONE else None,
+                self.pick(tag_sets),
+                created,
+                done_from + (self.anchor - done_from) * random() if picked == TaskStatus.DONE else None,
+                self.client_ids[self.client_index()] if self.client_ids and random() < 0.9 else None,
+            )
+
+    def finances(self) -> Iterator[tuple]:
+        currency = Picker(self.rng, CURRENCIES)
+        for index in range(self.args.finances):
+            subscription = self.rng.random() < self.args.subscription_ratio
+            billing = (self.anchor - self.days(0, 730)).date()
+            amount = Decimal(f"{self.rng.lognormvariate(3.5 if subscription else 5, 1):.2f}")
+            yield (
+                self.uuid(),
+                f"{'Abonnement' if subscription else 'Achat'} {self.words(2)} {index}",
+                (FinanceType.SUBSCRIPTION if subscription else FinanceType.ONE_OFF).name,
+                self.rng.choice(list(FinanceCategory)).name,
+                amount,
+                currency(),
+                billing,
+                (self.anchor + self.days(-5, 60)).date() if subscription else None,
+                self.rng.random() < 0.8,
+                datetime.combine(billing, dt_time(12, 0)),
+            )
+
+    def meeting_notes(self) -> Iterator[tuple]:
+        for index in range(self.args.notes):
+            length = max(int(self.rng.gauss(self.args.note_chars, self.args.note_chars / 3)), 50)
+            yield (
+                self.uuid(),
+                f"Réunion {self.words(2)} {index}",
+                self.anchor - self.days(0, 540),
+                "\n\n".join(self.words(60) for _ in range(length // 400 + 1))[:length],
+                None,
+                self.client_ids[self.client_index()],
+            )
+
+    def projects(self) -> Iterator[tuple]:
+        status_weights = {ProjectStatus.ACTIVE: 50, ProjectStatus.ON_HOLD: 10, ProjectStatus.DONE: 30, ProjectStatus.ARCHIVED: 10}
+        status = Picker(self.rng, status_weights)
+        for index in range(self.args.projects):
+            project_id = self.uuid()
+            self.project_ids.append(project_id)
+            yield (
+                project_id,
+                f"Projet {self.words(2)} {index}",
+                self.words(self.rng.randint(5, 30)),
+                status().name,
+                self.anchor - self.days(0, 540),
+                self.client_ids[self.client_index()],
+            )
+
+    def documents_rows(self) -> Iterator[tuple]:
+        for index in range(self.args.documents):
+            token = uuid.UUID(int=self.rng.getrandbits(128)).hex
+            name = f"{self.words(1)}_{index}{self.rng.choice(FILE_SUFFIXES)}"
+            # Même forme que storage.new_key : préfixe aléatoire shardé
+            key = f"{token[:2]}/{token[2:4]}/{token}_{name}"
+            size = self.args.file_bytes
+            self.documents.append((key, index))
+            yield (
+                self.uuid(),
+                name,
+                key,
+                size,
+                "text/markdown" if name.endswith(".md") else "text/plain",
+                self.anchor - self.days(0, 365),
+                self.rng.choice(self.project_ids),
+            )
+
+
+# ========== CHARGEMENT ==========
+COLUMNS = {
+    "clients": [
+        "id", "company_name", "contact_person", "status", "pipeline_stage", "priority", "sector",
+        "company_size", "phone", "email", "next_action_date", "notes", "created_at", "pipeline_stage_since",
+        "archived_at",
+    ],
+    "tasks": [
+        "id", "title", "description", "status", "priority", "due_date", "estimated_hours",
+        "actual_hours", "tags", "created_at", "completed_at", "client_id",
+    ],
+    "finances": [
+        "id", "name", "type", "category", "amount", "currency", "billing_date", "renewal_date",
+        "is_paid", "created_at",
+    ],
+    "meeting_notes": ["id", "title", "date", "content", "attachments", "client_id"],
+    "projects": ["id", "name", "description", "status", "created_at", "client_id"],
+    "documents": ["id", "name", "file_path", "file_size", "content_type", "created_at", "project_id"],
+}
+
+# Agrégats hebdomadaires des entrées dans le pipeline (cf. services/pipeline.py)
+PIPELINE_SQL = [
+    """
+    INSERT INTO pipeline_weekly_stats (week, stage, entered, advanced, regressed, seconds_in_stage)
+    SELECT date_trunc('week', changed_at)::date, to_stage, count(*), 0, 0, 0
+    FROM pipeline_transitions GROUP BY 1, 2
+    ON CONFLICT (week, stage) DO UPDATE SET entered = pipeline_weekly_stats.entered + EXCLUDED.entered
+    """,
+]
+
+
+async def copy(conn: asyncpg.Connection, table: str, rows: Iterator[tuple], columns: list[str]) -> None:
+    started = time.perf_counter()
+    result = await conn.copy_records_to_table(table, records=rows, columns=columns)
+    count = int(result.split()[-1])
+    print(f"   {table:<22} {count:>10,} rows  {time.perf_counter() - started:6.2f}s")
+
+
+async def write_stub_files(documents: list[tuple[str, int]], size: int, concurrency: int = 32) -> None:
+    storage = get_storage()
+    semaphore = asyncio.Semaphore(concurrency)
+    filler = (" ".join(WORDS) + "\n").encode()
+
+    async def write(key: str, index: int) -> None:
+        body = (f"Document de test {index}\n".encode() + filler * (size // len(filler) + 1))[:size]
+        async with semaphore:
+            await storage.save(key, io.BytesIO(body), "text/plain")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(write(key, index) for key, index in documents))
+    print(f"   {'stub files':<22} {len(documents):>10,} files {time.perf_counter() - started:6.2f}s")
+
+
+async def seed(args: argparse.Namespace) -> None:
+    await ensure_schema(engine)
+    conn = await asyncpg.connect(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1))
+    generator = Generator(args)
+    started = time.perf_counter()
+    try:
+        async with conn.transaction():
+            if args.reset:
+                await conn.execute(f"TRUNCATE {', '.join(SEEDED_TABLES)} CASCADE")
+            elif await conn.fetchval("SELECT EXISTS (SELECT 1 FROM clients)"):
+                sys.exit("❌ Database already has clients: rerun with --reset to replace them.")
+
+            print(f"🌱 Seeding (seed={args.seed}, anchor={args.anchor})")
+            await copy(conn, "clients", generator.clients(), COLUMNS["clients"])
+            await copy(
+                conn, "pipeline_transitions", generator.pipeline_entries(),
+                ["id", "client_id", "from_stage", "to_stage", "changed_at"],
+            )
+            await copy(conn, "tasks", generator.tasks(), COLUMNS["tasks"])
+            await copy(conn, "finances", generator.finances(), COLUMNS["finances"])
+            if generator.client_ids:
+                await copy(conn, "meeting_notes", generator.meeting_notes(), COLUMNS["meeting_notes"])
+                await copy(conn, "projects", generator.projects(), COLUMNS["projects"])
+            if generator.project_ids:
+                await copy(conn, "documents", generator.documents_rows(), COLUMNS["documents"])
+            for sql in PIPELINE_SQL:
+                await conn.execute(sql)
+
+        for table in SEEDED_TABLES:
+            await conn.execute(f"ANALYZE {table}")
+    finally:
+        await conn.close()
+
+    if generator.documents and args.files:
+        await write_stub_files(generator.documents, args.file_bytes)
+
+    async with AsyncSessionLocal() as db:
+        await recompute_amounts_eur(db)
+        await schedule_forecast_refresh(db)
+        await schedule_digest_refresh(db)
+        await schedule_effort_refresh(db)
+        await db.commit()
+    await engine.dispose()
+    print(f"✅ Seed done in {time.perf_counter() - started:.1f}s")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--finances", type=int, default=2000)
+    parser.add_argument("--notes", type=int, default=3000, help="meeting notes")
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", type=date.fromisoformat, default=date.today(), help="date de référence (AAAA-MM-JJ)")
+    parser.add_argument("--reset", action="store_true", help="TRUNCATE des tables métier avant le chargement")
+    parser.add_argument("--stage-weights", default=DEFAULT_WEIGHTS["stage"])
+    parser.add_argument("--task-status-weights", default=DEFAULT_WEIGHTS["task_status"])
+    parser.add_argument("--client-status-weights", default=DEFAULT_WEIGHTS["client_status"])
+    parser.add_argument("--subscription-ratio", type=float, default=0.3, help="part d'abonnements dans les finances")
+    parser.add_argument("--skew", type=float, default=2.0, help="concentration de l'activité sur quelques clients (1 = uniforme)")
+    parser.add_argument("--note-chars", type=int, default=4000, help="longueur moyenne des comptes-rendus")
+    parser.add_argument("--file-bytes", type=int, default=2048, help="taille des fichiers factices")
+    parser.add_argument("--no-files", dest="files", action="store_false", help="n'écrit pas les fichiers des documents")
+    args = parser.parse_args(argv)
+    try:
+        args.stage_weights = parse_weights(args.stage_weights, PipelineStage)
+        args.task_status_weights = parse_weights(args.task_status_weights, TaskStatus)
+        args.client_status_weights = parse_weights(args.client_status_weights, ClientStatus)
+    except argparse.ArgumentTypeError as exc:
+        parser.error(str(exc))
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(seed(parse_args()))
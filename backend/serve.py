@@ -0,0 +1,48 @@
+"""Lancement de l'API en production : plusieurs workers uvicorn, sans --reload.
+
+    python serve.py
+
+- WEB_CONCURRENCY : nombre de workers (défaut : nombre de cœurs) ;
+- DB_CONNECTION_BUDGET : connexions Postgres pour l'ensemble des workers,
+  réparties entre eux (cf. app/database.py) ;
+- GRACEFUL_SHUTDOWN_TIMEOUT : secondes laissées aux requêtes en cours sur
+  SIGTERM avant l'arrêt (les workers ferment ensuite leur pool).
+
+En dev, garder `uvicorn app.main:app --reload` (un seul process).
+"""
+import logging
+import os
+
+import uvicorn
+
+from app.database import DB_CONNECTION_BUDGET, JOB_WORKER_PROCESSES, WEB_CONCURRENCY, pool_sizing
+from app.log import setup_logging
+
+logger = logging.getLogger("serve")
+
+
+def main() -> None:
+    # Les workers relisent WEB_CONCURRENCY pour dimensionner leur pool.
+    os.environ["WEB_CONCURRENCY"] = str(WEB_CONCURRENCY)
+    pool_size, max_overflow = pool_sizing()
+    setup_logging()
+    logger.info(
+        f"Starting {WEB_CONCURRENCY} worker(s), DB budget {DB_CONNECTION_BUDGET} "
+        f"(pool {pool_size} + overflow {max_overflow} per process, {JOB_WORKER_PROCESSES} job worker process(es))"
+    )
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=WEB_CONCURRENCY,
+        proxy_headers=True,
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30")),
+        timeout_keep_alive=int(os.getenv("KEEP_ALIVE_TIMEOUT", "5")),
+        # Logging configuré par app/log.py (file + JSON) ; lignes d'accès émises par l'app.
+        log_config=None,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Garbage collector des fichiers orphelins + rapport d'occupation du stockage.
+
+Usage :
+    python storage_gc.py             # quarantaine / suppression des orphelins
+    python storage_gc.py --dry-run   # compte sans rien modifier
+    python storage_gc.py --report    # occupation par projet et par client
+
+Le même GC tourne aussi en job périodique (STORAGE_GC_INTERVAL_HOURS).
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.database import AsyncSessionLocal, engine
+from app.services.storage_gc import collect_garbage, storage_usage
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.report:
+        async with AsyncSessionLocal() as db:
+            result = await storage_usage(db)
+    else:
+        result = await collect_garbage(dry_run=args.dry_run)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Ne rien mettre en quarantaine ni supprimer")
+    parser.add_argument("--report", action="store_true", help="Afficher l'occupation par projet et client")
+    asyncio.run(main(parser.parse_args()))
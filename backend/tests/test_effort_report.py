@@ -0,0 +1,51 @@
+"""GET /reports/effort, default grouping: a task attached to a client."""
+import asyncio
+import uuid
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.effort import effort_report
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return self
+
+
+class _Session:
+    """Answers the report's three queries in order, after compiling each one for Postgres."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return _Result(self.answers.pop(0))
+
+
+def test_default_report_labels_client_tasks():
+    client_id = uuid.uuid4()
+    row = SimpleNamespace(
+        grp=str(client_id), tasks=1, estimated_hours=Decimal("4"), actual_hours=Decimal("6"),
+        compared_tasks=1, compared_estimated=Decimal("4"), compared_actual=Decimal("6"), overrun_tasks=1,
+    )
+    db = _Session([], [row], [(client_id, "Acme")])
+
+    report = asyncio.run(effort_report(db, "client", date(2026, 10, 5), date(2026, 10, 18), today=date(2026, 10, 19)))
+
+    assert report["groups"] == [{
+        "key": str(client_id), "label": "Acme", "tasks": 1, "estimated_hours": 4.0, "actual_hours": 6.0,
+        "compared_tasks": 1, "variance_hours": 2.0, "overrun_ratio": 1.5, "overrun_tasks": 1,
+    }]
+    # Libellés lus aussi dans la table froide (clients archivés).
+    assert "clients_archive" in db.statements[-1]